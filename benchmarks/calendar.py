@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from sqlalchemy import insert
+from flaskapp import db, scheduling
+from flaskapp.models import NotificationStatus, Order, OrderStatus, Service
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, measure, scratch_app
+
+
+# Booking checks for one provider with --bookings historical orders, one
+# every 90 minutes: the calendar's interval tree (cold and warm), the
+# database check run inside the booking transaction, and a scan of every
+# booking of the provider for comparison.
+
+START = datetime(2020, 1, 1)
+SPACING = timedelta(minutes=90)
+
+
+def scan_all(provider_id, start, minutes):
+    end = start + timedelta(minutes=minutes)
+    for order_id, _, other_start, other_minutes in scheduling._booking_rows(Order.service_provider_id == provider_id):
+        if other_start < end and start < other_start + timedelta(minutes=other_minutes):
+            return order_id
+    return None
+
+
+@click.command()
+@click.option('--bookings', default=12000, show_default=True, type=click.IntRange(1))
+@click.option('--checks', default=1000, show_default=True, type=click.IntRange(1))
+def main(bookings, checks):
+    """Time booking checks for a provider with many bookings."""
+    with scratch_app() as app, app.app_context():
+        generate(users=2, providers=1, categories=1, subcategories=0, services=1, orders=0,
+                 review_rate=0, complaint_rate=0)
+        service = Service.query.one()
+        provider_id, minutes = service.provider_id, service.duration
+        db.session.execute(insert(Order), [
+            {'order_loc': 'benchmark', 'order_datetime': START + n * SPACING, 'status': OrderStatus.completed,
+             'price': service.ser_price, 'notifications': NotificationStatus.viewed, 'ser_id': service.id,
+             'customer_id': 2, 'service_provider_id': provider_id, 'dispatch': False}
+            for n in range(bookings)
+        ])
+        db.session.commit()
+
+        rng = np.random.default_rng(0)
+        span = (bookings * SPACING).total_seconds()
+        times = [START + timedelta(seconds=int(s)) for s in rng.integers(0, span, size=checks)]
+        queue = iter([])
+
+        def each_time(func):
+            return lambda: func(next(queue))
+
+        click.echo(f'\none provider, {bookings} bookings of {minutes} min')
+        echo_header(*LATENCY_COLUMNS)
+        queue = iter(times)
+        echo_latency('calendar load (cold)', measure(
+            each_time(lambda t: scheduling.find_conflict(provider_id, t, minutes)), 5,
+            setup=lambda: scheduling.reload([provider_id]),
+        ))
+        queue = iter(times)
+        echo_latency('find_conflict (warm)', measure(
+            each_time(lambda t: scheduling.find_conflict(provider_id, t, minutes)), checks))
+        tree = scheduling._calendars[provider_id]
+        queue = iter(times)
+        echo_latency('interval tree overlap', measure(
+            each_time(lambda t: tree.overlap(t, t + timedelta(minutes=minutes))), checks))
+        queue = iter(times)
+        echo_latency('next 5 free slots', measure(
+            each_time(lambda t: scheduling.next_free_slots(provider_id, t, minutes, n=5)), checks))
+        queue = iter(times)
+        echo_latency('booked_overlap (database)', measure(
+            each_time(lambda t: scheduling.booked_overlap(provider_id, t, minutes)), checks))
+        queue = iter(times)
+        echo_latency('scan every booking', measure(
+            each_time(lambda t: scan_all(provider_id, t, minutes)), max(checks // 20, 1)))
+
+
+if __name__ == '__main__':
+    main()
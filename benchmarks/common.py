@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+import click
+import numpy as np
+from flaskapp import cache, create_app, db, fragments, geo, identity, scheduling, search
+from flaskapp.config import Config
+
+
+# Shared set-up for the benchmarks in this package. Each one builds the app on
+# a scratch SQLite file that is deleted afterwards, fills it with
+# flaskapp.synthetic and times the code it is about. Run them from the
+# repository root: python -m benchmarks.<name> --help
+
+
+class BenchConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    # jobs stay queued and passwords hash inline unless a benchmark says otherwise
+    JOB_WORKERS = 0
+    PASSWORD_HASH_WORKERS = 0
+    BCRYPT_LOG_ROUNDS = 4
+    # the benchmarks time statements themselves, keep the slow-query and
+    # N+1 warnings out of their output
+    SQL_SLOW_QUERY_MS = 10 ** 9
+    SQL_DUPLICATE_THRESHOLD = 10 ** 9
+
+
+@contextmanager
+def scratch_app(**settings):
+    """An app on an empty scratch database; `settings` override BenchConfig."""
+    directory = tempfile.mkdtemp(prefix='flaskapp-bench-')
+    settings.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + os.path.join(directory, 'bench.db'))
+    app = create_app(type('ScratchConfig', (BenchConfig,), settings))
+    with app.app_context():
+        db.create_all()
+    reset_caches()
+    try:
+        yield app
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def reset_caches():
+    # process-wide caches outlive the database they were filled from
+    cache._top_services = None
+    cache._category_tree = None
+    fragments.fragment_cache.clear()
+    identity.user_cache.clear()
+    with scheduling._lock:
+        scheduling._calendars.clear()
+        scheduling._last_booking_seq = None
+    search._backend = None
+    search._checked = False
+    search._memory_index.version = None
+    geo._backend = None
+    geo._checked = False
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def measure(func, repeat, setup=None):
+    """Seconds taken by each of `repeat` calls of func(); setup() runs untimed before each."""
+    samples = np.empty(repeat)
+    for n in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples[n] = time.perf_counter() - started
+    return samples
+
+
+def echo_header(*columns):
+    click.echo(f'{columns[0]:32}' + ''.join(f'{column:>12}' for column in columns[1:]))
+
+
+def echo_latency(label, samples, elapsed=None):
+    """One row of count, p50, p95, max (ms) and calls per second; pass the
+    wall time as `elapsed` when the calls ran concurrently."""
+    p50, p95 = np.percentile(samples, [50, 95]) * 1000
+    rate = len(samples) / (elapsed if elapsed is not None else samples.sum())
+    click.echo(
+        f'{label:32}{len(samples):>12}{p50:>12.3f}{p95:>12.3f}{samples.max() * 1000:>12.3f}{rate:>12.0f}'
+    )
+
+
+LATENCY_COLUMNS = ('', 'calls', 'p50 ms', 'p95 ms', 'max ms', 'calls/s')
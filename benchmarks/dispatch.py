@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from sqlalchemy import update
+from flaskapp import db
+from flaskapp.dispatch import UNREACHABLE, dispatch_batch, solve_assignment
+from flaskapp.geo import distance_matrix_km
+from flaskapp.models import Category, Order, OrderStatus
+from flaskapp.synthetic import _points, generate
+from benchmarks.common import scratch_app
+
+
+# Dispatch scaling. The solver part builds the haversine cost matrix for n
+# random orders and n random providers of the synthetic city and solves the
+# assignment, next to a greedy nearest-free-provider pass for the total
+# distance it saves. The batch part times dispatch_batch() end to end on a
+# scratch database with --batch waiting orders and as many providers.
+
+CENTRE = (23.78, 90.40)
+SPREAD_KM = 20.0
+
+
+def greedy(cost):
+    # each order in turn takes its nearest reachable provider still free
+    taken = np.zeros(cost.shape[1], dtype=bool)
+    distances = []
+    for row in cost:
+        col = int(np.argmin(np.where(taken, np.inf, row)))
+        if row[col] < UNREACHABLE:
+            taken[col] = True
+            distances.append(row[col])
+    return len(distances), sum(distances)
+
+
+@click.command()
+@click.option('--sizes', default='100,500,1000,2000,5000', show_default=True,
+              help='Comma separated n for the n x n solver runs.')
+@click.option('--batch', 'batches', multiple=True, type=click.IntRange(1), default=(100, 500),
+              show_default=True, help='Waiting orders for an end-to-end batch; repeat for several.')
+@click.option('--max-km', default=25.0, show_default=True)
+def main(sizes, batches, max_km):
+    """Time the dispatch cost matrix, the assignment solver and whole batches."""
+    rng = np.random.default_rng(0)
+    click.echo(f'\n{"n x n":>12}{"matrix s":>12}{"solve s":>12}{"matched":>12}{"km":>12}'
+               f'{"greedy":>12}{"greedy km":>12}')
+    for n in (int(size) for size in sizes.split(',')):
+        o_lat, o_lon = _points(rng, n, *CENTRE, SPREAD_KM)
+        p_lat, p_lon = _points(rng, n, *CENTRE, SPREAD_KM)
+        started = time.perf_counter()
+        cost = distance_matrix_km(o_lat, o_lon, p_lat, p_lon)
+        cost[cost > max_km] = UNREACHABLE
+        built = time.perf_counter()
+        rows, cols = solve_assignment(cost)
+        solved = time.perf_counter()
+        matched = cost[rows, cols][cost[rows, cols] < UNREACHABLE]
+        greedy_matched, greedy_km = greedy(cost)
+        click.echo(
+            f'{n:>12}{built - started:>12.3f}{solved - built:>12.3f}{len(matched):>12}{matched.sum():>12.0f}'
+            f'{greedy_matched:>12}{greedy_km:>12.0f}'
+        )
+
+    click.echo(f'\n{"batch":>12}{"seconds":>12}{"assigned":>12}{"kept":>12}{"rejected":>12}')
+    for n in batches:
+        with scratch_app(DISPATCH_MAX_KM=max_km) as app, app.app_context():
+            generate(users=2 * n, providers=n, categories=1, subcategories=0, services=1, orders=n,
+                     review_rate=0, complaint_rate=0)
+            # every order waits for dispatch, each at an hour of its own
+            start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+            for offset, (order_id,) in enumerate(db.session.query(Order.id).order_by(Order.id)):
+                db.session.execute(
+                    update(Order).where(Order.id == order_id).values(
+                        dispatch=True, status=OrderStatus.pending, order_datetime=start + timedelta(hours=offset),
+                    ),
+                    execution_options={'synchronize_session': False},
+                )
+            db.session.commit()
+            category_id = db.session.query(Category.id).scalar()
+            started = time.perf_counter()
+            assigned, kept, rejected = dispatch_batch(category_id)
+            click.echo(f'{n:>12}{time.perf_counter() - started:>12.3f}{assigned:>12}{kept:>12}{rejected:>12}')
+
+
+if __name__ == '__main__':
+    main()
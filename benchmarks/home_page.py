@@ -0,0 +1,57 @@
+import click
+from flaskapp import db
+from flaskapp.cache import invalidate_top_services
+from flaskapp.models import Category, Service
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, measure, scratch_app
+
+
+# /home latency as the category count grows: served from the top services
+# cache, with the cache dropped before every request (one query), and the
+# old one-query-per-category loop it replaced, timed on its own.
+
+
+def per_category_queries():
+    result = {}
+    for category in Category.query.all():
+        service = Service.query.filter_by(category_id=category.id).order_by(Service.ratings.desc()).first()
+        if service is not None:
+            result[category.name] = {
+                'id': service.id, 'title': service.title, 'description': service.description,
+                'price': service.ser_price,
+            }
+    return result
+
+
+def _drop_cache(app):
+    with app.app_context():
+        invalidate_top_services()
+        db.session.commit()
+
+
+@click.command()
+@click.option('--categories', 'steps', multiple=True, type=click.IntRange(1), default=(10, 100, 1000),
+              show_default=True, help='Category counts to measure at, repeatable.')
+@click.option('--requests', default=200, show_default=True, type=click.IntRange(1), help='Requests per row.')
+def main(steps, requests):
+    """Time /home for a growing number of categories."""
+    with scratch_app() as app:
+        client = app.test_client()
+        created = 0
+        for target in sorted(set(steps)):
+            with app.app_context():
+                # three services per category, on as many providers
+                generate(users=target - created + 1, providers=target - created, categories=target - created,
+                         subcategories=0, services=3, orders=0, review_rate=0, complaint_rate=0)
+            created = target
+            click.echo(f'\n{created} categories')
+            echo_header(*LATENCY_COLUMNS)
+            client.get('/home')
+            echo_latency('/home, cached', measure(lambda: client.get('/home'), requests))
+            echo_latency('/home, cache dropped', measure(lambda: client.get('/home'), requests, lambda: _drop_cache(app)))
+            with app.app_context():
+                echo_latency('one query per category', measure(per_category_queries, max(requests // 10, 1)))
+
+
+if __name__ == '__main__':
+    main()
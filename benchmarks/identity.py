@@ -0,0 +1,47 @@
+import itertools
+import click
+from flaskapp import db, identity
+from flaskapp.models import ServiceProvider, User
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, login, measure, scratch_app
+
+
+# Authenticated requests with and without the user snapshot cache
+# (flaskapp/identity.py). Requests rotate over --users signed-in customers.
+
+ROUTES = ('/about', '/alluserorders', '/home')
+
+
+@click.command()
+@click.option('--requests', default=2000, show_default=True, type=click.IntRange(1), help='Requests per row.')
+@click.option('--users', default=50, show_default=True, type=click.IntRange(1), help='Signed-in customers.')
+def main(requests, users):
+    """Measure requests/s on authenticated routes with and without the user cache."""
+    with scratch_app() as app:
+        with app.app_context():
+            generate(users=users + 20, providers=10, categories=5, subcategories=0, services=3, orders=users * 20,
+                     review_rate=0.5, complaint_rate=0)
+            customers = [row[0] for row in db.session.query(User.id).outerjoin(
+                ServiceProvider, ServiceProvider.id == User.id).filter(ServiceProvider.id.is_(None)).limit(users)]
+        clients = []
+        for user_id in customers:
+            client = app.test_client()
+            login(client, user_id)
+            clients.append(client)
+
+        ttl = identity.user_cache.ttl
+        for label, cache_ttl in (('without the cache', 0), ('with the cache', ttl)):
+            identity.user_cache.ttl = cache_ttl
+            identity.user_cache.clear()
+            click.echo(f'\n{label} (USER_CACHE_TTL={cache_ttl})')
+            echo_header(*LATENCY_COLUMNS)
+            for route in ROUTES:
+                rotation = itertools.cycle(clients)
+                for client in clients:
+                    client.get(route)
+                echo_latency(route, measure(lambda: next(rotation).get(route), requests))
+        identity.user_cache.ttl = ttl
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+import click
+import numpy as np
+from flaskapp import passwords
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, scratch_app
+
+
+# Login throughput under concurrency, bcrypt inline in the request threads
+# versus the bounded process pool (flaskapp/passwords.py). While the logins
+# run, one more thread keeps requesting /about to show what a login burst does
+# to the rest of the site. Logins over PASSWORD_HASH_MAX_PENDING get a 429.
+
+
+def _burst(app, emails, concurrency, duration):
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def sign_in(seed):
+        rng = random.Random(seed)
+        seen = Counter()
+        while time.perf_counter() < deadline:
+            # a new client each time, a signed-in one would just be redirected
+            response = app.test_client().post('/login', data={
+                'email': rng.choice(emails), 'password': 'password', 'submit': 'Login',
+            })
+            seen[response.status_code] += 1
+        with lock:
+            statuses.update(seen)
+
+    about = []
+
+    def browse():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/about')
+            about.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=sign_in, args=(n,)) for n in range(concurrency)]
+    threads.append(threading.Thread(target=browse))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses, time.perf_counter() - started, np.array(about)
+
+
+@click.command()
+@click.option('--concurrency', default=16, show_default=True, type=click.IntRange(1), help='Threads signing in.')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per variant.')
+@click.option('--rounds', default=12, show_default=True, type=click.IntRange(4, 31), help='bcrypt work factor.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, type=click.IntRange(1),
+              help='Pool size for the pooled variant.')
+@click.option('--users', default=200, show_default=True, type=click.IntRange(2))
+def main(concurrency, duration, rounds, workers, users):
+    """Measure logins/s with bcrypt inline and in the process pool."""
+    with scratch_app(BCRYPT_LOG_ROUNDS=rounds) as app:
+        with app.app_context():
+            generate(users=users, providers=1, categories=1, subcategories=0, services=1, orders=0,
+                     review_rate=0, complaint_rate=0)
+        emails = [f'synth{n}@example.com' for n in range(2, users + 1)]
+        rows = []
+        for label, pool_size in (('inline', 0), (f'pool of {workers}', workers)):
+            app.config['PASSWORD_HASH_WORKERS'] = pool_size
+            app.config['PASSWORD_HASH_MAX_PENDING'] = 4 * max(pool_size, 1)
+            passwords._slots = None
+            statuses, elapsed, about = _burst(app, emails, concurrency, duration)
+            rows.append((label, statuses, elapsed, about))
+        if passwords._pool is not None:
+            passwords._pool.shutdown()
+            passwords._pool = None
+
+    click.echo(f'\n{concurrency} threads signing in, bcrypt cost {rounds}')
+    click.echo(f'{"":32}{"signed in":>12}{"429":>12}{"other":>12}{"logins/s":>12}')
+    for label, statuses, elapsed, _ in rows:
+        other = sum(statuses.values()) - statuses[302] - statuses[429]
+        click.echo(f'{label:32}{statuses[302]:>12}{statuses[429]:>12}{other:>12}{statuses[302] / elapsed:>12.1f}')
+    click.echo('\n/about during the burst')
+    echo_header(*LATENCY_COLUMNS)
+    for label, _, elapsed, about in rows:
+        echo_latency(label, about, elapsed)
+
+
+if __name__ == '__main__':
+    main()
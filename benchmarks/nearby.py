@@ -0,0 +1,62 @@
+import click
+import numpy as np
+from flaskapp import db, geo
+from flaskapp.geo import haversine_km, nearest_providers
+from flaskapp.models import ServiceProvider
+from flaskapp.synthetic import _points, generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, measure, scratch_app
+
+
+# Nearest verified providers around random points of the synthetic city:
+# through the R-tree, through the lat/lon range query that other databases
+# use, and a scan of every provider for comparison.
+
+CENTRE = (23.78, 90.40)
+
+
+def scan_all(lat, lon, radius_km, k):
+    rows = db.session.query(ServiceProvider.id, ServiceProvider.latitude, ServiceProvider.longitude).filter(
+        ServiceProvider.verified.is_(True), ServiceProvider.latitude.isnot(None),
+    ).all()
+    ids, lats, lons = (np.array(column) for column in zip(*rows))
+    distances = haversine_km(lat, lon, lats, lons)
+    inside = np.flatnonzero(distances <= radius_km)
+    return ids[inside[np.argsort(distances[inside])[:k]]]
+
+
+@click.command()
+@click.option('--providers', default=100000, show_default=True, type=click.IntRange(1))
+@click.option('--queries', default=500, show_default=True, type=click.IntRange(1))
+@click.option('--radius-km', default=5.0, show_default=True)
+@click.option('-k', default=10, show_default=True, type=click.IntRange(1))
+def main(providers, queries, radius_km, k):
+    """Time nearest-provider lookups over a large synthetic city."""
+    with scratch_app() as app:
+        with app.app_context():
+            generate(users=providers + 1, providers=providers, categories=10, subcategories=0, services=1,
+                     orders=0, review_rate=0, complaint_rate=0)
+            lats, lons = _points(np.random.default_rng(1), queries, *CENTRE, 20.0)
+            points = iter([])
+
+            def lookup(func):
+                def call():
+                    lat, lon = next(points)
+                    func(lat, lon)
+                return call
+
+            click.echo(f'\n{providers} providers, radius {radius_km} km, k={k}')
+            echo_header(*LATENCY_COLUMNS)
+            for label, backend in (('R-tree', 'rtree'), ('lat/lon range query', 'range')):
+                geo._backend = backend
+                points = zip(lats, lons)
+                echo_latency(label, measure(lookup(lambda lat, lon: nearest_providers(lat, lon, radius_km=radius_km, k=k)), queries))
+            geo._backend = None
+            points = zip(lats, lons)
+            echo_latency('scan every provider', measure(lookup(lambda lat, lon: scan_all(lat, lon, radius_km, k)), max(queries // 10, 1)))
+        client = app.test_client()
+        paths = iter(f'/api/providers/nearby?lat={lat}&lon={lon}&radius_km={radius_km}&k={k}' for lat, lon in zip(lats, lons))
+        echo_latency('/api/providers/nearby', measure(lambda: client.get(next(paths)), queries))
+
+
+if __name__ == '__main__':
+    main()
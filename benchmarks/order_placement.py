@@ -0,0 +1,95 @@
+import itertools
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flaskapp import db
+from flaskapp.models import Service, ServiceProvider, User
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, login, scratch_app
+
+
+# Concurrent order placement on SQLite, default settings versus the tuned
+# ones from flaskapp/database.py (WAL, synchronous=NORMAL, busy timeout, mmap).
+# Writer threads submit orders while reader threads list their orders; every
+# variant gets a fresh database with the same synthetic data.
+
+
+def _run(app, customers, service_ids, writers, readers, duration):
+    latencies = defaultdict(list)
+    outcomes = Counter()
+    lock = threading.Lock()
+    slots = itertools.count()
+    base = datetime(2030, 1, 1)
+    deadline = time.perf_counter() + duration
+
+    def worker(customer_id, writing):
+        client = app.test_client()
+        login(client, customer_id)
+        route = 'submitOrder' if writing else 'alluserorders'
+        samples, seen = [], Counter()
+        while time.perf_counter() < deadline:
+            if writing:
+                with lock:
+                    # far enough apart that no two orders overlap
+                    start = base + timedelta(hours=4 * next(slots))
+                    service_id = service_ids[start.hour % len(service_ids)]
+            started = time.perf_counter()
+            try:
+                if writing:
+                    response = client.post('/submitOrder', data={
+                        'location': 'benchmark', 'datetime': start.strftime('%Y-%m-%dT%H:%M'),
+                        'price': '10', 'service_id': service_id,
+                    })
+                else:
+                    response = client.get('/alluserorders')
+                status = response.status_code
+            except Exception:
+                status = 'error'
+            samples.append(time.perf_counter() - started)
+            seen[(route, status)] += 1
+        with lock:
+            latencies[route].extend(samples)
+            outcomes.update(seen)
+
+    threads = [
+        threading.Thread(target=worker, args=(customers[n % len(customers)], n < writers))
+        for n in range(writers + readers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes, time.perf_counter() - started
+
+
+@click.command()
+@click.option('--writers', default=4, show_default=True, type=click.IntRange(0), help='Threads placing orders.')
+@click.option('--readers', default=8, show_default=True, type=click.IntRange(0), help='Threads listing orders.')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per variant.')
+@click.option('--orders', default=20000, show_default=True, type=click.IntRange(0), help='Orders already there.')
+def main(writers, readers, duration, orders):
+    """Compare default and tuned SQLite settings on the order placement path."""
+    for label, tuned in (('default SQLite', False), ('tuned SQLite', True)):
+        with scratch_app(SQLITE_TUNING=tuned) as app:
+            with app.app_context():
+                generate(users=500, providers=50, categories=5, subcategories=0, services=3, orders=orders,
+                         review_rate=0.5, complaint_rate=0)
+                customers = [row[0] for row in db.session.query(User.id).outerjoin(
+                    ServiceProvider, ServiceProvider.id == User.id).filter(ServiceProvider.id.is_(None)).limit(100)]
+                service_ids = [row[0] for row in db.session.query(Service.id).order_by(Service.id).limit(24)]
+                mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+            latencies, outcomes, elapsed = _run(app, customers, service_ids, writers, readers, duration)
+        click.echo(f'\n{label} (journal_mode={mode}), {writers} writers, {readers} readers, {elapsed:.1f}s')
+        click.echo('  ' + ', '.join(f'{route} {status}: {count}' for (route, status), count in sorted(
+            outcomes.items(), key=str)))
+        echo_header(*LATENCY_COLUMNS)
+        for route, samples in sorted(latencies.items()):
+            echo_latency(route, np.array(samples), elapsed)
+
+
+if __name__ == '__main__':
+    main()
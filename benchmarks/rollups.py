@@ -0,0 +1,95 @@
+import time
+import click
+from sqlalchemy import case, func
+from flaskapp import db, rollups
+from flaskapp.models import Category, Order, OrderStatus, Service
+from flaskapp.synthetic import generate
+from benchmarks.common import LATENCY_COLUMNS, echo_header, echo_latency, measure, scratch_app
+
+
+# The dashboard queries of flaskapp.rollups against the same numbers
+# aggregated from the order table, over --orders synthetic orders, plus the
+# cost of the backfill and of keeping the rollups in step as orders are placed.
+# The rollups pay off with the number of orders per day x provider x category
+# x status; compare a few --providers to see it.
+
+
+def _order_totals():
+    completed = Order.status == OrderStatus.completed
+    return (
+        func.count(Order.id).label('orders'),
+        func.sum(case((completed, 1), else_=0)).label('completed'),
+        func.sum(case((completed, Order.price), else_=0.0)).label('earnings'),
+        func.avg(Order.rate).label('rate_mean'),
+    )
+
+
+def provider_daily_from_orders(provider_id, since):
+    day = func.date(Order.order_datetime)
+    return (
+        db.session.query(day, *_order_totals())
+        .filter(Order.service_provider_id == provider_id, Order.order_datetime >= since)
+        .group_by(day).order_by(day).all()
+    )
+
+
+def category_totals_from_orders(since):
+    return (
+        db.session.query(Service.category_id, Category.name, *_order_totals())
+        .join(Service, Order.ser_id == Service.id)
+        .outerjoin(Category, Category.id == Service.category_id)
+        .filter(Order.order_datetime >= since)
+        .group_by(Service.category_id, Category.name)
+        .order_by(func.count(Order.id).desc()).all()
+    )
+
+
+def top_providers_from_orders(since, limit=20):
+    totals = _order_totals()
+    return (
+        db.session.query(Order.service_provider_id, *totals)
+        .filter(Order.order_datetime >= since)
+        .group_by(Order.service_provider_id)
+        .order_by(totals[2].desc()).limit(limit).all()
+    )
+
+
+@click.command()
+@click.option('--orders', default=200000, show_default=True, type=click.IntRange(1))
+@click.option('--providers', default=2000, show_default=True, type=click.IntRange(1))
+@click.option('--days', default=90, show_default=True, type=click.IntRange(1), help='Dashboard period.')
+@click.option('--repeat', default=20, show_default=True, type=click.IntRange(1))
+def main(orders, providers, days, repeat):
+    """Time rollup dashboard queries against aggregating the orders."""
+    with scratch_app() as app, app.app_context():
+        generate(users=providers * 5, providers=providers, categories=20, subcategories=0, services=3,
+                 orders=orders, review_rate=0.5, complaint_rate=0)
+        started = time.perf_counter()
+        rows = rollups.backfill()
+        click.echo(f'\nbackfill: {orders} orders -> {rows} rollup rows in {time.perf_counter() - started:.2f}s')
+
+        since = rollups.since_days(days)
+        busiest = (
+            db.session.query(Order.service_provider_id)
+            .group_by(Order.service_provider_id).order_by(func.count(Order.id).desc()).limit(1).scalar()
+        )
+        click.echo(f'last {days} days, busiest provider {busiest}')
+        echo_header(*LATENCY_COLUMNS)
+        for label, query in (
+            ('provider_daily (rollups)', lambda: rollups.provider_daily(busiest, since)),
+            ('provider_daily (orders)', lambda: provider_daily_from_orders(busiest, since)),
+            ('category_totals (rollups)', lambda: rollups.category_totals(since)),
+            ('category_totals (orders)', lambda: category_totals_from_orders(since)),
+            ('top_providers (rollups)', lambda: rollups.top_providers(since)),
+            ('top_providers (orders)', lambda: top_providers_from_orders(since)),
+        ):
+            echo_latency(label, measure(query, repeat))
+
+        # what postorder() pays on top of its INSERT, for one new order
+        order_ids = iter(row[0] for row in db.session.query(Order.id).order_by(Order.id.desc()).limit(repeat * 10))
+        echo_latency('record_orders (one order)', measure(lambda: rollups.record_orders([next(order_ids)]), repeat * 10))
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
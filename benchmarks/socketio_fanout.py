@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+import time
+import click
+import socketio
+from flaskapp.broker import LocalBroker, LocalBrokerManager
+from flaskapp.notifications import ORDER_NAMESPACE
+
+
+# Socket.IO fan-out through the bundled broker (flaskapp/broker.py): one
+# process publishes order events to a room, each of 1, 4 and 8 worker
+# processes runs the same client manager as the web workers, with --clients
+# sockets in that room, and counts the packets it hands to them. The sockets
+# are not real connections, so this measures the broker and the managers, not
+# the network to browsers.
+
+ROOM = 'user_1'
+EVENT = {'id': 1, 'status': 'pending', 'kind': 'created', 'service_title': 'Plumbing', 'price': 10.0}
+
+
+def _worker(url, clients, expected, results):
+    delivered = 0
+    finished = threading.Event()
+
+    class CountingServer(socketio.Server):
+        def _send_eio_packet(self, eio_sid, eio_pkt):
+            nonlocal delivered
+            delivered += 1
+            if delivered == expected:
+                finished.set()
+
+    server = CountingServer(client_manager=LocalBrokerManager(url))
+    for n in range(clients):
+        sid = server.manager.connect(f'eio-{n}', ORDER_NAMESPACE)
+        server.manager.enter_room(sid, ORDER_NAMESPACE, ROOM)
+    server.manager_initialized = True
+    server.manager.initialize()
+    finished.wait(600)
+    results.put((delivered, time.time()))
+
+
+def fan_out(broker, workers, clients, messages):
+    """Publish `messages` events; returns (deliveries, seconds until the last worker had them all)."""
+    url = 'tcp://%s:%s' % broker.server_address
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(url, clients, clients * messages, results), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    # every worker's listener is connected before anything is published
+    while len(broker.clients) < workers:
+        time.sleep(0.05)
+    publisher = LocalBrokerManager(url, write_only=True)
+    started = time.time()
+    for n in range(messages):
+        publisher.emit('order_event', dict(EVENT, id=n), namespace=ORDER_NAMESPACE, room=ROOM)
+    done = [results.get(timeout=600) for _ in processes]
+    for process in processes:
+        process.join()
+    publisher.publisher.close()
+    return sum(delivered for delivered, _ in done), max(finished for _, finished in done) - started
+
+
+@click.command()
+@click.option('--workers', 'steps', multiple=True, type=click.IntRange(1), default=(1, 4, 8), show_default=True,
+              help='Worker process counts to measure, repeatable.')
+@click.option('--clients', default=10, show_default=True, type=click.IntRange(1), help='Sockets in the room per worker.')
+@click.option('--messages', default=5000, show_default=True, type=click.IntRange(1))
+def main(steps, clients, messages):
+    """Measure messages/s fanned out to N worker processes through the broker."""
+    broker = LocalBroker(('127.0.0.1', 0))
+    threading.Thread(target=broker.serve_forever, daemon=True).start()
+    click.echo(f'{"workers":>8}{"messages":>10}{"deliveries":>12}{"seconds":>10}{"messages/s":>12}{"deliveries/s":>14}')
+    try:
+        for workers in steps:
+            delivered, elapsed = fan_out(broker, workers, clients, messages)
+            click.echo(f'{workers:>8}{messages:>10}{delivered:>12}{elapsed:>10.2f}'
+                       f'{messages / elapsed:>12.0f}{delivered / elapsed:>14.0f}')
+    finally:
+        broker.shutdown()
+        broker.server_close()
+
+
+if __name__ == '__main__':
+    main()
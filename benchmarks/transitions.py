@@ -0,0 +1,65 @@
+import time
+import click
+from sqlalchemy import update
+from flaskapp import db
+from flaskapp.models import Order, OrderStatus
+from flaskapp.rollups import backfill
+from flaskapp.synthetic import generate
+from flaskapp.transitions import MAX_BULK_ORDERS
+from benchmarks.common import login, scratch_app
+
+
+# A provider clearing a backlog of pending orders: one /acceptOrder request
+# per order versus POST /api/orders/transition with up to MAX_BULK_ORDERS ids
+# per call. Both start from the same pending orders.
+
+
+def _reset(app, provider_id):
+    with app.app_context():
+        db.session.execute(
+            update(Order).where(Order.service_provider_id == provider_id).values(status=OrderStatus.pending),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+        backfill()
+        return [row[0] for row in db.session.query(Order.id).filter(Order.service_provider_id == provider_id)]
+
+
+@click.command()
+@click.option('--orders', default=1000, show_default=True, type=click.IntRange(1), help='Pending orders to accept.')
+def main(orders):
+    """Compare per-order and bulk status transitions."""
+    with scratch_app() as app:
+        with app.app_context():
+            generate(users=50, providers=1, categories=1, subcategories=0, services=1, orders=orders,
+                     review_rate=0, complaint_rate=0)
+        provider_id = 1
+        client = app.test_client()
+        login(client, provider_id)
+
+        order_ids = _reset(app, provider_id)
+        started = time.perf_counter()
+        for order_id in order_ids:
+            client.get(f'/acceptOrder/{order_id}')
+        per_order = time.perf_counter() - started
+
+        order_ids = _reset(app, provider_id)
+        started = time.perf_counter()
+        updated = 0
+        for start in range(0, len(order_ids), MAX_BULK_ORDERS):
+            response = client.post('/api/orders/transition', json={
+                'order_ids': order_ids[start:start + MAX_BULK_ORDERS], 'status': 'accepted',
+            })
+            updated += response.get_json()['updated']
+        bulk = time.perf_counter() - started
+        with app.app_context():
+            accepted = Order.query.filter_by(status=OrderStatus.accepted).count()
+
+    click.echo(f'\n{len(order_ids)} pending orders accepted ({updated} by the bulk calls, {accepted} in the table)')
+    click.echo(f'{"":32}{"seconds":>12}{"orders/s":>12}')
+    click.echo(f'{"/acceptOrder per order":32}{per_order:>12.3f}{len(order_ids) / per_order:>12.0f}')
+    click.echo(f'{"/api/orders/transition":32}{bulk:>12.3f}{len(order_ids) / bulk:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,16 +4,54 @@ from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_socketio import SocketIO
+from flaskapp.config import Config, engine_options
+from flaskapp.database import tune_sqlite
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = '5791728bb0b18ce0c676dfde280ba245'
-socketio = SocketIO(app)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+# Extensions are created unbound so importing flaskapp stays cheap; the routes
+# (and everything they pull in) are only imported when an app is built.
+db = SQLAlchemy()
+migrate = Migrate()
+bcrypt = Bcrypt()
+login_manager = LoginManager()
+login_manager.login_view = 'accounts.login'
 login_manager.login_message_category = 'info'
+socketio = SocketIO()
 
-from flaskapp import routes
\ No newline at end of file
+
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    db.init_app(app)
+    with app.app_context():
+        tune_sqlite(db.engine, app.config)
+    migrate.init_app(app, db)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+
+    message_queue = app.config['SOCKETIO_MESSAGE_QUEUE']
+    if message_queue and message_queue.startswith('tcp://'):
+        from flaskapp.broker import LocalBrokerManager
+        socketio.init_app(app, client_manager=LocalBrokerManager(message_queue))
+    else:
+        socketio.init_app(app, message_queue=message_queue)
+
+    from flaskapp import (
+        dispatch, fragments, identity, jobs, loadtest, pagination, passwords, profiling, ratings, rollups, synthetic,
+    )
+    from flaskapp.blueprints import register_blueprints
+
+    dispatch.init_app(app)
+    fragments.init_app(app)
+    identity.init_app(app)
+    jobs.init_app(app)
+    loadtest.init_app(app)
+    pagination.init_app(app)
+    passwords.init_app(app)
+    profiling.init_app(app)
+    ratings.init_app(app)
+    rollups.init_app(app)
+    synthetic.init_app(app)
+    register_blueprints(app)
+    return app
@@ -0,0 +1,8 @@
+def register_blueprints(app):
+    from flaskapp.blueprints import accounts, admin, chat, orders, search
+
+    app.register_blueprint(search.bp)
+    app.register_blueprint(accounts.bp)
+    app.register_blueprint(orders.bp)
+    app.register_blueprint(admin.bp)
+    app.register_blueprint(chat.bp)
@@ -0,0 +1,131 @@
+from flask import Blueprint, render_template, url_for, flash, redirect, request
+from flask_login import login_user, current_user, logout_user, login_required
+from flaskapp import db
+from flaskapp.models import User, ServiceProvider, Service
+from flaskapp.forms import RegistrationForm, LoginForm, UpdateAccountForm
+from flaskapp.images import picture_urls, save_picture, serve_picture
+from flaskapp.passwords import check_password, hash_password, needs_rehash
+from flaskapp.cache import category_tree
+
+bp = Blueprint('accounts', __name__)
+
+
+@bp.route("/register", methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('search.home'))
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        hashed_password = hash_password(form.password.data)
+        user = User(username=form.username.data, email=form.email.data, password=hashed_password)
+        db.session.add(user)
+        db.session.commit()
+        flash('Your account has been created! You are now able to log in', 'success')
+        return redirect(url_for('accounts.login'))
+    return render_template('register.html', title='Register', form=form)
+
+
+@bp.route("/login", methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('search.home'))
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+        if user and check_password(user.password, form.password.data):
+            if needs_rehash(user.password):
+                user.password = hash_password(form.password.data)
+                db.session.commit()
+            login_user(user, remember=form.remember.data)
+            next_page = request.args.get('next')
+            return redirect(next_page) if next_page else redirect(url_for('search.home'))
+        else:
+            flash('Login Unsuccessful. Please check email and password', 'danger')
+    return render_template('login.html', title='Login', form=form)
+
+@bp.route('/join')
+def join():
+    return redirect(url_for('accounts.containform'))
+
+@bp.route("/containform")
+def containform():
+    return render_template("createServiceProviderprofileform.html", categories=category_tree().category_choices())
+
+@bp.route('/become_service_provider', methods=['GET', 'POST'])
+@login_required
+def become_service_provider():
+    if request.method == 'POST':
+        nid = request.form.get('nid')
+        bio = request.form.get('bio')
+        title = request.form.get('title')
+        description = request.form.get('description')
+        ser_price = request.form.get('ser_price')
+        category = request.form.get('category', type=int)
+        duration = request.form.get('duration') 
+        
+        
+        if not nid or not bio or not title or not description or not ser_price or category not in category_tree().categories:
+            flash('All fields are required.', 'danger')
+            return redirect(url_for('accounts.containform'))
+        
+        
+        
+        service_provider =  db.session.query(ServiceProvider).filter(ServiceProvider.id == current_user.id).first()
+        
+        if ( service_provider == None):
+            service_provider = ServiceProvider(id=current_user.id, nid=nid, bio=bio)
+            db.session.add(service_provider)
+            db.session.commit()
+        elif not service_provider.active:
+            flash('Your service provider account has been removed.', 'danger')
+            return redirect(url_for('search.home'))
+
+        
+        service = Service(
+            title=title, 
+            description=description, 
+            ser_price=ser_price, 
+            user_id=current_user.id, 
+            provider_id=current_user.id,
+            ratings = 1,
+            category_id=category, 
+            duration = duration,
+        )
+        db.session.add(service)
+        db.session.commit()
+
+        flash('You are now a service provider!', 'success')
+        return redirect(url_for('search.home')) 
+
+
+@bp.route("/logout")
+def logout():
+    logout_user()
+    return redirect(url_for('search.home'))
+
+
+@bp.route("/account", methods=['GET', 'POST'])
+@login_required
+def account():
+    form = UpdateAccountForm()
+    if form.validate_on_submit():
+        # current_user is a cached snapshot, changes go to the row
+        user = db.session.get(User, current_user.id)
+        if form.picture.data:
+            picture_file = save_picture(form.picture.data)
+            user.image_file = picture_file
+        user.username = form.username.data
+        user.email = form.email.data
+        db.session.commit()
+        flash('Your account has been updated!', 'success')
+        return redirect(url_for('accounts.account'))
+    elif request.method == 'GET':
+        form.username.data = current_user.username
+        form.email.data = current_user.email
+    image_file, image_webp = picture_urls(current_user.image_file)
+    return render_template('account.html', title='Account', image_file=image_file, image_webp=image_webp, form=form)
+
+
+@bp.route('/profile_pics/<path:filename>')
+def profile_picture(filename):
+    return serve_picture(filename)
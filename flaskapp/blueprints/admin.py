@@ -0,0 +1,251 @@
+from flask import Blueprint, render_template, url_for, flash, redirect, request, abort, jsonify
+from flask_login import current_user, login_required
+from functools import wraps
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from flaskapp import db
+from flaskapp.models import User, ServiceProvider, Service, Order, Complaint, Category, Subcategory
+from flaskapp.forms import CategoryForm, SubcategoryForm, DeleteCategoryForm, DeleteSubcategoryForm
+from flaskapp.pagination import paginate, page_size
+from flaskapp.jobs import enqueue
+from flaskapp.rollups import category_totals, since_days, top_providers
+
+bp = Blueprint('admin', __name__)
+
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(403)
+        # current_user may be a snapshot up to USER_CACHE_TTL old (see
+        # flaskapp/identity.py); admin rights are checked on the row itself
+        is_admin = db.session.query(User.is_admin).filter(User.id == current_user.id).scalar()
+        if not is_admin:
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
+
+ADMIN_RECENT_COMPLAINTS = 10
+
+
+def dashboard_counts():
+    counts = db.session.query(
+        db.select(func.count(User.id)).scalar_subquery().label('users'),
+        db.select(func.count(Service.id)).scalar_subquery().label('services'),
+        db.select(func.count(Category.id)).scalar_subquery().label('categories'),
+        db.select(func.count(Subcategory.id)).scalar_subquery().label('subcategories'),
+        db.select(func.count(Complaint.id)).where(Complaint.resolved.is_(False)).scalar_subquery().label('unresolved_complaints'),
+        db.select(func.count(Complaint.id)).where(Complaint.resolved.is_(True)).scalar_subquery().label('resolved_complaints'),
+        db.select(func.count(ServiceProvider.id)).where(ServiceProvider.verified.is_(False), ServiceProvider.active.is_(True)).scalar_subquery().label('unverified_providers'),
+    ).one()
+    return counts._asdict()
+
+
+@bp.route("/admin")
+@login_required
+@admin_required
+def admin_dashboard():
+    counts = dashboard_counts()
+    unresolved_complaints = (
+        Complaint.query.options(joinedload(Complaint.user))
+        .filter(Complaint.resolved.is_(False))
+        .order_by(Complaint.date_posted.desc(), Complaint.id.desc())
+        .limit(ADMIN_RECENT_COMPLAINTS)
+        .all()
+    )
+    category_form = CategoryForm()
+    subcategory_form = SubcategoryForm()
+    delete_category_form = DeleteCategoryForm()
+    delete_subcategory_form = DeleteSubcategoryForm()
+    return render_template('admin.html', counts=counts, unresolved_complaints=unresolved_complaints, category_form=category_form, subcategory_form=subcategory_form, delete_category_form=delete_category_form, delete_subcategory_form=delete_subcategory_form)
+
+
+def complaint_json(complaint):
+    return {
+        'id': complaint.id,
+        'username': complaint.user.username,
+        'message': complaint.message,
+        'date_posted': complaint.date_posted.isoformat(),
+        'resolved': complaint.resolved,
+        'action_taken': complaint.action_taken,
+        'url': url_for('admin.view_complaint', complaint_id=complaint.id),
+    }
+
+
+# heavy dashboard lists, fetched page by page when the admin opens them
+@bp.route("/admin/api/<section>")
+@login_required
+@admin_required
+def admin_section(section):
+    cursor = request.args.get('cursor')
+    limit = page_size()
+    if section == 'users':
+        page = paginate(
+            db.session.query(User.id, User.username, User.email, User.is_admin),
+            [(User.id, True)], lambda row: (row.id,), cursor=cursor, limit=limit,
+        )
+        items = [row._asdict() for row in page]
+    elif section == 'services':
+        page = paginate(
+            db.session.query(Service.id, Service.title, Service.ser_price, Service.rating_score, Service.provider_id),
+            [(Service.id, True)], lambda row: (row.id,), cursor=cursor, limit=limit,
+        )
+        items = [row._asdict() for row in page]
+    elif section in ('unresolved_complaints', 'resolved_complaints'):
+        page = paginate(
+            Complaint.query.options(joinedload(Complaint.user))
+            .filter(Complaint.resolved.is_(section == 'resolved_complaints')),
+            [(Complaint.date_posted, True), (Complaint.id, True)],
+            lambda complaint: (complaint.date_posted, complaint.id),
+            cursor=cursor, limit=limit,
+        )
+        items = [complaint_json(complaint) for complaint in page]
+    else:
+        abort(404)
+    return jsonify(items=items, next_cursor=page.next_cursor)
+
+# earnings and order volume, read from the order rollups only
+@bp.route("/admin/api/revenue")
+@login_required
+@admin_required
+def admin_revenue():
+    since = since_days(min(max(request.args.get('days', 30, type=int), 1), 3660))
+    return jsonify(
+        since=since.isoformat(),
+        categories=[row._asdict() for row in category_totals(since)],
+        providers=[row._asdict() for row in top_providers(since)],
+    )
+
+
+@bp.route("/add_category", methods=['POST'])
+@login_required
+@admin_required
+def add_category():
+    form = CategoryForm()
+    if form.validate_on_submit():
+        category = Category(name=form.name.data)
+        db.session.add(category)
+        db.session.commit()
+        flash('Category has been added!', 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/add_subcategory", methods=['POST'])
+@login_required
+@admin_required
+def add_subcategory():
+    form = SubcategoryForm()
+    if form.validate_on_submit():
+        subcategory = Subcategory(name=form.name.data, category_id=form.category.data)
+        db.session.add(subcategory)
+        db.session.commit()
+        flash('Subcategory has been added!', 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/delete_category", methods=['POST'])
+@login_required
+@admin_required
+def delete_category():
+    form = DeleteCategoryForm()
+    if form.validate_on_submit():
+        category = Category.query.get(form.category.data)
+        if category is None:
+            abort(404)
+        # subcategories and services can't be left without their category
+        in_use = (
+            db.session.query(Subcategory.id).filter(Subcategory.category_id == category.id).first()
+            or db.session.query(Service.id).filter(Service.category_id == category.id).first()
+        )
+        if in_use:
+            flash('Remove the subcategories and services of this category before deleting it.', 'danger')
+            return redirect(url_for('admin.admin_dashboard'))
+        db.session.delete(category)
+        db.session.commit()
+        flash('Category has been deleted!', 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/delete_subcategory", methods=['POST'])
+@login_required
+@admin_required
+def delete_subcategory():
+    form = DeleteSubcategoryForm()
+    if form.validate_on_submit():
+        subcategory = Subcategory.query.get(form.subcategory.data)
+        db.session.delete(subcategory)
+        db.session.commit()
+        flash('Subcategory has been deleted!', 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/complaint/<int:complaint_id>")
+@login_required
+@admin_required
+def view_complaint(complaint_id):
+    complaint = Complaint.query.get_or_404(complaint_id)
+    order = Order.query.get_or_404(complaint.order_id)
+    return render_template('complaint_details.html', complaint=complaint, order=order)
+
+@bp.route("/complaint/<int:complaint_id>/refund", methods=['POST'])
+@login_required
+@admin_required
+def refund_user(complaint_id):
+    complaint = Complaint.query.get_or_404(complaint_id)
+    complaint.resolved = True
+    complaint.action_taken = "User refunded"
+    enqueue('refund_order', complaint_id=complaint.id)
+    db.session.commit()
+    flash('User has been refunded.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/complaint/<int:complaint_id>/remove_provider", methods=['POST'])
+@login_required
+@admin_required
+def remove_service_provider(complaint_id):
+    complaint = Complaint.query.get_or_404(complaint_id)
+    order = Order.query.get_or_404(complaint.order_id)
+    service_provider = ServiceProvider.query.get_or_404(order.service_provider_id)
+    complaint.resolved = True
+    complaint.action_taken = "Service provider removed"
+    enqueue('remove_provider', provider_id=service_provider.id)
+    db.session.commit()
+    flash('Service provider will be removed shortly.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/complaint/<int:complaint_id>/warn_provider", methods=['POST'])
+@login_required
+@admin_required
+def warn_service_provider(complaint_id):
+    complaint = Complaint.query.get_or_404(complaint_id)
+    complaint.resolved = True
+    complaint.action_taken = "Service provider warned"
+    enqueue('warn_provider', complaint_id=complaint.id)
+    db.session.commit()
+    flash('Service provider has been warned.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+@bp.route("/admin/unverified_service_providers")
+@login_required
+@admin_required
+def unverified_service_providers():
+    unverified_providers = ServiceProvider.query.filter_by(verified=False, active=True).all()
+    return render_template('unverified_service_providers.html', unverified_providers=unverified_providers)
+
+@bp.route("/admin/verify_service_provider/<int:provider_id>", methods=['GET', 'POST'])
+@login_required
+@admin_required
+def verify_service_provider(provider_id):
+    provider = ServiceProvider.query.filter_by(id=provider_id, active=True).first_or_404()
+    if request.method == 'POST':
+        if 'verify' in request.form:
+            provider.verified = True
+            flash('Service provider has been verified.', 'success')
+        elif 'unverify' in request.form:
+            provider.verified = False
+            flash('Service provider has not been verified.', 'danger')
+        db.session.commit()
+        return redirect(url_for('admin.unverified_service_providers'))
+    return render_template('verify_service_provider.html', provider=provider)
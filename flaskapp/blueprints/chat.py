@@ -0,0 +1,80 @@
+from flask import Blueprint, abort, render_template, request
+from flask_login import current_user, login_required
+from flask_socketio import emit, join_room, leave_room, rooms
+from flaskapp import socketio
+from flaskapp.chat import (
+    GLOBAL_ROOM, MESSAGE_MAX_LENGTH, ROOM_MAX_LENGTH, clean_text, may_join, message_buffer, order_room, room_history,
+)
+from flaskapp.notifications import ORDER_NAMESPACE, user_room
+
+bp = Blueprint('chat', __name__)
+
+
+def _field(data, name, max_length):
+    # socket payloads are whatever the client sent
+    return clean_text(data.get(name), max_length) if isinstance(data, dict) else None
+
+
+def _joined_room(data):
+    # a room this socket has joined, so passed may_join()
+    room = _field(data, 'room', ROOM_MAX_LENGTH)
+    return room if room is not None and room in rooms() else None
+
+
+@bp.route('/chat')
+@login_required
+def chat():
+    order_id = request.args.get('order', type=int)
+    room = GLOBAL_ROOM if order_id is None else order_room(order_id)
+    if not may_join(current_user.id, room):
+        abort(403)
+    return render_template('chat.html', title='Chat', room=room)
+
+# Put every authenticated socket on the order namespace in its own user room;
+# chat rooms are on the default namespace, so no one can join another's
+@socketio.on('connect', namespace=ORDER_NAMESPACE)
+def on_connect():
+    if not current_user.is_authenticated:
+        return False
+    join_room(user_room(current_user.id))
+
+# Handle a user joining a chat room
+@socketio.on('join')
+def on_join(data):
+    room = _field(data, 'room', ROOM_MAX_LENGTH)
+    if room is None or not current_user.is_authenticated or not may_join(current_user.id, room):
+        return
+    username = current_user.username
+    join_room(room)
+    messages, cursor = room_history(room)
+    emit('history', {'room': room, 'messages': messages, 'cursor': cursor})
+    emit('message', {'msg': f'{username} has joined the room.'}, room=room)
+
+# Handle a user leaving a chat room
+@socketio.on('leave')
+def on_leave(data):
+    room = _joined_room(data)
+    if room is None:
+        return
+    username = current_user.username
+    leave_room(room)
+    emit('message', {'msg': f'{username} has left the room.'}, room=room)
+
+# Handle messages sent by users
+@socketio.on('send_message')
+def handle_message(data):
+    room = _joined_room(data)
+    msg = _field(data, 'msg', MESSAGE_MAX_LENGTH)
+    if room is None or msg is None:
+        return
+    message_buffer.add(room, current_user.id, current_user.username, msg)
+    emit('message', {'username': current_user.username, 'msg': msg}, room=room)
+
+# Send the page of history before `cursor` to the requesting client
+@socketio.on('load_history')
+def load_history(data):
+    room = _joined_room(data)
+    if room is None:
+        return
+    messages, cursor = room_history(room, cursor=data.get('cursor'))
+    emit('history', {'room': room, 'messages': messages, 'cursor': cursor, 'older': True})
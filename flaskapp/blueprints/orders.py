@@ -0,0 +1,373 @@
+from flask import Blueprint, render_template, url_for, flash, redirect, request, abort, jsonify
+from flask_login import current_user, login_required
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from flaskapp import db
+from flaskapp.models import User, ServiceProvider, Service, Order, NotificationStatus, OrderStatus
+from flaskapp.pagination import paginate, page_size
+from flaskapp.jobs import enqueue
+from flaskapp.dispatch import schedule_dispatch
+from flaskapp.fragments import render_service_page
+from flaskapp.ratings import record_rating
+from flaskapp.rollups import order_facts, provider_daily, record_change, record_orders, since_days
+from flaskapp.scheduling import booked_overlap, find_conflict, lock_provider, next_booking_seq, next_free_slots
+from flaskapp.transitions import transition_orders, MAX_BULK_ORDERS, NOT_FOUND, FORBIDDEN
+
+bp = Blueprint('orders', __name__)
+
+
+# order listings page newest first
+ORDER_KEYS = [(Order.order_datetime, True), (Order.id, True)]
+
+# everything the order lists render, fetched as plain rows in one query
+ORDER_COLUMNS = (
+    Order.id,
+    Order.price,
+    Order.order_datetime,
+    Order.status,
+    Order.order_loc.label('loc'),
+    Service.title.label('service_title'),
+)
+
+
+def order_rows(*criteria, columns=ORDER_COLUMNS):
+    return db.session.query(*columns).join(Service, Order.ser_id == Service.id).filter(*criteria)
+
+
+def order_row_key(row):
+    return (row.order_datetime, row.id)
+
+
+def is_service_provider(user_id):
+    return db.session.query(ServiceProvider.id).filter_by(id=user_id, active=True).first() is not None
+
+
+@bp.route('/alluserorders')
+@login_required
+def alluserorders():
+    
+    orders = paginate(
+        order_rows(Order.customer_id == current_user.id),
+        ORDER_KEYS, order_row_key,
+        cursor=request.args.get('cursor'), limit=page_size(),
+    )
+
+    return render_template('alluserorders.html', orders=orders, next_cursor=orders.next_cursor)
+
+
+
+
+@bp.route('/userorderdetails/<int:order_id>')
+@login_required
+def userorderdetails(order_id):
+    
+    details = order_rows(Order.id == order_id).first()
+
+    if not details:
+        flash('Order not found', 'danger')
+        return redirect(url_for('orders.alluserorders'))
+
+    return render_template('userorderdetails.html', details=details)
+
+
+
+
+@bp.route('/review_order/<int:order_id>', methods=['GET', 'POST'])
+@login_required
+def review_order(order_id):
+    order = Order.query.get_or_404(order_id)
+    if order.customer_id != current_user.id:
+        abort(403)
+    if order.status != OrderStatus.completed:
+        flash('Only completed orders can be reviewed.', 'warning')
+        return redirect(url_for('orders.alluserorders'))
+
+    if request.method == 'POST':
+        rating = request.form.get('rating', type=float)
+        review = request.form.get('review', '').strip()
+        if rating is None or not 0 <= rating <= 5 or not review:
+            flash('Please give a rating between 0 and 5 and a review.', 'danger')
+            return redirect(url_for('orders.review_order', order_id=order_id))
+
+        old_rate = order.rate
+        before = order_facts([order.id])
+        order.rate = rating
+        order.review = review
+        record_rating(order, old_rate, rating)
+        record_change(before)
+        db.session.commit()
+        flash('Thank you for your review!', 'success')
+        return redirect(url_for('orders.alluserorders'))
+
+    return render_template('review_order.html', title='Review Order', order=order)
+
+
+@bp.route('/placeorder/<int:service_id>')
+@login_required
+def placeorder(service_id):
+    return render_service_page('orderform.html', service_id, referrer=request.referrer)
+
+
+
+@bp.route('/api/services/<int:service_id>/slots')
+def free_slots(service_id):
+    # ?after=<ISO datetime>&n=<count> -> the provider's next free start times
+    service = db.session.query(Service.provider_id, Service.duration).filter(Service.id == service_id, Service.active.is_(True)).first_or_404()
+    try:
+        after = datetime.fromisoformat(request.args['after']) if 'after' in request.args else datetime.utcnow()
+    except ValueError:
+        return jsonify(error='after must be an ISO datetime'), 400
+    n = min(max(request.args.get('n', 5, type=int), 1), 50)
+    slots = next_free_slots(service.provider_id, after, service.duration, n)
+    return jsonify(duration=service.duration, slots=[slot.isoformat() for slot in slots])
+
+
+def slot_taken(provider_id, start, minutes, service_id):
+    slots = next_free_slots(provider_id, start, minutes)
+    flash("That time is already booked. Free times: " + ", ".join(f"{slot:%Y-%m-%d %H:%M}" for slot in slots), "warning")
+    return redirect(url_for('orders.placeorder', service_id=service_id))
+
+
+@bp.route('/submitOrder', methods = ['POST'])
+def postorder():
+    if request.method == 'POST':
+        location = request.form.get('location')
+        date_time = datetime.fromisoformat(request.form.get('datetime'))
+        price = request.form.get('price', type=float)
+        service_id = request.form.get('service_id', type=int)
+        service_provider_id = request.form.get('service_provider_id', type=int)
+        latitude = request.form.get('latitude', type=float)
+        longitude = request.form.get('longitude', type=float)
+        # dispatch mode needs to know where the job is
+        dispatch = bool(request.form.get('dispatch')) and latitude is not None and longitude is not None
+
+    
+    if not location or not date_time or not price:
+        flash("All fields are required!", "danger")
+        return redirect('/submitOrder')
+
+    service = db.session.query(Service.provider_id, Service.duration, Service.category_id).filter(Service.id == service_id, Service.active.is_(True)).first()
+    if service is None:
+        abort(404)
+    service_provider_id = service.provider_id
+
+    if not dispatch and find_conflict(service_provider_id, date_time, service.duration) is not None:
+        return slot_taken(service_provider_id, date_time, service.duration, service_id)
+
+    new_order = Order(order_loc=location, order_datetime=date_time, price=price, ser_id = service_id, service_provider_id = service_provider_id, customer_id = current_user.id,
+                      latitude=latitude, longitude=longitude, dispatch=dispatch)
+
+    lock_provider(service_provider_id)
+    db.session.add(new_order)
+    db.session.flush()
+    # the calendar can miss a booking committed a moment ago; the database can't
+    if not dispatch and booked_overlap(service_provider_id, date_time, service.duration, exclude=[new_order.id]) is not None:
+        db.session.rollback()
+        return slot_taken(service_provider_id, date_time, service.duration, service_id)
+    new_order.booking_seq = next_booking_seq()
+    record_orders([new_order.id])
+    if dispatch:
+        # the provider is told once the batch has picked one
+        schedule_dispatch(service.category_id)
+    else:
+        enqueue('notify_orders', order_ids=[new_order.id], kind='created')
+    db.session.commit()
+
+    flash("Order submitted successfully!", "success")
+    return redirect(url_for('orders.alluserorders'))
+
+
+
+@bp.route('/notification')
+def notification():
+    
+    if is_service_provider(current_user.id):
+
+        notes = paginate(
+            order_rows(Order.notifications == NotificationStatus.not_viewed, Order.service_provider_id == current_user.id, Order.dispatch.is_(False)),
+            ORDER_KEYS, order_row_key,
+            cursor=request.args.get('note_cursor'), limit=page_size(),
+        )
+        views = paginate(
+            order_rows(Order.notifications == NotificationStatus.viewed, Order.service_provider_id == current_user.id, Order.dispatch.is_(False)),
+            ORDER_KEYS, order_row_key,
+            cursor=request.args.get('viewed_cursor'), limit=page_size(),
+        )
+        note_cursor = notes.next_cursor
+        viewed_cursor = views.next_cursor
+        # totals, not page sizes, in one pass over the notifications index
+        counts = dict(
+            db.session.query(Order.notifications, func.count(Order.id))
+            .filter(Order.service_provider_id == current_user.id, Order.dispatch.is_(False))
+            .group_by(Order.notifications)
+            .all()
+        )
+    
+    else:
+        notes = None
+        views = None
+        note_cursor = None
+        viewed_cursor = None
+        counts = {}
+    
+    return render_template('notification.html', note = notes, viewed = views, note_cursor = note_cursor, viewed_cursor = viewed_cursor,
+                           note_count = counts.get(NotificationStatus.not_viewed, 0), viewed_count = counts.get(NotificationStatus.viewed, 0))
+
+@bp.route('/updateNotification/<int:order_id>')
+def updateNotification(order_id):
+    order = Order.query.filter_by(id=order_id).first()
+
+    if order.notifications == NotificationStatus.not_viewed:
+        order.notifications = NotificationStatus.viewed
+        db.session.commit()
+
+
+    else:
+        order.notifications = NotificationStatus.not_viewed
+        db.session.commit()
+
+    
+    return redirect(url_for('orders.notification'))
+
+
+
+
+def update_status(order_id, status, label):
+    result = transition_orders([order_id], status, current_user.id)[order_id]
+    if result['error'] == NOT_FOUND:
+        abort(404)
+    if result['error'] == FORBIDDEN:
+        abort(403)
+    if result['ok']:
+        flash(f'Order status updated to "{label}".', 'success')
+    else:
+        flash(f'An order that is "{result["status"]}" cannot be marked "{label}".', 'warning')
+
+
+@bp.route('/acceptOrder/<int:order_id>')
+@login_required
+def acceptOrder(order_id):
+    update_status(order_id, OrderStatus.accepted, 'Accepted')
+    return redirect(url_for('orders.notification'))
+
+
+
+@bp.route('/rejectOrder/<int:order_id>')
+@login_required
+def rejectOrder(order_id):
+    update_status(order_id, OrderStatus.rejected, 'Rejected')
+    return redirect(url_for('orders.notification'))
+
+
+@bp.route('/api/orders/transition', methods=['POST'])
+@login_required
+def bulk_transition():
+    # {"order_ids": [1, 2, ...], "status": "on_the_way"} -> per-order results
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    if (not isinstance(order_ids, list) or not order_ids or len(order_ids) > MAX_BULK_ORDERS
+            or not all(isinstance(order_id, int) for order_id in order_ids)):
+        return jsonify(error=f'order_ids must be a list of 1 to {MAX_BULK_ORDERS} ids'), 400
+    try:
+        status = OrderStatus[data.get('status')]
+    except KeyError:
+        return jsonify(error='unknown status'), 400
+
+    results = transition_orders(order_ids, status, current_user.id)
+    return jsonify(
+        updated=sum(result['ok'] for result in results.values()),
+        results={str(order_id): result for order_id, result in results.items()},
+    )
+
+
+@bp.route('/api/earnings')
+@login_required
+def earnings():
+    # the provider's orders and earnings per booking day, from the rollups only
+    if not is_service_provider(current_user.id):
+        abort(403)
+    since = since_days(min(max(request.args.get('days', 30, type=int), 1), 3660))
+    days = [dict(row._asdict(), day=row.day.isoformat()) for row in provider_daily(current_user.id, since)]
+    return jsonify(since=since.isoformat(), days=days)
+
+
+@bp.route("/accepted_orders", methods=['GET', 'POST'], endpoint='accepted_orders')
+@login_required
+def view_orders():
+    if not is_service_provider(current_user.id):
+        return "Access Denied: Not a Service Provider", 403
+
+    def provider_orders(statuses, cursor_arg):
+        return paginate(
+            order_rows(
+                Order.service_provider_id == current_user.id,
+                Order.status.in_(statuses),
+                columns=ORDER_COLUMNS + (Service.description.label('service_description'),),
+            ),
+            ORDER_KEYS, order_row_key,
+            cursor=request.args.get(cursor_arg), limit=page_size(),
+        )
+
+    accepted_orders = provider_orders([OrderStatus.accepted, OrderStatus.on_the_way, OrderStatus.reached], 'accepted_cursor')
+    completed_orders = provider_orders([OrderStatus.completed], 'completed_cursor')
+
+    return render_template(
+        'acceptedorders.html',
+        accepted_orders=accepted_orders,
+        completed_orders=completed_orders
+    )
+
+    
+
+
+
+@bp.route('/mark_reached/<int:order_id>', methods=['POST'])
+@login_required
+def mark_reached(order_id):
+    update_status(order_id, OrderStatus.reached, 'Reached')
+    return redirect(url_for('orders.accepted_orders'))
+
+@bp.route('/mark_ontheway/<int:order_id>', methods=['POST'])
+@login_required
+def mark_ontheway(order_id):  
+    update_status(order_id, OrderStatus.on_the_way, 'On the way')
+    return redirect(url_for('orders.accepted_orders'))
+
+@bp.route('/mark_completed/<int:order_id>', methods=['POST'])
+@login_required
+def mark_completed(order_id):
+    update_status(order_id, OrderStatus.completed, 'Completed')
+    return redirect(url_for('orders.accepted_orders'))
+
+
+@bp.route('/order/<int:order_id>')
+def order_details(order_id):
+    # order, service, customer and provider location in a single joined query
+    order = (
+        Order.query
+        .options(
+            joinedload(Order.service).load_only(Service.title, Service.description),
+            joinedload(Order.customer).load_only(User.username, User.email),
+            joinedload(Order.service_provider).load_only(ServiceProvider.latitude, ServiceProvider.longitude),
+        )
+        .filter(Order.id == order_id)
+        .first_or_404()
+    )
+    service_provider = order.service_provider
+
+    # Initial coordinates; providers removed by older releases left no row
+    sp_lat, sp_lon = (service_provider.latitude, service_provider.longitude) if service_provider else (None, None)
+    order_lat, order_lon = order.latitude, order.longitude
+
+    return render_template(
+        'ordersdetails.html',
+        order=order,
+        service_provider=service_provider,
+        service=order.service,
+        customer=order.customer,
+        sp_lat=sp_lat,
+        sp_lon=sp_lon,
+        order_lat=order_lat,
+        order_lon=order_lon
+    )
@@ -0,0 +1,74 @@
+from flask import Blueprint, render_template, request, abort, jsonify
+from flaskapp.cache import top_services_by_category
+from flaskapp.fragments import render_service_page
+from flaskapp.search import search_services
+from flaskapp.pagination import page_size
+from flaskapp.geo import nearest_providers
+
+bp = Blueprint('search', __name__)
+
+
+@bp.route("/")
+@bp.route("/home")
+def home():
+    services_data = getservices()  
+    servicesList = []
+
+    
+    for category, service in services_data.items():
+        servicesList.append(dict(service, category=category))
+    return render_template('home.html', services = servicesList)
+
+
+@bp.route("/about")
+def about():
+    return render_template('about.html', title='About')
+
+
+def getservices():
+    return top_services_by_category()
+
+
+@bp.route('/servicedetails/<int:service_id>')
+def servicedetails(service_id):
+    return render_service_page('service_details.html', service_id, referrer=request.referrer)
+    
+
+
+@bp.route('/search_result', methods=['GET'])
+def search_result():
+    query = request.args.get('query', '').split()
+    min_price = request.args.get('min_price', type=float)  
+    max_price = request.args.get('max_price', type=float)  
+    rating = request.args.get('rating', type=int) or 0   
+    
+    if not 0 <= rating <= 5:
+        rating = None
+
+    results = search_services(
+        query, min_price=min_price, max_price=max_price, min_rating=rating,
+        cursor=request.args.get('cursor'), limit=page_size(),
+    )
+
+    return render_template('search_results.html', result=results)
+        
+
+
+@bp.route('/api/providers/nearby')
+def providers_nearby():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        abort(400)
+    category_id = request.args.get('category_id', type=int)
+    radius_km = min(request.args.get('radius_km', 10.0, type=float), 100.0)
+    k = max(1, min(request.args.get('k', 10, type=int), 50))
+
+    nearest = nearest_providers(lat, lon, category_id=category_id, radius_km=radius_km, k=k)
+    return jsonify(providers=[{
+        'id': provider.id,
+        'bio': provider.bio,
+        'latitude': provider.latitude,
+        'longitude': provider.longitude,
+        'distance_km': round(distance, 3),
+    } for provider, distance in nearest])
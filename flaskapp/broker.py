@@ -0,0 +1,123 @@
+import argparse
+import json
+import socket
+import socketserver
+import time
+from threading import Lock
+from urllib.parse import urlparse
+import socketio
+
+
+# Minimal pub/sub broker plus a python-socketio client manager that talks to
+# it, so several worker processes can share Socket.IO rooms without Redis.
+# Every line a client sends is relayed to every connected client; lines are
+# JSON objects {"channel": ..., "data": ...}.
+#
+#   python -m flaskapp.broker --port 5800
+#   SOCKETIO_MESSAGE_QUEUE=tcp://127.0.0.1:5800 python run.py
+
+DEFAULT_URL = 'tcp://127.0.0.1:5800'
+
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.add_client(self.wfile)
+        try:
+            for line in self.rfile:
+                self.server.relay(line)
+        except ConnectionError:
+            # a worker that exits drops its connection without closing it
+            pass
+        finally:
+            self.server.remove_client(self.wfile)
+
+
+class LocalBroker(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _RelayHandler)
+        self.clients_lock = Lock()
+        self.clients = set()
+
+    def add_client(self, wfile):
+        with self.clients_lock:
+            self.clients.add(wfile)
+
+    def remove_client(self, wfile):
+        with self.clients_lock:
+            self.clients.discard(wfile)
+
+    def relay(self, line):
+        with self.clients_lock:
+            clients = list(self.clients)
+        for wfile in clients:
+            try:
+                wfile.write(line)
+                wfile.flush()
+            except OSError:
+                self.remove_client(wfile)
+
+
+def parse_url(url):
+    parsed = urlparse(url or DEFAULT_URL)
+    return parsed.hostname or '127.0.0.1', parsed.port or 5800
+
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """Client manager for SocketIO(client_manager=...) backed by LocalBroker."""
+
+    name = 'localbroker'
+
+    def __init__(self, url=DEFAULT_URL, channel='socketio', write_only=False, logger=None):
+        self.address = parse_url(url)
+        self.publish_lock = Lock()
+        self.publisher = None
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _publish(self, data):
+        line = (json.dumps({'channel': self.channel, 'data': data}) + '\n').encode('utf-8')
+        with self.publish_lock:
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        self.publisher = socket.create_connection(self.address)
+                    self.publisher.sendall(line)
+                    return
+                except OSError:
+                    if self.publisher is not None:
+                        self.publisher.close()
+                    self.publisher = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                with socket.create_connection(self.address) as connection:
+                    retry_sleep = 1
+                    for line in connection.makefile('rb'):
+                        message = json.loads(line)
+                        if message.get('channel') == self.channel:
+                            yield message['data']
+            except OSError:
+                self._get_logger().error(
+                    f'Cannot receive from broker at {self.address}, retrying in {retry_sleep} secs')
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the local Socket.IO pub/sub broker.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5800)
+    args = parser.parse_args()
+    with LocalBroker((args.host, args.port)) as broker:
+        print(f'broker listening on tcp://{args.host}:{args.port}')
+        broker.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+from threading import Lock
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history
+from flaskapp import db
+from flaskapp.database import upsert_insert
+from flaskapp.models import CacheVersion, Category, Service, Subcategory
+
+
+# home page "top service per category" dict, reloaded when the shared
+# 'top_services' counter in cache_version moves; changes bump it in their own
+# transaction, so it only moves once they are committed, in every worker
+TOP_SERVICES = 'top_services'
+_top_services = None
+_top_services_lock = Lock()
+
+# category/subcategory tree, rebuilt when the shared 'category_tree' counter
+# in cache_version moves, so every worker sees admin edits right away
+CATEGORY_TREE = 'category_tree'
+_category_tree = None
+_category_tree_lock = Lock()
+
+
+def top_services_by_category():
+    global _top_services
+    version = current_version(TOP_SERVICES)
+    cached = _top_services
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _top_services_lock:
+        if _top_services is None or _top_services[0] != version:
+            _top_services = (version, _load_top_services())
+        return _top_services[1]
+
+
+def invalidate_top_services(connection=None):
+    """Have every worker reload the top services once the current transaction commits."""
+    bump_version(connection if connection is not None else db.session.connection(), TOP_SERVICES)
+
+
+def _load_top_services():
+    # one query: each category picks its best rated service through a
+    # correlated subquery that walks ix_service_category_score
+    top_id = (
+        db.session.query(Service.id)
+        .filter(Service.category_id == Category.id, Service.active.is_(True))
+        .order_by(Service.rating_score.desc(), Service.id.desc())
+        .limit(1)
+        .correlate(Category)
+        .scalar_subquery()
+    )
+    rows = (
+        db.session.query(
+            Category.name,
+            Service.id,
+            Service.title,
+            Service.description,
+            Service.ser_price,
+        )
+        .join(Service, Service.id == top_id)
+        .order_by(Category.id)
+        .all()
+    )
+    return {
+        name: {
+            "id": service_id,
+            "title": title,
+            "description": description,
+            "price": price,
+        }
+        for name, service_id, title, description, price in rows
+    }
+
+
+class CategoryTree:
+    def __init__(self, version, categories, subcategories):
+        self.version = version
+        # id -> name, in name order
+        self.categories = {category_id: name for category_id, name in categories}
+        self.subcategories = {}
+        self.children = {category_id: [] for category_id in self.categories}
+        for subcategory_id, name, category_id in subcategories:
+            self.subcategories[subcategory_id] = name
+            self.children.setdefault(category_id, []).append((subcategory_id, name))
+
+    def category_choices(self):
+        return list(self.categories.items())
+
+    def subcategory_choices(self, category_id=None):
+        if category_id is not None:
+            return list(self.children.get(category_id, ()))
+        return list(self.subcategories.items())
+
+
+def bump_version(connection, name):
+    table = CacheVersion.__table__
+    insert = upsert_insert(connection.dialect)
+    if insert is not None:
+        # one statement, so the first two bumps of a missing counter can't
+        # both insert it; later ones wait on the row until the first commits
+        statement = insert(table).values(name=name, version=1)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name], set_={'version': table.c.version + 1},
+        ))
+        return
+    bumped = connection.execute(
+        table.update().where(table.c.name == name).values(version=table.c.version + 1)
+    ).rowcount
+    if not bumped:
+        connection.execute(table.insert().values(name=name, version=1))
+
+
+def current_version(name):
+    return db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar() or 0
+
+
+def category_tree():
+    global _category_tree
+    # forms on one page share a single version check
+    if has_request_context() and 'category_tree' in g:
+        return g.category_tree
+    version = current_version(CATEGORY_TREE)
+    tree = _category_tree
+    if tree is None or tree.version != version:
+        with _category_tree_lock:
+            if _category_tree is None or _category_tree.version != version:
+                _category_tree = CategoryTree(
+                    version,
+                    db.session.query(Category.id, Category.name).order_by(Category.name).all(),
+                    db.session.query(Subcategory.id, Subcategory.name, Subcategory.category_id).order_by(Subcategory.name).all(),
+                )
+            tree = _category_tree
+    if has_request_context():
+        g.category_tree = tree
+    return tree
+
+
+@event.listens_for(Service, 'after_insert')
+@event.listens_for(Service, 'after_delete')
+def _service_added_or_removed(mapper, connection, target):
+    invalidate_top_services(connection)
+
+
+@event.listens_for(Service, 'after_update')
+def _service_updated(mapper, connection, target):
+    for attr in ('rating_score', 'category_id', 'title', 'description', 'ser_price', 'active'):
+        if get_history(target, attr).has_changes():
+            invalidate_top_services(connection)
+            return
+
+
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def _category_changed(mapper, connection, target):
+    invalidate_top_services(connection)
+    bump_version(connection, CATEGORY_TREE)
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Subcategory, 'after_insert')
+@event.listens_for(Subcategory, 'after_update')
+@event.listens_for(Subcategory, 'after_delete')
+def _taxonomy_changed(mapper, connection, target):
+    bump_version(connection, CATEGORY_TREE)
@@ -0,0 +1,154 @@
+import atexit
+import time
+from datetime import datetime
+from threading import Lock
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import OperationalError, StatementError
+from flaskapp import db, socketio
+from flaskapp.models import ChatMessage, Order
+from flaskapp.pagination import paginate
+
+
+# Chat messages are broadcast immediately and persisted in batches: the
+# buffer is written with one multi-row INSERT once it holds FLUSH_SIZE
+# messages or its oldest message is FLUSH_INTERVAL seconds old.
+# Every signed-in user may use the global room; an order's room is open to
+# its customer and provider only.
+
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+HISTORY_SIZE = 50
+ROOM_MAX_LENGTH = 100
+MESSAGE_MAX_LENGTH = 2000
+GLOBAL_ROOM = 'global'
+
+
+def order_room(order_id):
+    return f'order_{order_id}'
+
+
+def may_join(user_id, room):
+    """Whether the user may read and post in `room`."""
+    if room == GLOBAL_ROOM:
+        return True
+    prefix, _, order_id = room.partition('_')
+    if prefix != 'order' or not order_id.isdigit():
+        return False
+    return db.session.query(Order.id).filter(
+        Order.id == int(order_id),
+        or_(Order.customer_id == user_id, Order.service_provider_id == user_id),
+    ).first() is not None
+
+
+def clean_text(value, max_length):
+    """`value` stripped if it is a non-empty string of at most `max_length`, else None."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if not value or len(value) > max_length:
+        return None
+    return value
+
+
+class MessageBuffer:
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.lock = Lock()
+        self.pending = []
+        self.oldest = None
+        self.flusher_started = False
+        self.app = None
+
+    def add(self, room, user_id, username, body):
+        message = {
+            'room': room,
+            'user_id': user_id,
+            'username': username,
+            'body': body,
+            'date_posted': datetime.utcnow(),
+        }
+        with self.lock:
+            if self.app is None:
+                self.app = current_app._get_current_object()
+            self.pending.append(message)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            full = len(self.pending) >= self.flush_size
+            if not self.flusher_started:
+                self.flusher_started = True
+                socketio.start_background_task(self._run)
+        if full:
+            self.flush()
+        return message
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending, self.oldest = self.pending, [], None
+        if not batch:
+            return 0
+        with self.app.app_context():
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(ChatMessage.__table__.insert(), batch)
+            except OperationalError:
+                # the database is unavailable: keep the messages for the next attempt
+                with self.lock:
+                    self.pending[:0] = batch
+                    if self.oldest is None:
+                        self.oldest = time.monotonic()
+                raise
+            except StatementError:
+                # some message can't be stored: write the others one by one
+                return self._write_each(batch)
+        return len(batch)
+
+    def _write_each(self, batch):
+        written = 0
+        for message in batch:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(ChatMessage.__table__.insert(), message)
+            except StatementError:
+                self.app.logger.exception('dropped chat message for room %r', message['room'])
+            else:
+                written += 1
+        return written
+
+    def _due(self):
+        with self.lock:
+            return self.oldest is not None and time.monotonic() - self.oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.flush_interval / 2)
+            if self._due():
+                try:
+                    self.flush()
+                except Exception:
+                    self.app.logger.exception('chat flush failed')
+
+
+message_buffer = MessageBuffer()
+atexit.register(message_buffer.flush)
+
+
+def message_payload(message):
+    return {
+        'username': message.username,
+        'msg': message.body,
+        'date_posted': message.date_posted.isoformat(),
+    }
+
+
+def room_history(room, cursor=None, limit=HISTORY_SIZE):
+    """Return (messages oldest first, cursor for the page before them)."""
+    message_buffer.flush()
+    page = paginate(
+        ChatMessage.query.filter(ChatMessage.room == room),
+        [(ChatMessage.id, True)],
+        lambda message: (message.id,),
+        cursor=cursor, limit=limit,
+    )
+    return [message_payload(message) for message in reversed(page.items)], page.next_cursor
@@ -0,0 +1,68 @@
+import logging
+from sqlalchemy import select, update
+from flaskapp import db
+from flaskapp.jobs import enqueue, job
+from flaskapp.models import Complaint, Order, OrderStatus, Service, ServiceProvider
+from flaskapp.notifications import publish_notice
+from flaskapp.rollups import record_transition
+
+
+# Side effects of the admin's complaint decisions, run as jobs so the admin
+# routes only record the decision. There is no payment provider wired up yet:
+# a refund is logged and announced to the customer, and the provider call
+# belongs in refund_order once there is one.
+
+logger = logging.getLogger(__name__)
+
+
+@job('refund_order')
+def refund_order(complaint_id):
+    complaint = db.session.get(Complaint, complaint_id)
+    order = complaint.order
+    logger.info('refunding %.2f for order %s to user %s', order.price, order.id, order.customer_id)
+    publish_notice(order.customer_id, f'You have been refunded ${order.price:.2f} for order #{order.id}.', 'success')
+
+
+@job('warn_provider')
+def warn_provider(complaint_id):
+    complaint = db.session.get(Complaint, complaint_id)
+    order = complaint.order
+    publish_notice(
+        order.service_provider_id,
+        f'Warning: a complaint about order #{order.id} was upheld: {complaint.message}',
+        'warning',
+    )
+
+
+@job('remove_provider')
+def remove_provider(provider_id):
+    provider = db.session.get(ServiceProvider, provider_id)
+    if provider is None or not provider.active:
+        return
+    # open orders are rejected (and their customers told) whatever state
+    # they were in; services that were ordered stay, unlisted, for the order
+    # history
+    open_orders = dict(db.session.execute(
+        select(Order.id, Order.status).where(
+            Order.service_provider_id == provider_id,
+            Order.status.notin_([OrderStatus.completed, OrderStatus.rejected]),
+        )
+    ).all())
+    if open_orders:
+        db.session.execute(
+            update(Order).where(Order.id.in_(open_orders)).values(status=OrderStatus.rejected),
+            execution_options={'synchronize_session': False},
+        )
+        record_transition(open_orders, OrderStatus.rejected)
+        enqueue('notify_orders', order_ids=list(open_orders), kind='status')
+    ordered = Service.orders.any().label('ordered')
+    for service, was_ordered in db.session.query(Service, ordered).filter(Service.provider_id == provider_id):
+        if was_ordered:
+            service.active = False
+        else:
+            db.session.delete(service)
+    # the provider row stays for the order history; unverified, they are no
+    # longer found by customers or dispatch
+    provider.active = False
+    provider.verified = False
+    db.session.commit()
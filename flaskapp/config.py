@@ -0,0 +1,67 @@
+import os
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', '5791728bb0b18ce0c676dfde280ba245')
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # password hashing pool (flaskapp/passwords.py); 0 workers hashes inline,
+    # and more than MAX_PENDING hashes in flight are answered with 429
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 4 * max(PASSWORD_HASH_WORKERS, 1)))
+
+    # SOCKETIO_MESSAGE_QUEUE lets several workers share rooms: tcp://host:port
+    # uses the bundled broker (flaskapp/broker.py), anything else (redis://,
+    # amqp://, ...) is handed to Flask-SocketIO as its message queue
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///site.db')
+    # connection pool, ignored for in-memory SQLite
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING', True)
+    # per-connection PRAGMAs applied when the database is SQLite
+    SQLITE_TUNING = _env_bool('SQLITE_TUNING', True)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # rendered service fragments kept per process (LRU)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 1024))
+    # background jobs (flaskapp/jobs.py) run in the served process: run.py
+    # starts them, other servers set JOB_AUTOSTART. JOB_WORKERS=0 leaves them
+    # to `flask jobs worker`
+    JOB_AUTOSTART = _env_bool('JOB_AUTOSTART', False)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+    # finished jobs are deleted after this many days
+    JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+    # bearer token Prometheus sends to /metrics; unset, only this host may scrape
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # logged-in user snapshots (flaskapp/identity.py); other workers see user
+    # changes within USER_CACHE_TTL seconds, 0 disables the cache
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    # batch dispatch (flaskapp/dispatch.py): how long orders are collected
+    # before a batch runs, and the furthest a provider is sent
+    DISPATCH_WINDOW = float(os.environ.get('DISPATCH_WINDOW', 60))
+    DISPATCH_MAX_KM = float(os.environ.get('DISPATCH_MAX_KM', 25))
+
+
+def engine_options(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
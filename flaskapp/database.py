@@ -0,0 +1,29 @@
+from sqlalchemy import event
+
+
+def tune_sqlite(engine, config):
+    """Set the concurrency PRAGMAs on every new SQLite connection."""
+    if engine.dialect.name != 'sqlite' or not config.get('SQLITE_TUNING'):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run while a writer holds the lock
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.close()
+
+
+def upsert_insert(dialect):
+    """The dialect's insert() with on_conflict_do_update(), or None where there
+    is no ON CONFLICT (callers then UPDATE first and INSERT what is missing)."""
+    if dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
@@ -0,0 +1,295 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import update
+from flaskapp import db, scheduling
+from flaskapp.geo import distance_matrix_km
+from flaskapp.jobs import enqueue, job, queued_job
+from flaskapp.models import Order, OrderStatus, Service, ServiceProvider
+from flaskapp.rollups import order_facts, record_change, record_transition
+
+
+# Batch dispatch. An order placed in dispatch mode waits (Order.dispatch) until
+# a dispatch_orders job for its category runs, DISPATCH_WINDOW seconds after
+# the first such order. The batch then matches every waiting order of the
+# category with at most one verified provider offering it, minimising the
+# total haversine distance between order and provider. Providers further than
+# DISPATCH_MAX_KM or already booked at the order's time are never picked.
+# Orders left without a provider stay with the one they were posted for, or
+# are rejected if that provider has been booked at their time meanwhile.
+# A moved order takes the new provider's service and its price. Every booking
+# is checked again in the database before the batch commits.
+#
+# Config:
+#   DISPATCH_WINDOW  seconds orders are collected before a batch runs (60)
+#   DISPATCH_MAX_KM  furthest a provider is sent, in km (25)
+
+DISPATCH_JOB = 'dispatch_orders'
+# cost of a pair that must not be matched; any real distance is far below it
+UNREACHABLE = 1e9
+
+logger = logging.getLogger(__name__)
+
+
+def solve_assignment(cost):
+    """Minimum cost assignment for a rectangular cost matrix.
+
+    Returns (rows, cols) so that cost[rows, cols].sum() is minimal with every
+    row or every column (whichever there are fewer of) used exactly once.
+    Shortest augmenting paths (Jonker-Volgenant), one path per row, each
+    scanning the columns with whole-row numpy operations.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n)
+    v = np.zeros(m)
+    col4row = np.full(n, -1, dtype=np.int64)
+    row4col = np.full(m, -1, dtype=np.int64)
+    path = np.full(m, -1, dtype=np.int64)
+
+    for cur_row in range(n):
+        shortest = np.full(m, np.inf)
+        # +inf on columns already on the tree, so they are never picked again
+        scanned = np.zeros(m)
+        tree_cols = []
+        min_val = 0.0
+        i = cur_row
+        sink = -1
+        while sink < 0:
+            reduced = cost[i] - v
+            reduced += scanned
+            reduced += min_val - u[i]
+            path[reduced < shortest] = i
+            np.minimum(shortest, reduced, out=shortest)
+            j = int(np.argmin(shortest))
+            min_val = shortest[j]
+            if min_val == np.inf:
+                raise ValueError('cost matrix has no feasible assignment')
+            tree_cols.append((j, min_val))
+            scanned[j] = np.inf
+            shortest[j] = np.inf
+            if row4col[j] < 0:
+                sink = j
+            else:
+                i = row4col[j]
+
+        u[cur_row] += min_val
+        for j, dist in tree_cols:
+            if row4col[j] >= 0:
+                u[row4col[j]] += min_val - dist
+            v[j] -= min_val - dist
+        j = sink
+        while True:
+            i = path[j]
+            row4col[j] = i
+            col4row[i], j = j, col4row[i]
+            if i == cur_row:
+                break
+
+    rows = np.arange(n)
+    return (col4row, rows) if transposed else (rows, col4row)
+
+
+def schedule_dispatch(category_id):
+    """Queue a dispatch batch for the category unless one is already waiting."""
+    if queued_job(DISPATCH_JOB, category_id=category_id) is None:
+        enqueue(DISPATCH_JOB, delay=current_app.config.get('DISPATCH_WINDOW', 60), category_id=category_id)
+
+
+def _candidates(category_id):
+    # each verified, located provider offering the category, with their best
+    # rated service in it
+    rows = (
+        db.session.query(
+            Service.provider_id, Service.id, Service.duration, Service.ser_price,
+            ServiceProvider.latitude, ServiceProvider.longitude,
+        )
+        .join(ServiceProvider, Service.provider_id == ServiceProvider.id)
+        .filter(
+            Service.category_id == category_id,
+            ServiceProvider.verified.is_(True),
+            ServiceProvider.latitude.isnot(None),
+            ServiceProvider.longitude.isnot(None),
+        )
+        .order_by(Service.provider_id, Service.rating_score.desc(), Service.id)
+        .all()
+    )
+    best = {}
+    for row in rows:
+        best.setdefault(row.provider_id, row)
+    return list(best.values())
+
+
+def _overlaps(booked, start, end):
+    return any(start < other_end and other_start < end for other_start, other_end in booked)
+
+
+def dispatch_batch(category_id):
+    """Assign the waiting orders of a category and commit.
+
+    Returns (assigned, kept, rejected): orders moved to a new provider, orders
+    left with the provider they were posted for and orders rejected because
+    that provider is booked at their time by then.
+    """
+    orders = (
+        db.session.query(
+            Order.id, Order.service_provider_id, Order.order_datetime, Order.latitude, Order.longitude,
+            Service.duration,
+        )
+        .join(Service, Order.ser_id == Service.id)
+        .filter(Order.dispatch.is_(True), Order.status == OrderStatus.pending, Service.category_id == category_id)
+        .order_by(Order.id)
+        .all()
+    )
+    if not orders:
+        return 0, 0, 0
+    providers = _candidates(category_id)
+    # the waiting orders still book the provider they were posted for; they
+    # must not stand in their own way
+    waiting = {order.id for order in orders}
+
+    assigned = {}
+    if providers:
+        cost = distance_matrix_km(
+            [order.latitude for order in orders], [order.longitude for order in orders],
+            [provider.latitude for provider in providers], [provider.longitude for provider in providers],
+        )
+        cost[cost > current_app.config.get('DISPATCH_MAX_KM', 25)] = UNREACHABLE
+        for col, provider in enumerate(providers):
+            rows = np.flatnonzero(cost[:, col] < UNREACHABLE)
+            bookings = [(orders[row].order_datetime, provider.duration) for row in rows]
+            for row, conflict in zip(rows, scheduling.find_conflicts(provider.provider_id, bookings, ignore=waiting)):
+                if conflict is not None:
+                    cost[row, col] = UNREACHABLE
+        for row, col in zip(*solve_assignment(cost)):
+            if cost[row, col] < UNREACHABLE:
+                assigned[orders[row].id] = providers[col]
+
+    # the calendars can miss a booking another worker committed a moment ago;
+    # every booking below is checked again in the database, with the
+    # providers involved locked in id order
+    for provider_id in sorted({provider.provider_id for provider in assigned.values()}
+                              | {order.service_provider_id for order in orders}):
+        scheduling.lock_provider(provider_id)
+
+    before = order_facts(assigned)
+    moved = []
+    # what this batch books, per provider: [(start, end)]
+    booked = defaultdict(list)
+    for order in orders:
+        provider = assigned.get(order.id)
+        if provider is None:
+            continue
+        if scheduling.booked_overlap(
+            provider.provider_id, order.order_datetime, provider.duration, exclude=waiting,
+        ) is not None:
+            continue
+        # the order now books the new provider's service, at its price
+        updated = db.session.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.dispatch.is_(True), Order.status == OrderStatus.pending)
+            .values(
+                service_provider_id=provider.provider_id, ser_id=provider.id, price=provider.ser_price,
+                dispatch=False, booking_seq=scheduling.next_booking_seq(),
+            ),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        if updated:
+            moved.append(order.id)
+            booked[provider.provider_id].append(
+                (order.order_datetime, order.order_datetime + timedelta(minutes=provider.duration))
+            )
+
+    # the rest go back to the provider they were posted for, unless that
+    # provider has been booked at their time since
+    rest = [order for order in orders if order.id not in moved]
+    by_provider = defaultdict(list)
+    for order in rest:
+        by_provider[order.service_provider_id].append(order)
+    conflicted = []
+    for provider_id, provider_orders in by_provider.items():
+        conflicts = scheduling.find_conflicts(
+            provider_id, [(order.order_datetime, order.duration) for order in provider_orders], ignore=waiting,
+        )
+        for order, conflict in zip(provider_orders, conflicts):
+            start, end = order.order_datetime, order.order_datetime + timedelta(minutes=order.duration)
+            if (
+                conflict is not None
+                or _overlaps(booked[provider_id], start, end)
+                or scheduling.booked_overlap(provider_id, start, order.duration, exclude=waiting) is not None
+            ):
+                conflicted.append(order.id)
+            else:
+                booked[provider_id].append((start, end))
+    rejected = []
+    for order_id in conflicted:
+        updated = db.session.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.dispatch.is_(True), Order.status == OrderStatus.pending)
+            .values(status=OrderStatus.rejected, dispatch=False),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        if updated:
+            rejected.append(order_id)
+    kept = [order.id for order in rest if order.id not in rejected]
+    db.session.execute(
+        update(Order)
+        .where(Order.id.in_(kept), Order.dispatch.is_(True))
+        .values(dispatch=False),
+        execution_options={'synchronize_session': False},
+    )
+    record_change([fact for fact in before if fact.id in moved])
+    record_transition(dict.fromkeys(rejected, OrderStatus.pending), OrderStatus.rejected)
+    enqueue('notify_orders', order_ids=moved + kept, kind='created')
+    if rejected:
+        # tells the customer their order was turned down
+        enqueue('notify_orders', order_ids=rejected, kind='status')
+    db.session.commit()
+
+    scheduling.reload(
+        {order.service_provider_id for order in orders}
+        | {assigned[order_id].provider_id for order_id in moved}
+    )
+    return len(moved), len(kept), len(rejected)
+
+
+@job(DISPATCH_JOB)
+def dispatch_orders(category_id):
+    assigned, kept, rejected = dispatch_batch(category_id)
+    logger.info(
+        'dispatched category %s: %s assigned, %s left with their provider, %s rejected',
+        category_id, assigned, kept, rejected,
+    )
+
+
+dispatch_cli = AppGroup('dispatch', help='Route dispatch-mode orders to providers.')
+
+
+@dispatch_cli.command('run')
+@click.option('--category', 'category_id', type=int, default=None, help='Only this category.')
+def run_command(category_id):
+    """Dispatch every waiting order now."""
+    if category_id is None:
+        category_ids = [
+            row[0] for row in
+            db.session.query(Service.category_id)
+            .join(Order, Order.ser_id == Service.id)
+            .filter(Order.dispatch.is_(True), Order.status == OrderStatus.pending)
+            .distinct()
+        ]
+    else:
+        category_ids = [category_id]
+    for category_id in category_ids:
+        assigned, kept, rejected = dispatch_batch(category_id)
+        click.echo(f'category {category_id}: {assigned} assigned, {kept} left with their provider, {rejected} rejected')
+
+
+def init_app(app):
+    app.cli.add_command(dispatch_cli)
@@ -4,6 +4,7 @@ from flask_login import current_user
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, IntegerField, TextAreaField, SelectField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, NumberRange
 from flaskapp.models import User
+from flaskapp.cache import category_tree
 
 
 class RegistrationForm(FlaskForm):
@@ -61,10 +62,22 @@ class SubcategoryForm(FlaskForm):
     category = SelectField('Category', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Add Subcategory')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.category.choices = category_tree().category_choices()
+
 class DeleteCategoryForm(FlaskForm):
     category = SelectField('Category', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Delete Category')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.category.choices = category_tree().category_choices()
+
 class DeleteSubcategoryForm(FlaskForm):
     subcategory = SelectField('Subcategory', coerce=int, validators=[DataRequired()])
-    submit = SubmitField('Delete Subcategory')
\ No newline at end of file
+    submit = SubmitField('Delete Subcategory')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subcategory.choices = category_tree().subcategory_choices()
\ No newline at end of file
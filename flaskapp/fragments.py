@@ -0,0 +1,115 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from flask import abort, current_app, make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history
+from werkzeug.http import is_resource_modified
+from flaskapp import db
+from flaskapp.models import Service
+
+
+# Service pages (details, order form) are served from a version stamp: one
+# primary key lookup reads Service.version/date_modified, which answers
+# conditional GETs with a 304 and keys the rendered service summary in a
+# size-bounded LRU. Editing a service bumps its version, so stale entries
+# are never hit again and simply age out.
+
+
+class FragmentCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, render):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = render()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+def _render_summary(service_id):
+    service = db.session.get(Service, service_id)
+    return Markup(render_template('_service_summary.html', details=service))
+
+
+def _etag(template, stamp, context):
+    # the page around the fragment depends on who is asking and on the
+    # template context (e.g. the referrer used by the Back button)
+    parts = [template, stamp.id, stamp.version, current_user.get_id() or '-']
+    parts += [f'{name}={context[name]}' for name in sorted(context)]
+    return hashlib.sha1('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def render_service_page(template, service_id, **context):
+    stamp = (
+        db.session.query(Service.id, Service.user_id, Service.version, Service.date_modified)
+        .filter(Service.id == service_id, Service.active.is_(True))
+        .first()
+    )
+    if stamp is None:
+        abort(404)
+
+    # pending flash messages are shown once, so that page can't be reused
+    cacheable = not session.get('_flashes')
+    etag = _etag(template, stamp, context)
+    if cacheable and not is_resource_modified(request.environ, etag=etag, last_modified=stamp.date_modified):
+        response = current_app.response_class(status=304)
+    else:
+        summary = fragment_cache.get_or_render(
+            ('service_summary', stamp.id, stamp.version),
+            lambda: _render_summary(stamp.id),
+        )
+        response = make_response(render_template(template, details=stamp, summary=summary, **context))
+    if cacheable:
+        response.set_etag(etag)
+        response.last_modified = stamp.date_modified
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+    return response
+
+
+@event.listens_for(Service, 'before_update')
+def _bump_version(mapper, connection, target):
+    if any(get_history(target, attr.key).has_changes() for attr in mapper.column_attrs):
+        # done in SQL so concurrent writers can't hand out the same version
+        target.version = Service.version + 1
+        target.date_modified = datetime.utcnow()
+
+
+def init_app(app):
+    fragment_cache.maxsize = app.config.get('FRAGMENT_CACHE_SIZE', fragment_cache.maxsize)
@@ -0,0 +1,236 @@
+import logging
+import math
+from threading import Lock
+import numpy as np
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import get_history
+from flaskapp import db
+from flaskapp.models import Service, ServiceProvider
+
+
+# Nearest-provider lookups over ServiceProvider.latitude/longitude.
+# Candidates come from an SQLite R-tree (service_provider_geo, id == provider id)
+# cut to the bounding box of the search radius; plain databases fall back to a
+# range query on the lat/lon index. Exact distances are then computed with a
+# vectorised haversine over the candidate set.
+# The R-tree is made by the migration or alongside the service_provider table
+# by create_all, and kept in step by the mapper events.
+
+GEO_TABLE = 'service_provider_geo'
+EARTH_RADIUS_KM = 6371.0088
+# the R-tree stores 32-bit floats, pad boxes so rounding never drops a point
+BOX_PADDING_DEG = 1e-4
+
+_backend = None
+_backend_lock = Lock()
+_checked = False
+
+logger = logging.getLogger(__name__)
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_matrix_km(lats, lons, other_lats, other_lons):
+    """Haversine distances between every (lats[i], lons[i]) and (other_lats[j], other_lons[j])."""
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lons, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(other_lats, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(other_lons, dtype=np.float64))[None, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat, lon, radius_km):
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # the circle covers a pole, every longitude is in range
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    delta_lon = math.degrees(math.asin(math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180 or max_lon > 180:
+        # crossing the antimeridian, widen instead of splitting the box
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def nearest_providers(lat, lon, category_id=None, radius_km=10.0, k=10):
+    """Return up to `k` (ServiceProvider, distance_km) pairs, closest first."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    min_lat -= BOX_PADDING_DEG
+    max_lat += BOX_PADDING_DEG
+    min_lon -= BOX_PADDING_DEG
+    max_lon += BOX_PADDING_DEG
+
+    query = db.session.query(ServiceProvider.id, ServiceProvider.latitude, ServiceProvider.longitude)
+    if _get_backend(db.session.connection()) == 'rtree':
+        _check_filled()
+        boxed = (
+            text(
+                f'SELECT id FROM {GEO_TABLE} '
+                f'WHERE min_lat <= :max_lat AND max_lat >= :min_lat '
+                f'AND min_lon <= :max_lon AND max_lon >= :min_lon'
+            )
+            .bindparams(min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+            .columns(id=db.Integer)
+        )
+        # IN, not a join: with a join SQLite walks every verified provider and
+        # probes the R-tree by id instead of searching it by the box
+        query = query.filter(ServiceProvider.id.in_(boxed))
+    else:
+        query = query.filter(
+            ServiceProvider.latitude.between(min_lat, max_lat),
+            ServiceProvider.longitude.between(min_lon, max_lon),
+        )
+    query = query.filter(ServiceProvider.verified.is_(True))
+    if category_id is not None:
+        query = query.filter(
+            db.session.query(Service.id)
+            .filter(Service.provider_id == ServiceProvider.id, Service.category_id == category_id)
+            .exists()
+        )
+
+    candidates = query.all()
+    if not candidates:
+        return []
+    ids = np.fromiter((row[0] for row in candidates), dtype=np.int64, count=len(candidates))
+    lats = np.fromiter((row[1] for row in candidates), dtype=np.float64, count=len(candidates))
+    lons = np.fromiter((row[2] for row in candidates), dtype=np.float64, count=len(candidates))
+
+    distances = haversine_km(lat, lon, lats, lons)
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > k:
+        inside = inside[np.argpartition(distances[inside], k - 1)[:k]]
+    inside = inside[np.argsort(distances[inside], kind='stable')]
+
+    nearest_ids = [int(i) for i in ids[inside]]
+    providers = {p.id: p for p in ServiceProvider.query.filter(ServiceProvider.id.in_(nearest_ids))}
+    return [(providers[i], float(d)) for i, d in zip(nearest_ids, distances[inside])]
+
+
+def rebuild_index():
+    global _backend
+    with _backend_lock:
+        _backend = None
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        create_rtree_table(connection)
+    if _get_backend(connection) == 'rtree':
+        connection.execute(text(f'DELETE FROM {GEO_TABLE}'))
+        _fill_rtree(connection)
+    db.session.commit()
+
+
+def create_rtree_table(connection):
+    try:
+        connection.execute(text(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {GEO_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+        ))
+    except OperationalError:
+        # SQLite built without the R-tree module, lookups use the range query
+        return False
+    return True
+
+
+def _get_backend(connection):
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _detect_backend(connection)
+        return _backend
+
+
+def _detect_backend(connection):
+    if connection.dialect.name != 'sqlite':
+        return 'range'
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': GEO_TABLE},
+    ).first()
+    return 'rtree' if exists else 'range'
+
+
+def _check_filled():
+    # once per process: an empty R-tree next to located providers was never
+    # filled (or lost its fill), rebuild it in a transaction of its own
+    global _checked
+    if _checked:
+        return
+    empty = db.session.connection().execute(text(
+        f'SELECT NOT EXISTS (SELECT 1 FROM {GEO_TABLE}) AND EXISTS ('
+        f'SELECT 1 FROM service_provider WHERE latitude IS NOT NULL AND longitude IS NOT NULL)'
+    )).scalar()
+    if empty:
+        try:
+            with db.engine.begin() as own:
+                own.execute(text(f'DELETE FROM {GEO_TABLE}'))
+                _fill_rtree(own)
+        except OperationalError:
+            logger.warning('could not fill %s, retrying on the next lookup', GEO_TABLE, exc_info=True)
+            return
+    _checked = True
+
+
+def _fill_rtree(connection):
+    connection.execute(text(
+        f'INSERT INTO {GEO_TABLE} (id, min_lat, max_lat, min_lon, max_lon) '
+        f'SELECT id, latitude, latitude, longitude, longitude FROM service_provider '
+        f'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+    ))
+
+
+@event.listens_for(ServiceProvider.__table__, 'after_create')
+def _provider_table_created(table, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_rtree_table(connection)
+
+
+@event.listens_for(ServiceProvider.__table__, 'after_drop')
+def _provider_table_dropped(table, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {GEO_TABLE}'))
+
+
+def _sync_provider(connection, target):
+    if _get_backend(connection) != 'rtree':
+        return
+    connection.execute(text(f'DELETE FROM {GEO_TABLE} WHERE id = :id'), {'id': target.id})
+    if target.latitude is not None and target.longitude is not None:
+        connection.execute(
+            text(
+                f'INSERT INTO {GEO_TABLE} (id, min_lat, max_lat, min_lon, max_lon) '
+                f'VALUES (:id, :lat, :lat, :lon, :lon)'
+            ),
+            {'id': target.id, 'lat': target.latitude, 'lon': target.longitude},
+        )
+
+
+@event.listens_for(ServiceProvider, 'after_insert')
+def _provider_inserted(mapper, connection, target):
+    _sync_provider(connection, target)
+
+
+@event.listens_for(ServiceProvider, 'after_update')
+def _provider_updated(mapper, connection, target):
+    if get_history(target, 'latitude').has_changes() or get_history(target, 'longitude').has_changes():
+        _sync_provider(connection, target)
+
+
+@event.listens_for(ServiceProvider, 'after_delete')
+def _provider_deleted(mapper, connection, target):
+    if _get_backend(connection) == 'rtree':
+        connection.execute(text(f'DELETE FROM {GEO_TABLE} WHERE id = :id'), {'id': target.id})
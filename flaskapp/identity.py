@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from flaskapp import db, login_manager
+from flaskapp.models import User
+
+
+# Flask-Login loads the user on every authenticated request and Socket.IO
+# event. The loader hands out a read-only UserSnapshot kept in a small
+# TTL/LRU cache instead of a User row; code that changes a user loads the
+# row itself. Changes made through the ORM evict the snapshot here, other
+# workers pick them up once USER_CACHE_TTL runs out; admin-only routes don't
+# wait for that and read User.is_admin from the database.
+#
+# Config:
+#   USER_CACHE_TTL   seconds a snapshot is trusted, 0 disables the cache (60)
+#   USER_CACHE_SIZE  snapshots kept per process (10000)
+
+
+class UserSnapshot(UserMixin):
+    def __init__(self, id, username, email, is_admin, image_file):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = is_admin
+        self.image_file = image_file
+
+    def __repr__(self):
+        return f"UserSnapshot({self.id}, '{self.username}')"
+
+
+class IdentityCache:
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, snapshot):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+user_cache = IdentityCache()
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        row = (
+            db.session.query(User.id, User.username, User.email, User.is_admin, User.image_file)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        snapshot = UserSnapshot(*row)
+        user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    user_cache.discard(target.id)
+    # and again after the commit, in case a concurrent request cached the
+    # old row between this flush and the commit
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_users', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_committed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        user_cache.discard(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
+
+def init_app(app):
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', user_cache.ttl)
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', user_cache.maxsize)
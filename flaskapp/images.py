@@ -0,0 +1,100 @@
+import hashlib
+import os
+from flask import send_from_directory, url_for
+from flaskapp.jobs import enqueue, job
+from flaskapp.models import User
+
+
+# Profile pictures are stored under their content hash, so re-uploading the
+# same image costs nothing and every URL can be cached forever. The upload
+# request only writes the original; resized copies (plus WebP versions) are
+# made by a process_picture job and used once they exist.
+
+PICTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'profile_pics')
+DEFAULT_PICTURE = 'default.jpg'
+SIZES = (125, 250)
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+NAME_LENGTH = User.image_file.type.length
+# spellings stored under one extension
+EXTENSIONS = {'.jpeg': '.jpg'}
+
+
+def variant_name(picture_fn, size, ext=None):
+    stem, original_ext = os.path.splitext(picture_fn)
+    return f'{stem}_{size}{ext or original_ext}'
+
+
+def save_picture(form_picture):
+    data = form_picture.read()
+    _, f_ext = os.path.splitext(form_picture.filename)
+    f_ext = EXTENSIONS.get(f_ext.lower(), f_ext.lower())
+    # the whole name has to fit in User.image_file
+    picture_fn = hashlib.sha256(data).hexdigest()[:NAME_LENGTH - len(f_ext)] + f_ext
+    picture_path = os.path.join(PICTURE_DIR, picture_fn)
+    if not os.path.exists(picture_path):
+        _write_atomic(picture_path, data)
+    if not _variants_ready(picture_fn):
+        enqueue('process_picture', picture_fn=picture_fn)
+    return picture_fn
+
+
+def picture_urls(picture_fn, size=SIZES[0]):
+    """Return (url, webp url or None) for showing `picture_fn` at `size`."""
+    if not picture_fn or picture_fn == DEFAULT_PICTURE:
+        return url_for('static', filename='profile_pics/' + DEFAULT_PICTURE), None
+    resized = variant_name(picture_fn, size)
+    if os.path.exists(os.path.join(PICTURE_DIR, resized)):
+        webp = variant_name(picture_fn, size, '.webp')
+        webp_url = None
+        if os.path.exists(os.path.join(PICTURE_DIR, webp)):
+            webp_url = url_for('accounts.profile_picture', filename=webp)
+        return url_for('accounts.profile_picture', filename=resized), webp_url
+    # still being processed, the original is already on disk
+    return url_for('accounts.profile_picture', filename=picture_fn), None
+
+
+def serve_picture(filename):
+    response = send_from_directory(PICTURE_DIR, filename, max_age=CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+def _variants_ready(picture_fn):
+    return all(
+        os.path.exists(os.path.join(PICTURE_DIR, variant_name(picture_fn, size, ext)))
+        for size in SIZES
+        for ext in (None, '.webp')
+    )
+
+
+@job('process_picture')
+def process_picture(picture_fn):
+    from PIL import Image
+
+    if _variants_ready(picture_fn):
+        return
+    with Image.open(os.path.join(PICTURE_DIR, picture_fn)) as original:
+        original.load()
+        for size in SIZES:
+            i = original.copy()
+            i.thumbnail((size, size))
+            _save_atomic(i, variant_name(picture_fn, size))
+            _save_atomic(i, variant_name(picture_fn, size, '.webp'), format='WEBP')
+
+
+def _save_atomic(image, filename, format=None):
+    path = os.path.join(PICTURE_DIR, filename)
+    tmp_path = path + '.tmp'
+    image.save(tmp_path, format=format or _format_for(filename))
+    os.replace(tmp_path, path)
+
+
+def _format_for(filename):
+    return {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}[os.path.splitext(filename)[1].lower()]
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
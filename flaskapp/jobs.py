@@ -0,0 +1,329 @@
+import json
+import logging
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, update
+from sqlalchemy.orm import Session
+from flaskapp import db, socketio
+from flaskapp.models import Job
+
+
+# Deferred side effects. enqueue() adds a Job row to the current session, so
+# the job is stored by the same commit as the change that caused it; once that
+# commit lands the job is handed to the app's thread pool, if the process runs
+# one. Failed jobs are retried with exponential backoff, and a poller picks up
+# retries, jobs queued by other processes or before a restart and jobs whose
+# worker died. It also deletes finished jobs once they are old enough.
+# Only the served process runs the pool and the poller: run.py starts them,
+# other servers set JOB_AUTOSTART. CLI commands, migrations and tests leave
+# their jobs queued, and `flask jobs worker` can run them anywhere.
+#
+# Config:
+#   JOB_AUTOSTART       start the pool and poller with the app (off)
+#   JOB_WORKERS         worker threads in the served process, 0 for none (2)
+#   JOB_MAX_ATTEMPTS    attempts before a job is marked failed (5)
+#   JOB_POLL_INTERVAL   seconds between polls for due jobs (5)
+#   JOB_LEASE_SECONDS   a running job older than this is assumed dead (300)
+#   JOB_RETENTION_DAYS  done and failed jobs are deleted after this long (7)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+# seconds between purges of finished jobs
+PURGE_INTERVAL = 3600
+
+logger = logging.getLogger(__name__)
+
+handlers = {}
+
+_metrics_lock = Lock()
+_metrics = Counter()
+
+
+def job(name):
+    """Register the decorated function as the handler for jobs called `name`."""
+    def decorator(func):
+        handlers[name] = func
+        return func
+    return decorator
+
+
+def _count(key, n=1):
+    with _metrics_lock:
+        _metrics[key] += n
+
+
+def job_metrics():
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def encode_payload(kwargs):
+    # one spelling per set of arguments, so queued jobs can be looked up by it
+    return json.dumps(kwargs, sort_keys=True)
+
+
+def queued_job(name, **kwargs):
+    """Id of a job `name(**kwargs)` still waiting to run, or None."""
+    return (
+        db.session.query(Job.id)
+        .filter(Job.name == name, Job.status == QUEUED, Job.payload == encode_payload(kwargs))
+        .scalar()
+    )
+
+
+def enqueue(name, delay=0, max_attempts=None, **kwargs):
+    """Queue `name(**kwargs)`; it runs after the current session commits."""
+    if name not in handlers:
+        raise KeyError(f'no job handler named {name!r}')
+    entry = Job(
+        name=name,
+        payload=encode_payload(kwargs),
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 5),
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(entry)
+    db.session.info.setdefault('queued_jobs', []).append(entry)
+    _count('enqueued')
+    return entry
+
+
+def run_job(job_id):
+    """Claim and run one job in the current app context. Returns its final status or None."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == QUEUED, Job.run_at <= now)
+        .values(status=RUNNING, attempts=Job.attempts + 1, locked_at=now),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+
+    entry = db.session.get(Job, job_id)
+    name, payload = entry.name, json.loads(entry.payload)
+    try:
+        handler = handlers[name]
+        handler(**payload)
+    except Exception:
+        db.session.rollback()
+        entry = db.session.get(Job, job_id)
+        entry.last_error = traceback.format_exc(limit=5)
+        entry.locked_at = None
+        if entry.attempts >= entry.max_attempts:
+            entry.status = FAILED
+            entry.date_finished = datetime.utcnow()
+            _count('failed')
+            logger.exception('job %s (%s) failed for good', job_id, name)
+        else:
+            entry.status = QUEUED
+            entry.run_at = datetime.utcnow() + timedelta(seconds=2 ** entry.attempts)
+            _count('retried')
+            logger.warning('job %s (%s) failed, retrying in %ss', job_id, name, 2 ** entry.attempts)
+    else:
+        entry = db.session.get(Job, job_id)
+        entry.status = DONE
+        entry.locked_at = None
+        entry.date_finished = datetime.utcnow()
+        _count('succeeded')
+    db.session.commit()
+    return entry.status
+
+
+def due_jobs(limit=100):
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    # give up on workers that died holding a job
+    db.session.execute(
+        update(Job)
+        .where(Job.status == RUNNING, Job.locked_at < now - lease)
+        .values(status=QUEUED, locked_at=None),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    return db.session.scalars(
+        db.select(Job.id)
+        .where(Job.status == QUEUED, Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+    ).all()
+
+
+def purge_jobs(days):
+    """Delete done and failed jobs that finished more than `days` days ago. Returns how many."""
+    count = db.session.execute(
+        delete(Job).where(
+            Job.status.in_((DONE, FAILED)), Job.date_finished < datetime.utcnow() - timedelta(days=days),
+        ),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+class JobQueue:
+    """The worker pool and poller of one app; idle until start()."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = Lock()
+        self.executor = None
+        self.last_purge = None
+
+    def start(self):
+        """Start the workers and the poller, unless JOB_WORKERS is 0."""
+        workers = self.app.config.get('JOB_WORKERS', 2)
+        with self.lock:
+            if self.executor is not None or not workers:
+                return
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+        socketio.start_background_task(self._poll)
+
+    def submit(self, job_ids):
+        # not started: the jobs wait for a process that runs them
+        if self.executor is None:
+            return
+        for job_id in job_ids:
+            self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                run_job(job_id)
+            except Exception:
+                logger.exception('job %s could not be run', job_id)
+
+    def _poll(self):
+        while True:
+            socketio.sleep(self.app.config.get('JOB_POLL_INTERVAL', 5))
+            try:
+                with self.app.app_context():
+                    job_ids = due_jobs()
+                    if self.last_purge is None or time.monotonic() - self.last_purge >= PURGE_INTERVAL:
+                        self.last_purge = time.monotonic()
+                        purge_jobs(self.app.config.get('JOB_RETENTION_DAYS', 7))
+                self.submit(job_ids)
+            except Exception:
+                logger.exception('polling for jobs failed')
+
+
+def start(app):
+    """Run the app's jobs in this process from now on."""
+    app.extensions['jobs'].start()
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_committed_jobs(session):
+    entries = session.info.pop('queued_jobs', None)
+    if entries:
+        current_app.extensions['jobs'].submit([db.inspect(entry).identity[0] for entry in entries])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_jobs(session):
+    session.info.pop('queued_jobs', None)
+
+
+jobs_cli = AppGroup('jobs', help='Inspect and run the background job queue.')
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Show job counts by status."""
+    counts = dict(db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    for status in STATUSES:
+        click.echo(f'{status:8} {counts.get(status, 0)}')
+
+
+@jobs_cli.command('list')
+@click.option('--status', type=click.Choice(STATUSES), default=None)
+@click.option('--limit', default=20, show_default=True)
+def list_command(status, limit):
+    """List the most recent jobs."""
+    query = Job.query.order_by(Job.id.desc())
+    if status:
+        query = query.filter(Job.status == status)
+    for entry in query.limit(limit):
+        error = (entry.last_error or '').strip().splitlines()[-1:] or ['']
+        click.echo(f'{entry.id:6} {entry.name:20} {entry.status:8} {entry.attempts}/{entry.max_attempts} {entry.run_at:%Y-%m-%d %H:%M:%S} {error[0]}')
+
+
+@jobs_cli.command('drain')
+@click.option('--wait/--no-wait', default=False, help='Also wait for jobs scheduled for a retry.')
+def drain_command(wait):
+    """Run queued jobs in this process until the queue is empty."""
+    ran = Counter()
+    while True:
+        job_ids = due_jobs()
+        for job_id in job_ids:
+            ran[run_job(job_id)] += 1
+        if job_ids:
+            continue
+        pending = db.session.query(func.min(Job.run_at)).filter(Job.status == QUEUED).scalar()
+        if not wait or pending is None:
+            break
+        time.sleep(max((pending - datetime.utcnow()).total_seconds(), 0.1))
+    ran.pop(None, None)
+    click.echo(', '.join(f'{n} {status}' for status, n in sorted(ran.items())) or 'nothing to do')
+
+
+@jobs_cli.command('worker')
+def worker_command():
+    """Run jobs in this process as they come due, until interrupted."""
+    interval = current_app.config.get('JOB_POLL_INTERVAL', 5)
+    last_purge = None
+    while True:
+        if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+            last_purge = time.monotonic()
+            purge_jobs(current_app.config.get('JOB_RETENTION_DAYS', 7))
+        job_ids = due_jobs()
+        for job_id in job_ids:
+            run_job(job_id)
+        if not job_ids:
+            time.sleep(interval)
+
+
+@jobs_cli.command('purge')
+@click.option('--days', type=float, default=None, help='Age in days; defaults to JOB_RETENTION_DAYS.')
+def purge_command(days):
+    """Delete finished jobs older than the retention period."""
+    count = purge_jobs(current_app.config.get('JOB_RETENTION_DAYS', 7) if days is None else days)
+    click.echo(f'{count} job(s) deleted')
+
+
+@jobs_cli.command('retry')
+@click.argument('job_ids', type=int, nargs=-1)
+@click.option('--failed', 'all_failed', is_flag=True, help='Retry every failed job.')
+def retry_command(job_ids, all_failed):
+    """Queue failed jobs again."""
+    criteria = [Job.status == FAILED]
+    if not all_failed:
+        criteria.append(Job.id.in_(job_ids))
+    count = db.session.execute(
+        update(Job).where(*criteria).values(status=QUEUED, attempts=0, run_at=datetime.utcnow(), date_finished=None),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    click.echo(f'{count} job(s) queued again')
+
+
+def init_app(app):
+    # modules defining jobs, so any process can run every queued job
+    from flaskapp import complaints, dispatch, images, notifications
+
+    app.cli.add_command(jobs_cli)
+    app.extensions['jobs'] = JobQueue(app)
+    if app.config.get('JOB_AUTOSTART'):
+        start(app)
@@ -0,0 +1,224 @@
+import http.cookiejar
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flask.cli import AppGroup
+from flaskapp import db
+from flaskapp.models import Service, ServiceProvider, User
+from flaskapp.synthetic import WORDS
+
+
+# Load test for a running server: `flask loadtest run` signs in a pool of
+# synthetic customers and providers (see flaskapp/synthetic.py), then drives
+# the hot routes from concurrent threads for a fixed time and reports latency
+# percentiles and throughput per route. --max-p95 / --max-error-rate make it
+# fail (exit code 1) so it can gate a build.
+
+# route -> share of requests; provider pages are only sent by providers
+MIX = {
+    'home': 0.20,
+    'search_result': 0.25,
+    'alluserorders': 0.15,
+    'notification': 0.15,
+    'accepted_orders': 0.15,
+    'submitOrder': 0.10,
+}
+PROVIDER_ROUTES = ('notification', 'accepted_orders')
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # time the route itself, not the page it redirects to
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, base_url, email, password, is_provider, service_ids, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.password = password
+        self.is_provider = is_provider
+        self.service_ids = service_ids
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect,
+        )
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def login(self):
+        _, page = self.request('/login')
+        match = CSRF_RE.search(page.decode('utf-8', 'replace'))
+        form = {'email': self.email, 'password': self.password, 'submit': 'Login'}
+        if match:
+            form['csrf_token'] = match.group(1) or match.group(2)
+        status, _ = self.request('/login', form)
+        # a successful sign-in redirects home, a failed one renders the form again
+        return status == 302
+
+    def next_request(self, rng):
+        routes = [route for route in MIX if self.is_provider or route not in PROVIDER_ROUTES]
+        weights = np.array([MIX[route] for route in routes])
+        route = routes[rng.choice(len(routes), p=weights / weights.sum())]
+        if route == 'search_result':
+            params = {'query': ' '.join(rng.choice(WORDS, size=int(rng.integers(1, 3)), replace=False))}
+            if rng.random() < 0.3:
+                params['max_price'] = int(rng.integers(20, 200))
+            if rng.random() < 0.2:
+                params['rating'] = int(rng.integers(1, 5))
+            return route, '/search_result?' + urllib.parse.urlencode(params), None
+        if route == 'submitOrder':
+            start = datetime.utcnow() + timedelta(days=int(rng.integers(30, 365)), hours=int(rng.integers(0, 24)))
+            service_id = int(rng.choice(self.service_ids))
+            return route, '/submitOrder', {
+                'location': 'load test', 'datetime': start.strftime('%Y-%m-%dT%H:00'),
+                'price': '10', 'service_id': service_id, 'service_provider_id': '0',
+            }
+        return route, '/' + route, None
+
+
+def _percentiles(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return p50, p95, p99
+
+
+def run_load(vusers, duration, seed=0):
+    """Run every virtual user in its own thread for `duration` seconds.
+
+    Returns ({route: [(latency_s, status), ...]}, elapsed_s).
+    """
+    results = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index, vuser):
+        rng = np.random.default_rng(seed + index)
+        samples = defaultdict(list)
+        while time.perf_counter() < deadline:
+            route, path, data = vuser.next_request(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = vuser.request(path, data)
+            except OSError:
+                status = 0
+            samples[route].append((time.perf_counter() - started, status))
+        with lock:
+            for route, values in samples.items():
+                results[route].extend(values)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n, vuser), daemon=True) for n, vuser in enumerate(vusers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """Per-route and overall count, errors, throughput and p50/p95/p99 in ms."""
+    report = {}
+    everything = []
+    for route in list(MIX) + ['all']:
+        samples = everything if route == 'all' else results.get(route, [])
+        if route != 'all':
+            everything.extend(samples)
+        if not samples:
+            continue
+        latencies = np.array([latency for latency, _ in samples])
+        errors = sum(1 for _, status in samples if status == 0 or status >= 500)
+        p50, p95, p99 = _percentiles(latencies)
+        report[route] = {
+            'requests': len(samples), 'errors': errors, 'rps': len(samples) / elapsed,
+            'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': latencies.max() * 1000,
+        }
+    return report
+
+
+loadtest_cli = AppGroup('loadtest', help='Drive a running server with synthetic users.')
+
+
+@loadtest_cli.command('run')
+@click.option('--url', default='http://127.0.0.1:5000', show_default=True, help='Server to test.')
+@click.option('--concurrency', default=20, show_default=True, type=click.IntRange(1), help='Virtual users.')
+@click.option('--duration', default=30.0, show_default=True, help='Seconds to run.')
+@click.option('--provider-share', default=0.3, show_default=True, help='Share of virtual users that are providers.')
+@click.option('--password', default='password', show_default=True, help='Password of the synthetic users.')
+@click.option('--timeout', default=10.0, show_default=True, help='Seconds before a request counts as failed.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+@click.option('--max-p95', type=float, default=None, help='Fail if the overall p95 is above this many ms.')
+@click.option('--max-error-rate', type=float, default=None, help='Fail if more than this share of requests fail.')
+def run_command(url, concurrency, duration, provider_share, password, timeout, seed, as_json, max_p95, max_error_rate):
+    """Load test the hot routes of a running server."""
+    rng = random.Random(seed)
+    providers = int(round(concurrency * provider_share))
+    synthetic = User.email.like('synth%@example.com')
+    provider_emails = [
+        row[0] for row in
+        db.session.query(User.email).join(ServiceProvider, ServiceProvider.id == User.id)
+        .filter(synthetic, ServiceProvider.verified.is_(True)).order_by(User.id).limit(providers * 10)
+    ]
+    customer_emails = [
+        row[0] for row in
+        db.session.query(User.email).outerjoin(ServiceProvider, ServiceProvider.id == User.id)
+        .filter(synthetic, ServiceProvider.id.is_(None)).order_by(User.id).limit(concurrency * 10)
+    ]
+    service_ids = [row[0] for row in db.session.query(Service.id).order_by(Service.id).limit(1000)]
+    if not customer_emails or not service_ids or (providers and not provider_emails):
+        raise click.ClickException('no synthetic data here, run `flask synth generate` first')
+    db.session.remove()
+
+    vusers = [
+        VirtualUser(url, rng.choice(provider_emails) if n < providers else rng.choice(customer_emails),
+                    password, n < providers, service_ids, timeout)
+        for n in range(concurrency)
+    ]
+    failed = [vuser.email for vuser in vusers if not vuser.login()]
+    if failed:
+        raise click.ClickException(f'{len(failed)} virtual user(s) could not sign in, e.g. {failed[0]}')
+
+    results, elapsed = run_load(vusers, duration, seed)
+    report = summarize(results, elapsed)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(f'{"route":16} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+        for route, row in report.items():
+            click.echo(
+                f'{route:16} {row["requests"]:>9} {row["errors"]:>7} {row["rps"]:>8.1f} {row["p50_ms"]:>8.1f} '
+                f'{row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} {row["max_ms"]:>8.1f}'
+            )
+
+    overall = report.get('all')
+    if overall is None:
+        raise click.ClickException('no requests completed')
+    problems = []
+    if max_p95 is not None and overall['p95_ms'] > max_p95:
+        problems.append(f'p95 {overall["p95_ms"]:.1f} ms is above {max_p95} ms')
+    error_rate = overall['errors'] / overall['requests']
+    if max_error_rate is not None and error_rate > max_error_rate:
+        problems.append(f'error rate {error_rate:.2%} is above {max_error_rate:.2%}')
+    if problems:
+        raise click.ClickException('; '.join(problems))
+
+
+def init_app(app):
+    app.cli.add_command(loadtest_cli)
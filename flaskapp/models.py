@@ -1,12 +1,13 @@
 from datetime import datetime
-from flaskapp import db, login_manager, app
+from flaskapp import db
 from flask_login import UserMixin
 from enum import Enum
 from sqlalchemy.orm import validates
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+# Bayesian smoothing for rating scores: every service/provider starts as if it
+# had RATING_PRIOR_WEIGHT reviews of RATING_PRIOR_MEAN stars
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 5
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,10 +26,25 @@ class ServiceProvider(db.Model):
     id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
     nid = db.Column(db.String(50), unique=True, nullable=False)
     bio = db.Column(db.Text, nullable=True)
-    services = db.relationship('Service', backref='provider', lazy=True)
+    # services keep their provider_id when a provider is removed (order history)
+    services = db.relationship('Service', backref='provider', lazy=True, passive_deletes='all')
     latitude = db.Column(db.Float)  
     longitude = db.Column(db.Float)
-    verified = db.Column(db.Boolean, nullable=False, default=False)
+    verified = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    # False once an admin has removed the provider; the row stays for the
+    # orders and services that still point at it
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+    rating_score = db.Column(db.Float, nullable=False, default=RATING_PRIOR_MEAN, index=True)
+
+    __table_args__ = (
+        db.Index('ix_service_provider_lat_lon', 'latitude', 'longitude'),
+    )
+
+    @property
+    def rating_mean(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
 
     def __repr__(self):
         return f"ServiceProvider('{self.nid}', '{self.bio}', verified={self.verified})"
@@ -53,6 +69,14 @@ class Subcategory(db.Model):
     def __repr__(self):
         return f"Subcategory('{self.name}', '{self.category.name}')"
 
+class CacheVersion(db.Model):
+    # version counters shared by all workers, see flaskapp/cache.py
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"CacheVersion('{self.name}', {self.version})"
+
 class Service(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -65,12 +89,30 @@ class Service(db.Model):
     subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategory.id'), nullable=True)
     duration = db.Column(db.Integer, nullable = False)
     ser_price = db.Column(db.Float, nullable=False)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+    rating_score = db.Column(db.Float, nullable=False, default=RATING_PRIOR_MEAN)
+    # bumped on every ORM update, drives the page cache and ETags (flaskapp/fragments.py)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    date_modified = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # False once its provider is removed; kept only for the order history
+    active = db.Column(db.Boolean, nullable=False, default=True)
 
     orders = db.relationship('Order', backref='linked_service', lazy=True) 
+
+    __table_args__ = (
+        db.Index('ix_service_category_score', 'category_id', 'rating_score'),
+        db.Index('ix_service_price_score', 'ser_price', 'rating_score'),
+        db.Index('ix_service_provider_category', 'provider_id', 'category_id'),
+    )
     
     def __repr__(self):
         return f'<Service {self.id},Title: {self.title}, Category: {self.category.name}, Date: {self.date_posted}>'
     
+    @property
+    def rating_mean(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
     def set_ratings(self, value):
         if 0 <= value <= 5:
             self.ratings = value
@@ -103,13 +145,50 @@ class Order(db.Model):
     service_provider_id = db.Column(db.Integer, db.ForeignKey('service_provider.id'), nullable=False)
     latitude = db.Column(db.Float)  
     longitude = db.Column(db.Float)
-    rate = db.Column(db.Integer, nullable=True)  
-    review = db.Column(db.Text, nullable=True)  
+    # waiting for a dispatch batch to pick its provider (flaskapp/dispatch.py)
+    dispatch = db.Column(db.Boolean, nullable=False, default=False)
+    # commit-ordered stamp of the last time it booked a provider (flaskapp/scheduling.py)
+    booking_seq = db.Column(db.Integer, nullable=True, index=True)
 
     service = db.relationship('Service', backref='linked_orders', lazy=True)
+    service_provider = db.relationship('ServiceProvider', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_order_customer_datetime', 'customer_id', 'order_datetime'),
+        db.Index('ix_order_provider_notifications_datetime', 'service_provider_id', 'notifications', 'order_datetime'),
+        db.Index('ix_order_provider_status_datetime', 'service_provider_id', 'status', 'order_datetime'),
+        db.Index('ix_order_dispatch_status', 'dispatch', 'status'),
+        db.Index('ix_order_provider_datetime', 'service_provider_id', 'order_datetime'),
+    )
+
     def __repr__(self):
         return f'<Order {self.id}, Location: {self.order_loc}, Price: {self.price}, Status: {self.status.value}, Notifications: {self.notifications.value}>'
 
+class OrderRollup(db.Model):
+    # order totals per booking day, provider, category and status, kept in step
+    # with the orders by flaskapp/rollups.py; no foreign keys, history outlives
+    # removed providers and categories
+    day = db.Column(db.Date, primary_key=True)
+    provider_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.Enum(OrderStatus), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0.0)
+    rate_count = db.Column(db.Integer, nullable=False, default=0)
+    rate_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_order_rollup_provider_day', 'provider_id', 'day'),
+        db.Index('ix_order_rollup_category_day', 'category_id', 'day'),
+    )
+
+    @property
+    def rate_mean(self):
+        return self.rate_sum / self.rate_count if self.rate_count else None
+
+    def __repr__(self):
+        return f"OrderRollup({self.day}, {self.provider_id}, {self.category_id}, {self.status.value}, {self.order_count})"
+
 class Complaint(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
@@ -122,5 +201,46 @@ class Complaint(db.Model):
     order = db.relationship('Order', backref='complaints', lazy=True)
     user = db.relationship('User', backref='complaints', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_complaint_resolved_date_posted', 'resolved', 'date_posted'),
+    )
+
+    def __repr__(self):
+        return f"Complaint('{self.id}', '{self.date_posted}', '{self.message}')"
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    room = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    username = db.Column(db.String(20), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_message_room_id', 'room', 'id'),
+    )
+
+    def __repr__(self):
+        return f"ChatMessage('{self.room}', '{self.username}', '{self.date_posted}')"
+
+
+class Job(db.Model):
+    # deferred side effects, run by flaskapp/jobs.py
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    date_finished = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
     def __repr__(self):
-        return f"Complaint('{self.id}', '{self.date_posted}', '{self.message}')"
\ No newline at end of file
+        return f"Job({self.id}, '{self.name}', '{self.status}', attempts={self.attempts})"
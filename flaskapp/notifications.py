@@ -0,0 +1,51 @@
+from flaskapp import db, socketio
+from flaskapp.jobs import job
+from flaskapp.models import Order, Service
+
+
+# Order events pushed to Socket.IO rooms, one room per user, so the
+# notification pages update without re-running their listing queries.
+# Request handlers queue a notify_orders job instead of emitting inline.
+# The user rooms live in their own namespace, which clients cannot pick
+# rooms in: connecting there puts a socket in its own user's room only.
+
+ORDER_NAMESPACE = '/orders'
+ORDER_EVENT = 'order_event'
+NOTICE_EVENT = 'notice'
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+def order_payload(order, service_title=None):
+    return {
+        'id': order.id,
+        'price': order.price,
+        'order_datetime': order.order_datetime.isoformat() if order.order_datetime else None,
+        'status': order.status.value,
+        'notifications': order.notifications.value if order.notifications else None,
+        'service_title': service_title if service_title is not None else order.service.title,
+        'loc': order.order_loc,
+    }
+
+
+def publish_order_event(order, kind, service_title=None):
+    """Send `kind` ('created' or 'status') for `order` to its provider and customer."""
+    payload = dict(order_payload(order, service_title), kind=kind)
+    socketio.emit(ORDER_EVENT, payload, to=user_room(order.service_provider_id), namespace=ORDER_NAMESPACE)
+    if order.customer_id != order.service_provider_id:
+        socketio.emit(ORDER_EVENT, payload, to=user_room(order.customer_id), namespace=ORDER_NAMESPACE)
+
+
+def publish_notice(user_id, message, category='info'):
+    socketio.emit(
+        NOTICE_EVENT, {'message': message, 'category': category}, to=user_room(user_id), namespace=ORDER_NAMESPACE,
+    )
+
+
+@job('notify_orders')
+def notify_orders(order_ids, kind):
+    rows = db.session.query(Order, Service.title).join(Service, Order.ser_id == Service.id).filter(Order.id.in_(order_ids))
+    for order, service_title in rows:
+        publish_order_event(order, kind, service_title=service_title)
@@ -0,0 +1,103 @@
+from datetime import datetime
+from urllib.parse import urlencode
+from flask import abort, current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_
+
+
+# Keyset (cursor) pagination shared by the listing pages.
+# A listing is ordered by a list of (column, descending) keys whose last key
+# is unique (the primary key); the cursor is the key of the last row shown,
+# signed so clients can only hand back tokens we produced.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class Page:
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='page-cursor')
+
+
+def encode_cursor(values):
+    return _serializer().dumps([
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ])
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        values = _serializer().loads(token)
+    except BadSignature:
+        abort(400)
+    return [
+        datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+        for value in values
+    ]
+
+
+def page_size(arg='per_page'):
+    size = request.args.get(arg, type=int) or DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_order(keys):
+    return [column.desc() if descending else column.asc() for column, descending in keys]
+
+
+def keyset_after(keys, values):
+    """WHERE clause selecting the rows that sort after `values`."""
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def paginate(query, keys, row_key, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one Page of `query` ordered by `keys`.
+
+    `row_key` maps a result row to its key values, in the same order as `keys`.
+    """
+    values = decode_cursor(cursor)
+    if values is not None:
+        if len(values) != len(keys):
+            abort(400)
+        query = query.filter(keyset_after(keys, values))
+    rows = query.order_by(*keyset_order(keys)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(row_key(rows[-1]))
+    return Page(rows, next_cursor)
+
+
+def _pagination_helpers():
+    def page_url(arg, cursor):
+        args = request.args.to_dict()
+        args[arg] = cursor
+        return request.path + '?' + urlencode(args)
+    return {'page_url': page_url}
+
+
+def init_app(app):
+    app.context_processor(_pagination_helpers)
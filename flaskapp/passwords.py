@@ -0,0 +1,94 @@
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+import bcrypt
+from flask import current_app
+
+
+# bcrypt runs in a bounded process pool so a burst of logins cannot pin every
+# request thread. Config:
+#   BCRYPT_LOG_ROUNDS          work factor for new hashes (rehashed on login)
+#   PASSWORD_HASH_WORKERS      pool size, 0 hashes inline in the request
+#   PASSWORD_HASH_MAX_PENDING  hashes allowed in flight before answering 429
+
+DEFAULT_LOG_ROUNDS = 12
+
+_pool = None
+_pool_lock = Lock()
+_slots = None
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+def log_rounds():
+    return current_app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS)
+
+
+def _workers():
+    return current_app.config['PASSWORD_HASH_WORKERS']
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        with _pool_lock:
+            if _slots is None:
+                _slots = BoundedSemaphore(current_app.config['PASSWORD_HASH_MAX_PENDING'])
+    return _slots
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=_workers())
+    return _pool
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+
+def _run(func, *args):
+    slots = _get_slots()
+    if not slots.acquire(blocking=False):
+        raise HashingOverloaded()
+    try:
+        if not _workers():
+            return func(*args)
+        return _get_pool().submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(_hash, password, log_rounds())
+
+
+def check_password(pw_hash, password):
+    try:
+        return _run(_check, pw_hash, password)
+    except ValueError:
+        # not a bcrypt hash
+        return False
+
+
+def needs_rehash(pw_hash):
+    try:
+        return int(pw_hash.split('$')[2]) != log_rounds()
+    except (IndexError, ValueError):
+        return True
+
+
+def _hashing_overloaded(error):
+    return 'Too many sign-in attempts right now, please try again shortly.', 429, {'Retry-After': '1'}
+
+
+def init_app(app):
+    app.register_error_handler(HashingOverloaded, _hashing_overloaded)
@@ -0,0 +1,217 @@
+import hmac
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from logging.handlers import RotatingFileHandler
+from threading import Lock
+from flask import abort, current_app, g, has_request_context, request
+from sqlalchemy import event, func
+from flaskapp import db
+from flaskapp.fragments import fragment_cache
+from flaskapp.identity import user_cache
+from flaskapp.jobs import QUEUED, RUNNING, job_metrics
+from flaskapp.models import Job
+
+
+# Per-request SQL instrumentation. Every statement run on the app engine is
+# counted and timed against the current request; at the end of the request
+# the totals feed the /metrics counters, debug response headers, N+1 and
+# slow-query warnings, and (sampled) JSON traces in a rotating log.
+# /metrics answers scrapers that send METRICS_TOKEN as a bearer token, or
+# without a token set, requests from this host only.
+#
+# Config:
+#   METRICS_TOKEN            bearer token for /metrics, unset = loopback only
+#   SQL_PROFILE_HEADERS      add X-DB-* headers (defaults to app.debug)
+#   SQL_SLOW_QUERY_MS        statements slower than this are logged (100)
+#   SQL_DUPLICATE_THRESHOLD  same statement this often in one request = N+1 (5)
+#   SQL_TRACE_LOG            path of the trace log, unset disables traces
+#   SQL_TRACE_SAMPLE_RATE    fraction of requests traced (0.01)
+
+logger = logging.getLogger('flaskapp.sql')
+trace_logger = logging.getLogger('flaskapp.sql.trace')
+trace_logger.propagate = False
+
+_metrics_lock = Lock()
+_metrics = defaultdict(lambda: {
+    'requests': 0,
+    'queries': 0,
+    'db_seconds': 0.0,
+    'slow_queries': 0,
+    'n_plus_one': 0,
+})
+
+
+def _config(name, default):
+    return current_app.config.get(name, default)
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    stats = g.get('sql_stats')
+    if stats is None:
+        stats = g.sql_stats = {'count': 0, 'seconds': 0.0, 'statements': Counter(), 'slow': []}
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = _stats()
+    if stats is None:
+        return
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    stats['statements'][statement] += 1
+    if elapsed * 1000 >= _config('SQL_SLOW_QUERY_MS', 100):
+        stats['slow'].append((statement, elapsed))
+        logger.warning('slow query (%.1f ms) in %s: %s', elapsed * 1000, request.endpoint, statement)
+
+
+def install(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _configure_trace_log():
+    path = _config('SQL_TRACE_LOG', None)
+    if path and not trace_logger.handlers:
+        handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        trace_logger.addHandler(handler)
+        trace_logger.setLevel(logging.INFO)
+    return bool(path)
+
+
+def _record_request(response):
+    stats = g.get('sql_stats') or {'count': 0, 'seconds': 0.0, 'statements': Counter(), 'slow': []}
+    endpoint = request.endpoint or 'unknown'
+    threshold = _config('SQL_DUPLICATE_THRESHOLD', 5)
+    duplicates = {statement: n for statement, n in stats['statements'].items() if n >= threshold}
+    if duplicates:
+        worst = max(duplicates, key=duplicates.get)
+        logger.warning('possible N+1 in %s: %d runs of %s', endpoint, duplicates[worst], worst)
+
+    with _metrics_lock:
+        metrics = _metrics[endpoint]
+        metrics['requests'] += 1
+        metrics['queries'] += stats['count']
+        metrics['db_seconds'] += stats['seconds']
+        metrics['slow_queries'] += len(stats['slow'])
+        metrics['n_plus_one'] += bool(duplicates)
+
+    if _config('SQL_PROFILE_HEADERS', current_app.debug):
+        response.headers['X-DB-Query-Count'] = str(stats['count'])
+        response.headers['X-DB-Time-Ms'] = f"{stats['seconds'] * 1000:.2f}"
+        response.headers['X-DB-Duplicate-Queries'] = str(sum(duplicates.values()))
+        response.headers['X-DB-Slow-Queries'] = str(len(stats['slow']))
+
+    if _configure_trace_log() and random.random() < _config('SQL_TRACE_SAMPLE_RATE', 0.01):
+        trace_logger.info(json.dumps({
+            'time': time.time(),
+            'endpoint': endpoint,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats['count'],
+            'db_ms': round(stats['seconds'] * 1000, 3),
+            'duplicates': duplicates,
+            'slow': [{'statement': statement, 'ms': round(elapsed * 1000, 3)} for statement, elapsed in stats['slow']],
+            'statements': dict(stats['statements'].most_common(20)),
+        }))
+    return response
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+LOOPBACK = ('127.0.0.1', '::1')
+
+
+def _allowed():
+    token = _config('METRICS_TOKEN', None)
+    if not token:
+        return request.remote_addr in LOOPBACK
+    sent = request.headers.get('Authorization', '')
+    return hmac.compare_digest(sent.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+
+def metrics():
+    if not _allowed():
+        abort(403)
+    with _metrics_lock:
+        snapshot = {endpoint: dict(values) for endpoint, values in _metrics.items()}
+    families = (
+        ('flaskapp_requests_total', 'counter', 'Requests handled.', 'requests'),
+        ('flaskapp_db_queries_total', 'counter', 'SQL statements executed.', 'queries'),
+        ('flaskapp_db_seconds_total', 'counter', 'Time spent executing SQL.', 'db_seconds'),
+        ('flaskapp_db_slow_queries_total', 'counter', 'SQL statements over SQL_SLOW_QUERY_MS.', 'slow_queries'),
+        ('flaskapp_db_n_plus_one_requests_total', 'counter', 'Requests repeating one statement SQL_DUPLICATE_THRESHOLD times or more.', 'n_plus_one'),
+    )
+    lines = []
+    for name, kind, help_text, key in families:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for endpoint in sorted(snapshot):
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {snapshot[endpoint][key]}')
+
+    cache_stats = fragment_cache.stats()
+    for key, kind, help_text in (
+        ('hits', 'counter', 'Fragment cache hits.'),
+        ('misses', 'counter', 'Fragment cache misses.'),
+        ('evictions', 'counter', 'Fragment cache LRU evictions.'),
+        ('size', 'gauge', 'Fragments currently cached.'),
+    ):
+        name = f'flaskapp_fragment_cache_{key}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {cache_stats[key]}')
+
+    user_stats = user_cache.stats()
+    for key, kind, help_text in (
+        ('hits', 'counter', 'User loader cache hits.'),
+        ('misses', 'counter', 'User loader cache misses.'),
+        ('size', 'gauge', 'User snapshots currently cached.'),
+    ):
+        name = f'flaskapp_user_cache_{key}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {user_stats[key]}')
+
+    counters = job_metrics()
+    for key, help_text in (
+        ('enqueued', 'Jobs queued by this process.'),
+        ('succeeded', 'Jobs run successfully by this process.'),
+        ('retried', 'Job attempts that failed and were rescheduled.'),
+        ('failed', 'Jobs that used up their attempts.'),
+    ):
+        name = f'flaskapp_jobs_{key}_total'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {counters.get(key, 0)}')
+    # only the open jobs, counted off ix_job_status_run_at; done and failed
+    # ones pile up until they are purged and are covered by the counters above
+    depth = dict(
+        db.session.query(Job.status, func.count())
+        .filter(Job.status.in_((QUEUED, RUNNING)))
+        .group_by(Job.status)
+        .all()
+    )
+    lines.append('# HELP flaskapp_jobs Jobs waiting or running, by status.')
+    lines.append('# TYPE flaskapp_jobs gauge')
+    for status in (QUEUED, RUNNING):
+        lines.append(f'flaskapp_jobs{{status="{status}"}} {depth.get(status, 0)}')
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def init_app(app):
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    with app.app_context():
+        install(db.engine)
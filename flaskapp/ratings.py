@@ -0,0 +1,80 @@
+from sqlalchemy import case, cast, func, select, update
+import click
+from flask.cli import with_appcontext
+from flaskapp import db
+from flaskapp.cache import invalidate_top_services
+from flaskapp.models import Order, Service, ServiceProvider, RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT
+
+
+# Per-service and per-provider rating aggregates (count, sum, smoothed score)
+# kept up to date as reviews are written, so listings can sort on the stored
+# rating_score instead of averaging Order.rate on every request.
+
+
+def _apply(model, key, count_delta, sum_delta):
+    count = model.rating_count + count_delta
+    total = model.rating_sum + sum_delta
+    values = {
+        model.rating_count: count,
+        model.rating_sum: total,
+        model.rating_score: (RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + total) / (RATING_PRIOR_WEIGHT + count),
+    }
+    if model is Service:
+        # keep the 0-5 star filter in search in line with the real reviews
+        values[Service.ratings] = case((count > 0, cast(func.round(total / count), db.Integer)), else_=Service.ratings)
+    db.session.execute(
+        update(model).where(model.id == key).values(values).execution_options(synchronize_session=False)
+    )
+
+
+def record_rating(order, old_rate, new_rate):
+    """Fold a review change on `order` into the aggregates. The caller commits."""
+    count_delta = (new_rate is not None) - (old_rate is not None)
+    sum_delta = (new_rate or 0) - (old_rate or 0)
+    if not count_delta and not sum_delta:
+        return
+    _apply(Service, order.ser_id, count_delta, sum_delta)
+    _apply(ServiceProvider, order.service_provider_id, count_delta, sum_delta)
+    invalidate_top_services()
+
+
+def rebuild_ratings():
+    """Recompute every aggregate from Order.rate."""
+    for model, column in ((Service, Order.ser_id), (ServiceProvider, Order.service_provider_id)):
+        count = (
+            select(func.count(Order.rate)).where(column == model.id, Order.rate.isnot(None))
+            .scalar_subquery()
+        )
+        total = (
+            select(func.coalesce(func.sum(Order.rate), 0.0)).where(column == model.id, Order.rate.isnot(None))
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(model).values({model.rating_count: count, model.rating_sum: total})
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            update(model).values({
+                model.rating_score: (RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + model.rating_sum)
+                / (RATING_PRIOR_WEIGHT + model.rating_count),
+            }).execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        update(Service).where(Service.rating_count > 0)
+        .values({Service.ratings: cast(func.round(Service.rating_sum / Service.rating_count), db.Integer)})
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_top_services()
+    db.session.commit()
+
+
+@click.command('rebuild-ratings')
+@with_appcontext
+def rebuild_ratings_command():
+    """Recompute service and provider rating aggregates from orders."""
+    rebuild_ratings()
+    click.echo('Rating aggregates rebuilt.')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_ratings_command)
@@ -0,0 +1,233 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, case, delete, func, insert, select
+from flaskapp import db
+from flaskapp.database import upsert_insert
+from flaskapp.models import Category, Order, OrderRollup, OrderStatus, Service
+
+
+# Order rollups: OrderRollup keeps order count, price sum and rating count/sum
+# per booking day x provider x category x status, so earnings and volume
+# numbers never scan the order table. Code that places orders or changes their
+# status, provider or rating reports it here before committing (like
+# flaskapp/ratings.py); `flask rollups backfill` rebuilds the table from the
+# orders.
+
+
+def order_facts(order_ids):
+    """What the rollups know about each order, as rows."""
+    if not order_ids:
+        return []
+    return db.session.execute(
+        select(
+            Order.id, Order.order_datetime, Order.service_provider_id, Service.category_id,
+            Order.status, Order.price, Order.rate,
+        )
+        .join(Service, Order.ser_id == Service.id)
+        .where(Order.id.in_(list(order_ids)), Order.order_datetime.isnot(None))
+    ).all()
+
+
+def _add(deltas, fact, sign, status=None):
+    key = (fact.order_datetime.date(), fact.service_provider_id, fact.category_id, status or fact.status)
+    delta = deltas[key]
+    delta[0] += sign
+    delta[1] += sign * fact.price
+    if fact.rate is not None:
+        delta[2] += sign
+        delta[3] += sign * fact.rate
+
+
+def _apply(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    table = OrderRollup.__table__
+    rows = [
+        {
+            'day': day, 'provider_id': provider_id, 'category_id': category_id, 'status': status,
+            'order_count': count, 'price_sum': price, 'rate_count': rate_count, 'rate_sum': rate,
+        }
+        # in key order, so concurrent batches take the row locks in the same order
+        for (day, provider_id, category_id, status), (count, price, rate_count, rate) in sorted(
+            deltas.items(), key=lambda item: (item[0][0], item[0][1], item[0][2], item[0][3].value),
+        )
+    ]
+    upsert = upsert_insert(db.session.connection().dialect)
+    if upsert is not None:
+        # one statement per batch that adds to the row or creates it, so two
+        # transactions counting the first order of a key can't both insert it
+        statement = upsert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.provider_id, table.c.category_id, table.c.status],
+            set_={
+                column: table.c[column] + statement.excluded[column]
+                for column in ('order_count', 'price_sum', 'rate_count', 'rate_sum')
+            },
+        ), rows)
+        return
+    _apply_without_upsert(table, rows)
+
+
+def _apply_without_upsert(table, rows):
+    # three statements whatever the batch: find the rollup rows that exist,
+    # bump those, insert the rest
+    existing = {
+        tuple(row) for row in db.session.execute(
+            select(table.c.day, table.c.provider_id, table.c.category_id, table.c.status).where(
+                table.c.day.in_({row['day'] for row in rows}),
+                table.c.provider_id.in_({row['provider_id'] for row in rows}),
+                table.c.category_id.in_({row['category_id'] for row in rows}),
+            )
+        )
+    }
+    bumps, inserts = [], []
+    for row in rows:
+        if (row['day'], row['provider_id'], row['category_id'], row['status']) in existing:
+            bumps.append({
+                'key_day': row['day'], 'key_provider_id': row['provider_id'],
+                'key_category_id': row['category_id'], 'key_status': row['status'],
+                'add_count': row['order_count'], 'add_price': row['price_sum'],
+                'add_rate_count': row['rate_count'], 'add_rate': row['rate_sum'],
+            })
+        else:
+            inserts.append(row)
+    if bumps:
+        db.session.execute(
+            table.update()
+            .where(
+                table.c.day == bindparam('key_day'), table.c.provider_id == bindparam('key_provider_id'),
+                table.c.category_id == bindparam('key_category_id'), table.c.status == bindparam('key_status'),
+            )
+            .values(
+                order_count=table.c.order_count + bindparam('add_count'),
+                price_sum=table.c.price_sum + bindparam('add_price'),
+                rate_count=table.c.rate_count + bindparam('add_rate_count'),
+                rate_sum=table.c.rate_sum + bindparam('add_rate'),
+            ),
+            bumps,
+        )
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def record_orders(order_ids):
+    """Count newly placed orders in. The caller commits."""
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0.0])
+    for fact in order_facts(order_ids):
+        _add(deltas, fact, 1)
+    _apply(deltas)
+
+
+def record_transition(old_statuses, target):
+    """Move orders from their old status ({order_id: status}) to `target`. The caller commits."""
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0.0])
+    for fact in order_facts(old_statuses):
+        _add(deltas, fact, -1, old_statuses[fact.id])
+        _add(deltas, fact, 1, target)
+    _apply(deltas)
+
+
+def record_change(before):
+    """Re-file orders whose provider, service or rating changed since
+    order_facts() returned `before`. The caller commits."""
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0.0])
+    for fact in before:
+        _add(deltas, fact, -1)
+    for fact in order_facts([fact.id for fact in before]):
+        _add(deltas, fact, 1)
+    _apply(deltas)
+
+
+def backfill(since=None):
+    """Rebuild the rollups (from day `since` on, if given) from the orders and commit."""
+    day = func.date(Order.order_datetime)
+    criteria = [Order.order_datetime.isnot(None)]
+    if since is not None:
+        criteria.append(Order.order_datetime >= datetime.combine(since, datetime.min.time()))
+        db.session.execute(delete(OrderRollup).where(OrderRollup.day >= since))
+    else:
+        db.session.execute(delete(OrderRollup))
+    rows = db.session.execute(
+        insert(OrderRollup).from_select(
+            ['day', 'provider_id', 'category_id', 'status', 'order_count', 'price_sum', 'rate_count', 'rate_sum'],
+            select(
+                day, Order.service_provider_id, Service.category_id, Order.status,
+                func.count(Order.id), func.coalesce(func.sum(Order.price), 0.0),
+                func.count(Order.rate), func.coalesce(func.sum(Order.rate), 0.0),
+            )
+            .join(Service, Order.ser_id == Service.id)
+            .where(*criteria)
+            .group_by(day, Order.service_provider_id, Service.category_id, Order.status),
+        )
+    ).rowcount
+    db.session.commit()
+    return rows
+
+
+def _totals():
+    completed = OrderRollup.status == OrderStatus.completed
+    return (
+        func.sum(OrderRollup.order_count).label('orders'),
+        func.sum(case((completed, OrderRollup.order_count), else_=0)).label('completed'),
+        func.sum(case((completed, OrderRollup.price_sum), else_=0.0)).label('earnings'),
+        (func.sum(OrderRollup.rate_sum) / func.nullif(func.sum(OrderRollup.rate_count), 0)).label('rate_mean'),
+    )
+
+
+def provider_daily(provider_id, since, until=None):
+    """Per booking day: orders, completed orders, earnings and mean rating."""
+    query = (
+        db.session.query(OrderRollup.day, *_totals())
+        .filter(OrderRollup.provider_id == provider_id, OrderRollup.day >= since)
+    )
+    if until is not None:
+        query = query.filter(OrderRollup.day < until)
+    return query.group_by(OrderRollup.day).order_by(OrderRollup.day).all()
+
+
+def category_totals(since, until=None):
+    """Per category: orders, completed orders, revenue and mean rating, busiest first."""
+    query = (
+        db.session.query(OrderRollup.category_id, Category.name, *_totals())
+        .outerjoin(Category, Category.id == OrderRollup.category_id)
+        .filter(OrderRollup.day >= since)
+    )
+    if until is not None:
+        query = query.filter(OrderRollup.day < until)
+    return query.group_by(OrderRollup.category_id, Category.name).order_by(func.sum(OrderRollup.order_count).desc()).all()
+
+
+def top_providers(since, limit=20):
+    """Providers with the highest earnings since `since`."""
+    totals = _totals()
+    return (
+        db.session.query(OrderRollup.provider_id, *totals)
+        .filter(OrderRollup.day >= since)
+        .group_by(OrderRollup.provider_id)
+        .order_by(totals[2].desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def since_days(days):
+    return date.today() - timedelta(days=days)
+
+
+rollups_cli = AppGroup('rollups', help='Maintain the order rollup tables.')
+
+
+@rollups_cli.command('backfill')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days from this one (YYYY-MM-DD) on.')
+def backfill_command(since):
+    """Rebuild the order rollups from the orders."""
+    rows = backfill(since.date() if since else None)
+    click.echo(f'{rows} rollup rows written')
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
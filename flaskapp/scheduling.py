@@ -0,0 +1,308 @@
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from sqlalchemy import func
+from flaskapp import db
+from flaskapp.cache import bump_version
+from flaskapp.models import CacheVersion, Order, OrderStatus, Service, ServiceProvider
+
+
+# Provider booking calendars. Every order that is not rejected books
+# [order_datetime, order_datetime + Service.duration minutes) with its
+# provider. Each provider's bookings live in an interval tree, loaded on
+# first use and kept in step by reading the orders booked since the last
+# check. Code that books a provider stamps the order with next_booking_seq(),
+# a shared counter bumped inside its transaction; a second booking waits on
+# that row until the first commits, so stamps become visible in order and one
+# range query on Order.booking_seq never skips one. Orders rejected or moved
+# to another provider elsewhere are noticed when they get in the way and
+# dropped then. The trees only answer quickly: booked_overlap() is the check
+# that runs inside the booking transaction.
+
+SLOT_MINUTES = 15
+CALENDAR_CACHE_SIZE = 256
+BOOKINGS = 'bookings'
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'key', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, start, end, key):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _split(node, key):
+    # -> (nodes ordered before key, the rest)
+    if node is None:
+        return None, None
+    if (node.start, node.key) < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    node_key = (node.start, node.key)
+    if key == node_key:
+        return _merge(node.left, node.right)
+    if key < node_key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+
+class IntervalTree:
+    """Half-open [start, end) intervals in a treap ordered by (start, key),
+    each node keeping the largest end in its subtree."""
+
+    def __init__(self):
+        self.root = None
+        self.intervals = {}
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, key):
+        return key in self.intervals
+
+    def insert(self, start, end, key):
+        if key in self.intervals:
+            self.remove(key)
+        self.intervals[key] = (start, end)
+        left, right = _split(self.root, (start, key))
+        self.root = _merge(_merge(left, _Node(start, end, key)), right)
+
+    def remove(self, key):
+        start, _ = self.intervals.pop(key)
+        self.root = _remove(self.root, (start, key))
+
+    def overlap(self, start, end):
+        """Return one (start, end, key) overlapping [start, end), or None."""
+        node = self.root
+        while node is not None:
+            if node.start < end and node.end > start:
+                return node.start, node.end, node.key
+            if node.left is not None and node.left.max_end > start:
+                node = node.left
+            else:
+                node = node.right
+        return None
+
+    def overlaps(self, start, end):
+        """Yield every (start, end, key) overlapping [start, end), by start."""
+        for interval in self.iter_from(start):
+            if interval[0] >= end:
+                return
+            yield interval
+
+    def iter_from(self, time):
+        """Yield (start, end, key) for intervals ending after `time`, by start."""
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None and node.max_end > time:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.end > time:
+                yield node.start, node.end, node.key
+            node = node.right
+
+
+def _align(time):
+    step = timedelta(minutes=SLOT_MINUTES)
+    rest = (time - datetime.min) % step
+    return time + (step - rest) if rest else time
+
+
+def free_slots(tree, after, duration, n):
+    """Start times of the first `n` free, non-overlapping `duration` slots from `after`."""
+    slots = []
+    cursor = _align(after)
+    for start, end, _ in tree.iter_from(cursor):
+        while cursor + duration <= start and len(slots) < n:
+            slots.append(cursor)
+            cursor = _align(cursor + duration)
+        if len(slots) == n:
+            return slots
+        cursor = max(cursor, _align(end))
+    while len(slots) < n:
+        slots.append(cursor)
+        cursor = _align(cursor + duration)
+    return slots
+
+
+_lock = Lock()
+_calendars = OrderedDict()
+_last_booking_seq = None
+
+
+def _booking_seq():
+    return db.session.query(CacheVersion.version).filter(CacheVersion.name == BOOKINGS).scalar() or 0
+
+
+def next_booking_seq():
+    """Stamp for an order that books a provider in the current transaction."""
+    bump_version(db.session.connection(), BOOKINGS)
+    return _booking_seq()
+
+
+def _booking_rows(*criteria):
+    return (
+        db.session.query(Order.id, Order.service_provider_id, Order.order_datetime, Service.duration)
+        .join(Service, Order.ser_id == Service.id)
+        .filter(Order.status != OrderStatus.rejected, Order.order_datetime.isnot(None), *criteria)
+    )
+
+
+def _book(tree, order_id, start, minutes):
+    tree.insert(start, start + timedelta(minutes=minutes or 0), order_id)
+
+
+def _sync():
+    # callers hold _lock
+    global _last_booking_seq
+    if _last_booking_seq is None:
+        # nothing is loaded yet, calendars read their provider's orders in full
+        _last_booking_seq = _booking_seq()
+        return
+    rows = (
+        _booking_rows(Order.booking_seq > _last_booking_seq)
+        .add_columns(Order.booking_seq)
+        .order_by(Order.booking_seq)
+        .all()
+    )
+    for order_id, provider_id, start, minutes, booking_seq in rows:
+        tree = _calendars.get(provider_id)
+        if tree is not None:
+            _book(tree, order_id, start, minutes)
+        _last_booking_seq = booking_seq
+
+
+def _calendar(provider_id):
+    # callers hold _lock
+    _sync()
+    tree = _calendars.get(provider_id)
+    if tree is None:
+        tree = IntervalTree()
+        for order_id, _, start, minutes in _booking_rows(Order.service_provider_id == provider_id):
+            _book(tree, order_id, start, minutes)
+        _calendars[provider_id] = tree
+        while len(_calendars) > CALENDAR_CACHE_SIZE:
+            _calendars.popitem(last=False)
+    _calendars.move_to_end(provider_id)
+    return tree
+
+
+def release(order_ids):
+    """Free the slots of orders that no longer book their provider."""
+    with _lock:
+        for tree in _calendars.values():
+            for order_id in order_ids:
+                if order_id in tree:
+                    tree.remove(order_id)
+
+
+def reload(provider_ids):
+    """Drop the calendars of providers whose orders were moved around."""
+    with _lock:
+        for provider_id in provider_ids:
+            _calendars.pop(provider_id, None)
+
+
+def find_conflicts(provider_id, bookings, ignore=()):
+    """For each (start, minutes) booking, the id of an order of the provider
+    overlapping it, or None. Orders in `ignore` don't count."""
+    with _lock:
+        tree = _calendar(provider_id)
+        conflicts = []
+        for start, minutes in bookings:
+            end = start + timedelta(minutes=minutes)
+            conflict = None
+            for _, _, order_id in list(tree.overlaps(start, end)):
+                if order_id in ignore:
+                    continue
+                order = (
+                    db.session.query(Order.status, Order.service_provider_id)
+                    .filter(Order.id == order_id)
+                    .first()
+                )
+                if order is not None and order.status != OrderStatus.rejected and order.service_provider_id == provider_id:
+                    conflict = order_id
+                    break
+                tree.remove(order_id)
+            conflicts.append(conflict)
+        return conflicts
+
+
+def find_conflict(provider_id, start, minutes):
+    """Return the id of an order overlapping the booking, or None."""
+    return find_conflicts(provider_id, [(start, minutes)])[0]
+
+
+def booked_overlap(provider_id, start, minutes, exclude=()):
+    """Id of an order of the provider overlapping the booking, read from the
+    database, or None. Orders in `exclude` don't count. Call it in the
+    transaction that books, after lock_provider()."""
+    longest = db.session.query(func.max(Service.duration)).filter(Service.provider_id == provider_id).scalar() or 0
+    end = start + timedelta(minutes=minutes)
+    rows = _booking_rows(
+        Order.service_provider_id == provider_id,
+        Order.order_datetime < end,
+        Order.order_datetime > start - timedelta(minutes=max(longest, minutes)),
+    )
+    # `exclude` can hold a whole dispatch batch; the range above returns a
+    # handful of rows, so skip them here rather than in a long NOT IN
+    for order_id, _, other_start, other_minutes in rows:
+        if order_id not in exclude and other_start + timedelta(minutes=other_minutes or 0) > start:
+            return order_id
+    return None
+
+
+def lock_provider(provider_id):
+    """Hold the provider's row until commit so bookings for them go one at a
+    time (SQLite has no row locks; its writers are serialised anyway)."""
+    db.session.query(ServiceProvider.id).filter(ServiceProvider.id == provider_id).with_for_update().first()
+
+
+def next_free_slots(provider_id, after, minutes, n=3):
+    with _lock:
+        return free_slots(_calendar(provider_id), after, timedelta(minutes=minutes), n)
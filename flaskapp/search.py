@@ -0,0 +1,289 @@
+import logging
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import get_history
+from flaskapp import db
+from flaskapp.cache import bump_version, current_version
+from flaskapp.models import Service
+from flaskapp.pagination import DEFAULT_PAGE_SIZE, Page, decode_cursor, encode_cursor, paginate
+
+
+# Full-text search over Service.title and Service.description.
+# SQLite builds get an FTS5 table (service_search, rowid == service.id), made
+# by the migration or alongside the service table by create_all, and kept in
+# step by the mapper events in the same transaction as the service rows.
+# Anything else falls back to an in-memory inverted index ranked with BM25,
+# reloaded when the shared 'search_index' counter in cache_version moves;
+# service changes bump it in their own transaction, so every worker picks
+# them up once they are committed and never sees rolled back ones.
+
+FTS_TABLE = 'service_search'
+SEARCH_INDEX = 'search_index'
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_backend = None
+_backend_lock = Lock()
+_checked = False
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(value):
+    return _TOKEN_RE.findall((value or '').lower())
+
+
+def search_services(words, min_price=None, max_price=None, min_rating=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return a Page of Service rows matching any of `words`, best match first."""
+    terms = [term for word in words for term in tokenize(word)]
+    query = Service.query.filter(Service.active.is_(True))
+    if min_price is not None:
+        query = query.filter(Service.ser_price >= min_price)
+    if max_price is not None:
+        query = query.filter(Service.ser_price <= max_price)
+    if min_rating is not None:
+        query = query.filter(Service.ratings >= min_rating)
+
+    listing_keys = [(Service.ser_price, False), (Service.rating_score, True), (Service.id, False)]
+    if not terms:
+        return paginate(
+            query, listing_keys,
+            lambda s: (s.ser_price, s.rating_score, s.id),
+            cursor=cursor, limit=limit,
+        )
+
+    backend = _get_backend(db.session.connection())
+    if backend == 'fts5':
+        _check_filled()
+        match = ' OR '.join(f'"{term}"*' for term in terms)
+        ranked = (
+            text(
+                f'SELECT rowid AS service_id, '
+                f'bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match'
+            )
+            .bindparams(match=match)
+            .columns(service_id=db.Integer, score=db.Float)
+            .subquery()
+        )
+        # bm25() is negative, more negative is a better match
+        page = paginate(
+            query.join(ranked, ranked.c.service_id == Service.id).add_columns(ranked.c.score),
+            [(ranked.c.score, False)] + listing_keys,
+            lambda row: (row.score, row[0].ser_price, row[0].rating_score, row[0].id),
+            cursor=cursor, limit=limit,
+        )
+        page.items = [row[0] for row in page.items]
+        return page
+
+    scores = _memory_index.search(terms, current_version(SEARCH_INDEX))
+    if not scores:
+        return Page([])
+    services = query.filter(Service.id.in_(scores.keys())).all()
+
+    def sort_key(service):
+        return [-scores[service.id], service.ser_price, -service.rating_score, service.id]
+
+    services.sort(key=sort_key)
+    after = decode_cursor(cursor)
+    if after is not None:
+        services = [service for service in services if sort_key(service) > after]
+    next_cursor = None
+    if len(services) > limit:
+        services = services[:limit]
+        next_cursor = encode_cursor(sort_key(services[-1]))
+    return Page(services, next_cursor)
+
+
+def rebuild_index():
+    global _backend
+    with _backend_lock:
+        _backend = None
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        create_fts_table(connection)
+    if _get_backend(connection) == 'fts5':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE}'))
+        _fill_fts(connection)
+    else:
+        bump_version(connection, SEARCH_INDEX)
+    db.session.commit()
+
+
+def create_fts_table(connection):
+    try:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description, tokenize='unicode61')"
+        ))
+    except OperationalError:
+        # SQLite built without FTS5, search uses the in-memory index
+        return False
+    return True
+
+
+def _get_backend(connection):
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _detect_backend(connection)
+        return _backend
+
+
+def _detect_backend(connection):
+    if connection.dialect.name == 'sqlite':
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE},
+        ).first()
+        if exists:
+            return 'fts5'
+    return 'memory'
+
+
+def _check_filled():
+    # once per process: an empty table next to existing services was never
+    # filled (or lost its fill), rebuild it in a transaction of its own
+    global _checked
+    if _checked:
+        return
+    connection = db.session.connection()
+    empty = connection.execute(text(
+        f'SELECT NOT EXISTS (SELECT 1 FROM {FTS_TABLE}) AND EXISTS (SELECT 1 FROM service)'
+    )).scalar()
+    if empty:
+        try:
+            with db.engine.begin() as own:
+                own.execute(text(f'DELETE FROM {FTS_TABLE}'))
+                _fill_fts(own)
+        except OperationalError:
+            logger.warning('could not fill %s, retrying on the next search', FTS_TABLE, exc_info=True)
+            return
+    _checked = True
+
+
+def _fill_fts(connection):
+    connection.execute(text(
+        f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+        f'SELECT id, title, description FROM service'
+    ))
+
+
+class InvertedIndex:
+    """Pure-Python BM25 index used when FTS5 is not available."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.total_length = 0.0
+        self.sorted_terms = None
+
+    def load(self, connection, version):
+        rows = connection.execute(text('SELECT id, title, description FROM service')).all()
+        with self.lock:
+            self.version = version
+            self.postings = defaultdict(dict)
+            self.documents = {}
+            self.total_length = 0.0
+            self.sorted_terms = None
+            for service_id, title, description in rows:
+                self._add(service_id, title, description)
+
+    def _add(self, service_id, title, description):
+        frequencies = defaultdict(float)
+        for term in tokenize(title):
+            frequencies[term] += TITLE_WEIGHT
+        for term in tokenize(description):
+            frequencies[term] += DESCRIPTION_WEIGHT
+        length = sum(frequencies.values())
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self.sorted_terms = None
+            self.postings[term][service_id] = frequency
+        self.documents[service_id] = (length, list(frequencies))
+        self.total_length += length
+
+    def search(self, terms, version):
+        if self.version != version:
+            self.load(db.session.connection(), version)
+        with self.lock:
+            count = len(self.documents)
+            if not count:
+                return {}
+            average_length = self.total_length / count or 1.0
+            scores = defaultdict(float)
+            for term in set(terms):
+                # prefix match, same as the FTS5 "term"* query
+                for key in self._prefixed(term):
+                    posting = self.postings[key]
+                    idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for service_id, frequency in posting.items():
+                        length = self.documents[service_id][0]
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                        scores[service_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            return dict(scores)
+
+    def _prefixed(self, prefix):
+        if self.sorted_terms is None:
+            self.sorted_terms = sorted(self.postings)
+        position = bisect_left(self.sorted_terms, prefix)
+        while position < len(self.sorted_terms) and self.sorted_terms[position].startswith(prefix):
+            yield self.sorted_terms[position]
+            position += 1
+
+
+_memory_index = InvertedIndex()
+
+
+@event.listens_for(Service.__table__, 'after_create')
+def _service_table_created(table, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_fts_table(connection)
+
+
+@event.listens_for(Service.__table__, 'after_drop')
+def _service_table_dropped(table, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+
+
+def _sync_service(connection, target):
+    if _get_backend(connection) == 'fts5':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': target.id})
+        connection.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)'),
+            {'id': target.id, 'title': target.title, 'description': target.description},
+        )
+    else:
+        bump_version(connection, SEARCH_INDEX)
+
+
+@event.listens_for(Service, 'after_insert')
+def _service_inserted(mapper, connection, target):
+    _sync_service(connection, target)
+
+
+@event.listens_for(Service, 'after_update')
+def _service_updated(mapper, connection, target):
+    if get_history(target, 'title').has_changes() or get_history(target, 'description').has_changes():
+        _sync_service(connection, target)
+
+
+@event.listens_for(Service, 'after_delete')
+def _service_deleted(mapper, connection, target):
+    if _get_backend(connection) == 'fts5':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': target.id})
+    else:
+        bump_version(connection, SEARCH_INDEX)
@@ -0,0 +1,229 @@
+import math
+import time
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flask.cli import AppGroup
+from sqlalchemy import func, insert
+from flaskapp import db
+from flaskapp.cache import CATEGORY_TREE, bump_version, invalidate_top_services
+from flaskapp.geo import EARTH_RADIUS_KM, rebuild_index as rebuild_geo_index
+from flaskapp.models import (
+    Category, Complaint, NotificationStatus, Order, OrderStatus, Service, ServiceProvider, Subcategory, User,
+    RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT,
+)
+from flaskapp.passwords import hash_password
+from flaskapp.rollups import backfill
+from flaskapp.search import rebuild_index as rebuild_search_index
+
+
+# Synthetic data for load tests: `flask synth generate` appends users,
+# providers (located around a city centre), categories, services, orders with
+# reviews and complaints, in batched executemany INSERTs with ids assigned up
+# front. Mapper events don't fire for these inserts, so rating aggregates are
+# computed alongside the rows and the provider geo index, search index, order
+# rollups and category caches are rebuilt at the end.
+# Every generated user signs in with the same password (one bcrypt hash).
+
+WORDS = (
+    'plumbing', 'wiring', 'cleaning', 'painting', 'repair', 'install', 'garden', 'moving', 'tutoring',
+    'carpentry', 'roofing', 'tiling', 'appliance', 'pest', 'laundry', 'catering', 'beauty', 'fitness',
+    'computer', 'phone', 'car', 'ac', 'heater', 'door', 'window', 'kitchen', 'bathroom', 'deep', 'quick',
+    'home', 'office', 'express', 'weekly', 'emergency', 'premium', 'basic',
+)
+DURATIONS = (30, 45, 60, 90, 120, 180)
+# completed orders dominate a mature marketplace
+STATUS_WEIGHTS = {
+    OrderStatus.pending: 0.08,
+    OrderStatus.accepted: 0.07,
+    OrderStatus.on_the_way: 0.02,
+    OrderStatus.reached: 0.01,
+    OrderStatus.completed: 0.72,
+    OrderStatus.rejected: 0.10,
+}
+REVIEWS = ('Great job', 'On time and friendly', 'Did the work, a bit late', 'Not happy with it', 'Would book again')
+COMPLAINTS = ('Provider did not show up', 'Work left unfinished', 'Charged more than agreed', 'Rude behaviour')
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(model, rows, batch_size):
+    started = time.perf_counter()
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(model), rows[start:start + batch_size])
+        db.session.commit()
+    if rows:
+        elapsed = time.perf_counter() - started
+        click.echo(f'{model.__tablename__:18} {len(rows):>10} rows  {len(rows) / max(elapsed, 1e-9):>10.0f} rows/s')
+    return len(rows)
+
+
+def _points(rng, n, lat, lon, spread_km):
+    # uniform over a disc around (lat, lon)
+    distance = spread_km * np.sqrt(rng.random(n))
+    bearing = rng.random(n) * 2 * math.pi
+    d_lat = np.degrees(distance * np.cos(bearing) / EARTH_RADIUS_KM)
+    d_lon = np.degrees(distance * np.sin(bearing) / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    return lat + d_lat, lon + d_lon
+
+
+def _titles(rng, n):
+    picks = rng.integers(0, len(WORDS), size=(n, 3))
+    return [' '.join(WORDS[i] for i in row) for row in picks]
+
+
+def _aggregates(groups, rates, size):
+    # rating_count, rating_sum, rating_score as flaskapp/ratings.py keeps them
+    count = np.bincount(groups, minlength=size)
+    total = np.bincount(groups, weights=rates, minlength=size)
+    score = (RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + total) / (RATING_PRIOR_WEIGHT + count)
+    return count, total, score
+
+
+def generate(users, providers, categories, subcategories, services, orders, review_rate, complaint_rate,
+             batch_size=5000, seed=0, password='password', lat=23.78, lon=90.40, spread_km=20.0):
+    """Append a synthetic marketplace to the database. Returns row counts by table."""
+    rng = np.random.default_rng(seed)
+    providers = min(providers, users - 1)
+    now = datetime.utcnow().replace(microsecond=0)
+    counts = {}
+
+    # the first `providers` new users also offer services, the rest are customers
+    user_ids = np.arange(_next_id(User), _next_id(User) + users)
+    provider_ids = user_ids[:providers]
+    customer_ids = user_ids[providers:]
+    p_lat, p_lon = _points(rng, providers, lat, lon, spread_km)
+    verified = rng.random(providers) < 0.9
+
+    category_ids = np.arange(_next_id(Category), _next_id(Category) + categories)
+    subcategory_id = _next_id(Subcategory)
+
+    n_services = providers * services
+    service_ids = np.arange(_next_id(Service), _next_id(Service) + n_services)
+    service_provider = np.repeat(np.arange(providers), services)
+    service_category = rng.integers(0, categories, size=n_services)
+    service_subcategory = rng.integers(0, max(subcategories, 1), size=n_services)
+    service_duration = rng.choice(DURATIONS, size=n_services)
+    service_price = np.round(rng.lognormal(3.5, 0.6, size=n_services), 2)
+
+    order_ids = np.arange(_next_id(Order), _next_id(Order) + orders)
+    # a few popular services get most of the orders
+    popularity = 1.0 / np.arange(1, n_services + 1) ** 0.8
+    picks = rng.permutation(n_services)[rng.choice(n_services, size=orders, p=popularity / popularity.sum())]
+    statuses = list(STATUS_WEIGHTS)
+    status = rng.choice(len(statuses), size=orders, p=list(STATUS_WEIGHTS.values()))
+    # finished orders over the past year, open ones over the next month, on the hour
+    when = now.replace(minute=0, second=0) - timedelta(days=365)
+    finished = np.isin(status, [statuses.index(OrderStatus.completed), statuses.index(OrderStatus.rejected)])
+    hours = np.where(
+        finished, rng.integers(0, 24 * 365, size=orders), 24 * 365 + rng.integers(1, 24 * 30, size=orders),
+    )
+    o_lat, o_lon = _points(rng, orders, lat, lon, spread_km)
+    customers = rng.choice(customer_ids, size=orders)
+    reviewed = (status == statuses.index(OrderStatus.completed)) & (rng.random(orders) < review_rate)
+    rates = rng.choice([1, 2, 3, 4, 5], size=orders, p=[0.05, 0.07, 0.13, 0.35, 0.40])
+    review_text = rng.integers(0, len(REVIEWS), size=orders)
+    complained = np.flatnonzero(rng.random(orders) < complaint_rate)
+    resolved = rng.random(len(complained)) < 0.5
+
+    s_count, s_sum, s_score = _aggregates(picks[reviewed], rates[reviewed], n_services)
+    p_count, p_sum, p_score = _aggregates(service_provider[picks[reviewed]], rates[reviewed], providers)
+
+    pw_hash = hash_password(password)
+    rows = [
+        {'id': int(i), 'username': f'synth{i}'[:20], 'email': f'synth{i}@example.com', 'image_file': 'default.jpg',
+         'password': pw_hash, 'is_admin': False}
+        for i in user_ids
+    ]
+    counts['user'] = _insert(User, rows, batch_size)
+
+    rows = [
+        {'id': int(i), 'nid': f'SYN{i}', 'bio': 'Synthetic provider', 'latitude': float(a), 'longitude': float(o),
+         'verified': bool(v), 'rating_count': int(c), 'rating_sum': float(t), 'rating_score': float(sc)}
+        for i, a, o, v, c, t, sc in zip(provider_ids, p_lat, p_lon, verified, p_count, p_sum, p_score)
+    ]
+    counts['service_provider'] = _insert(ServiceProvider, rows, batch_size)
+
+    counts['category'] = _insert(Category, [{'id': int(i), 'name': f'Synthetic {i}'} for i in category_ids], batch_size)
+    rows = [
+        {'id': subcategory_id + n * subcategories + k, 'name': f'Synthetic {c}.{k + 1}', 'category_id': int(c)}
+        for n, c in enumerate(category_ids) for k in range(subcategories)
+    ]
+    counts['subcategory'] = _insert(Subcategory, rows, batch_size)
+
+    posted = now - timedelta(days=365)
+    rows = [
+        {'id': int(i), 'title': title, 'description': f'Synthetic {title} service', 'date_posted': posted,
+         'user_id': int(provider_ids[p]), 'provider_id': int(provider_ids[p]),
+         'ratings': math.floor(t / c + 0.5) if c else 0, 'category_id': int(category_ids[cat]),
+         'subcategory_id': subcategory_id + int(cat) * subcategories + int(sub) if subcategories else None,
+         'duration': int(d), 'ser_price': float(price), 'rating_count': int(c), 'rating_sum': float(t),
+         'rating_score': float(sc), 'version': 1, 'date_modified': posted}
+        for i, title, p, cat, sub, d, price, c, t, sc in zip(
+            service_ids, _titles(rng, n_services), service_provider, service_category, service_subcategory,
+            service_duration, service_price, s_count, s_sum, s_score,
+        )
+    ]
+    counts['service'] = _insert(Service, rows, batch_size)
+
+    rows = [
+        {'id': int(i), 'order_loc': f'{a:.5f}, {o:.5f}', 'order_datetime': when + timedelta(hours=int(h)),
+         'status': statuses[s], 'review': REVIEWS[t] if r else None, 'rate': float(rate) if r else None,
+         'price': float(service_price[k]), 'notifications': NotificationStatus.viewed,
+         'ser_id': int(service_ids[k]), 'customer_id': int(cust),
+         'service_provider_id': int(provider_ids[service_provider[k]]),
+         'latitude': float(a), 'longitude': float(o), 'dispatch': False}
+        for i, k, s, h, a, o, cust, r, rate, t in zip(
+            order_ids, picks, status, hours, o_lat, o_lon, customers, reviewed, rates, review_text,
+        )
+    ]
+    counts['order'] = _insert(Order, rows, batch_size)
+
+    complaint_id = _next_id(Complaint)
+    rows = [
+        {'id': complaint_id + n, 'order_id': int(order_ids[k]), 'user_id': int(customers[k]),
+         'message': COMPLAINTS[n % len(COMPLAINTS)], 'date_posted': when + timedelta(hours=int(hours[k]) + 24),
+         'resolved': bool(done), 'action_taken': 'warned' if done else None}
+        for n, (k, done) in enumerate(zip(complained, resolved))
+    ]
+    counts['complaint'] = _insert(Complaint, rows, batch_size)
+
+    rebuild_geo_index()
+    rebuild_search_index()
+    backfill()
+    bump_version(db.session.connection(), CATEGORY_TREE)
+    invalidate_top_services()
+    db.session.commit()
+    return counts
+
+
+synth_cli = AppGroup('synth', help='Generate synthetic data for load testing.')
+
+
+@synth_cli.command('generate')
+@click.option('--users', default=1000, show_default=True, type=click.IntRange(2), help='Users, providers included.')
+@click.option('--providers', default=100, show_default=True, type=click.IntRange(1))
+@click.option('--categories', default=10, show_default=True, type=click.IntRange(1))
+@click.option('--subcategories', default=4, show_default=True, type=click.IntRange(0), help='Per category.')
+@click.option('--services', default=3, show_default=True, type=click.IntRange(1), help='Per provider.')
+@click.option('--orders', default=10000, show_default=True, type=click.IntRange(0))
+@click.option('--review-rate', default=0.6, show_default=True, help='Share of completed orders with a review.')
+@click.option('--complaint-rate', default=0.01, show_default=True, help='Share of orders with a complaint.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@click.option('--lat', default=23.78, show_default=True, help='City centre latitude.')
+@click.option('--lon', default=90.40, show_default=True, help='City centre longitude.')
+@click.option('--spread-km', default=20.0, show_default=True)
+def generate_command(**options):
+    """Append a synthetic marketplace to the database."""
+    started = time.perf_counter()
+    counts = generate(**options)
+    click.echo(f'{sum(counts.values())} rows in {time.perf_counter() - started:.1f}s; '
+               f'sign in as synth<id>@example.com / {options["password"]}')
+
+
+def init_app(app):
+    app.cli.add_command(synth_cli)
@@ -0,0 +1,97 @@
+from sqlalchemy import select, update
+from flaskapp import db
+from flaskapp.jobs import enqueue
+from flaskapp.models import Order, OrderStatus
+from flaskapp.rollups import record_transition
+from flaskapp.scheduling import release
+
+
+# Order status state machine. A transition is applied to any number of orders
+# with conditional UPDATEs ... WHERE status = <legal source>, so orders
+# in the wrong state (or owned by another provider) are simply not touched and
+# reported back per order. Status events are sent by a notify_orders job,
+# rejected orders give their slot back to the provider's calendar and every
+# move is counted in the order rollups.
+
+TRANSITIONS = {
+    OrderStatus.pending: {OrderStatus.accepted, OrderStatus.rejected},
+    OrderStatus.accepted: {OrderStatus.on_the_way, OrderStatus.reached, OrderStatus.completed, OrderStatus.rejected},
+    OrderStatus.on_the_way: {OrderStatus.reached, OrderStatus.completed},
+    OrderStatus.reached: {OrderStatus.completed},
+    OrderStatus.completed: set(),
+    OrderStatus.rejected: set(),
+}
+
+MAX_BULK_ORDERS = 500
+
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+ILLEGAL = 'illegal_transition'
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def sources_for(target):
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def _update(order_ids, target, provider_id):
+    # -> {order_id: status before} for the orders that were moved
+    legal = (
+        Order.id.in_(order_ids),
+        Order.service_provider_id == provider_id,
+        Order.dispatch.is_(False),
+    )
+    if db.engine.dialect.update_returning:
+        # one statement per source status, so every order's old status is known
+        updated = {}
+        for source in sources_for(target):
+            for order_id in db.session.scalars(
+                update(Order).where(*legal, Order.status == source).values(status=target).returning(Order.id),
+                execution_options={'synchronize_session': False},
+            ):
+                updated[order_id] = source
+        return updated
+    # no UPDATE ... RETURNING (e.g. MySQL): lock the matching rows first
+    updated = dict(db.session.execute(
+        select(Order.id, Order.status).where(*legal, Order.status.in_(sources_for(target))).with_for_update()
+    ).all())
+    if updated:
+        db.session.execute(
+            update(Order).where(Order.id.in_(updated)).values(status=target),
+            execution_options={'synchronize_session': False},
+        )
+    return updated
+
+
+def transition_orders(order_ids, target, provider_id):
+    """Move the orders of `provider_id` in `order_ids` to `target` and commit.
+
+    Returns {order_id: {'ok', 'status', 'error'}}; 'status' is the order's
+    status after the call (None if it does not exist or is not theirs).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    updated = _update(order_ids, target, provider_id) if order_ids else {}
+
+    results = {order_id: {'ok': True, 'status': target.value, 'error': None} for order_id in updated}
+    rejected = [order_id for order_id in order_ids if order_id not in updated]
+    if rejected:
+        found = db.session.execute(
+            select(Order.id, Order.status, Order.service_provider_id).where(Order.id.in_(rejected))
+        ).all()
+        for order_id, status, owner_id in found:
+            if owner_id != provider_id:
+                results[order_id] = {'ok': False, 'status': None, 'error': FORBIDDEN}
+            else:
+                results[order_id] = {'ok': False, 'status': status.value, 'error': ILLEGAL}
+        for order_id in rejected:
+            results.setdefault(order_id, {'ok': False, 'status': None, 'error': NOT_FOUND})
+    if updated:
+        record_transition(updated, target)
+        enqueue('notify_orders', order_ids=sorted(updated), kind='status')
+    db.session.commit()
+    if updated and target == OrderStatus.rejected:
+        release(updated)
+    return {order_id: results[order_id] for order_id in order_ids}
@@ -0,0 +1,50 @@
+"""Add composite indexes for listing and lookup queries
+
+Revision ID: 3c9e4b7a1f20
+Revises: 85d2bdd097be
+Create Date: 2026-10-18 10:12:41.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e4b7a1f20'
+down_revision = '85d2bdd097be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.create_index('ix_service_category_ratings', ['category_id', 'ratings'], unique=False)
+        batch_op.create_index('ix_service_price_ratings', ['ser_price', 'ratings'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_customer_datetime', ['customer_id', 'order_datetime'], unique=False)
+        batch_op.create_index('ix_order_provider_notifications_datetime', ['service_provider_id', 'notifications', 'order_datetime'], unique=False)
+        batch_op.create_index('ix_order_provider_status_datetime', ['service_provider_id', 'status', 'order_datetime'], unique=False)
+
+    with op.batch_alter_table('complaint', schema=None) as batch_op:
+        batch_op.create_index('ix_complaint_resolved_date_posted', ['resolved', 'date_posted'], unique=False)
+
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_service_provider_verified'), ['verified'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_service_provider_verified'))
+
+    with op.batch_alter_table('complaint', schema=None) as batch_op:
+        batch_op.drop_index('ix_complaint_resolved_date_posted')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_provider_status_datetime')
+        batch_op.drop_index('ix_order_provider_notifications_datetime')
+        batch_op.drop_index('ix_order_customer_datetime')
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_index('ix_service_price_ratings')
+        batch_op.drop_index('ix_service_category_ratings')
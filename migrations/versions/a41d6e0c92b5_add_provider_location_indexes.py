@@ -0,0 +1,32 @@
+"""Add provider location and provider/category indexes
+
+Revision ID: a41d6e0c92b5
+Revises: 3c9e4b7a1f20
+Create Date: 2026-10-18 11:03:18.550412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d6e0c92b5'
+down_revision = '3c9e4b7a1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.create_index('ix_service_provider_lat_lon', ['latitude', 'longitude'], unique=False)
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.create_index('ix_service_provider_category', ['provider_id', 'category_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_index('ix_service_provider_category')
+
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.drop_index('ix_service_provider_lat_lon')
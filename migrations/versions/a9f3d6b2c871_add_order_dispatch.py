@@ -0,0 +1,28 @@
+"""Add order dispatch flag
+
+Revision ID: a9f3d6b2c871
+Revises: c3e58a0d7f14
+Create Date: 2026-10-18 18:12:37.204815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9f3d6b2c871'
+down_revision = 'c3e58a0d7f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dispatch', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.create_index('ix_order_dispatch_status', ['dispatch', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_dispatch_status')
+        batch_op.drop_column('dispatch')
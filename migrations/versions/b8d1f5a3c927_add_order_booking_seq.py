@@ -0,0 +1,28 @@
+"""Add order booking sequence
+
+Revision ID: b8d1f5a3c927
+Revises: e6a2c9d4f183
+Create Date: 2026-10-18 22:16:08.430517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d1f5a3c927'
+down_revision = 'e6a2c9d4f183'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('booking_seq', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_order_booking_seq'), ['booking_seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_booking_seq'))
+        batch_op.drop_column('booking_seq')
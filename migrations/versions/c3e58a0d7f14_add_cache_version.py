@@ -0,0 +1,29 @@
+"""Add cache_version table
+
+Revision ID: c3e58a0d7f14
+Revises: b7d41e9c2a63
+Create Date: 2026-10-18 17:05:12.640918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e58a0d7f14'
+down_revision = 'b7d41e9c2a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table('cache_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_version, [{'name': 'category_tree', 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('cache_version')
@@ -0,0 +1,40 @@
+"""Add service full-text search table
+
+Revision ID: c5f1e8a2d734
+Revises: b8d1f5a3c927
+Create Date: 2026-10-19 09:12:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1e8a2d734'
+down_revision = 'b8d1f5a3c927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only; other databases search with the in-memory index
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    try:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS service_search "
+            "USING fts5(title, description, tokenize='unicode61')"
+        )
+    except sa.exc.OperationalError:
+        # built without FTS5
+        return
+    op.execute('DELETE FROM service_search')
+    op.execute(
+        'INSERT INTO service_search (rowid, title, description) '
+        'SELECT id, title, description FROM service'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS service_search')
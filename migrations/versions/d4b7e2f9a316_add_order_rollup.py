@@ -0,0 +1,53 @@
+"""Add order_rollup table
+
+Revision ID: d4b7e2f9a316
+Revises: a9f3d6b2c871
+Create Date: 2026-10-18 19:03:52.881460
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b7e2f9a316'
+down_revision = 'a9f3d6b2c871'
+branch_labels = None
+depends_on = None
+
+ORDER_STATUS = sa.Enum('pending', 'accepted', 'on_the_way', 'reached', 'completed', 'rejected', name='orderstatus')
+
+
+def upgrade():
+    op.create_table('order_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('provider_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('category_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', ORDER_STATUS, nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('price_sum', sa.Float(), nullable=False),
+    sa.Column('rate_count', sa.Integer(), nullable=False),
+    sa.Column('rate_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'provider_id', 'category_id', 'status')
+    )
+    with op.batch_alter_table('order_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_order_rollup_category_day', ['category_id', 'day'], unique=False)
+        batch_op.create_index('ix_order_rollup_provider_day', ['provider_id', 'day'], unique=False)
+
+    # fill from the existing orders
+    op.execute(
+        'INSERT INTO order_rollup (day, provider_id, category_id, status, order_count, price_sum, rate_count, rate_sum) '
+        'SELECT date(o.order_datetime), o.service_provider_id, s.category_id, o.status, '
+        'count(o.id), coalesce(sum(o.price), 0), count(o.rate), coalesce(sum(o.rate), 0) '
+        'FROM "order" o JOIN service s ON o.ser_id = s.id '
+        'WHERE o.order_datetime IS NOT NULL '
+        'GROUP BY date(o.order_datetime), o.service_provider_id, s.category_id, o.status'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('order_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_rollup_provider_day')
+        batch_op.drop_index('ix_order_rollup_category_day')
+
+    op.drop_table('order_rollup')
@@ -0,0 +1,41 @@
+"""Add service provider R-tree
+
+Revision ID: d9a4b2e7f615
+Revises: c5f1e8a2d734
+Create Date: 2026-10-19 09:48:17.502361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4b2e7f615'
+down_revision = 'c5f1e8a2d734'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only; other databases use the lat/lon range query
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    try:
+        op.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS service_provider_geo '
+            'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+        )
+    except sa.exc.OperationalError:
+        # built without the R-tree module
+        return
+    op.execute('DELETE FROM service_provider_geo')
+    op.execute(
+        'INSERT INTO service_provider_geo (id, min_lat, max_lat, min_lon, max_lon) '
+        'SELECT id, latitude, latitude, longitude, longitude FROM service_provider '
+        'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS service_provider_geo')
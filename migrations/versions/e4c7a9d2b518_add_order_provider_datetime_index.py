@@ -0,0 +1,26 @@
+"""Add order provider/datetime index for booking checks
+
+Revision ID: e4c7a9d2b518
+Revises: d9a4b2e7f615
+Create Date: 2026-10-19 14:06:52.318904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c7a9d2b518'
+down_revision = 'd9a4b2e7f615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_provider_datetime', ['service_provider_id', 'order_datetime'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_provider_datetime')
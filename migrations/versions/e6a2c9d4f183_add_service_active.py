@@ -0,0 +1,26 @@
+"""Add service active flag
+
+Revision ID: e6a2c9d4f183
+Revises: d4b7e2f9a316
+Create Date: 2026-10-18 21:04:52.618309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c9d4f183'
+down_revision = 'd4b7e2f9a316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_column('active')
@@ -0,0 +1,70 @@
+"""Add rating aggregates to service and service_provider
+
+Revision ID: e9b3c1d7a24f
+Revises: d58f2a9e6b13
+Create Date: 2026-10-18 12:31:52.774903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b3c1d7a24f'
+down_revision = 'd58f2a9e6b13'
+branch_labels = None
+depends_on = None
+
+# keep in step with RATING_PRIOR_MEAN / RATING_PRIOR_WEIGHT in flaskapp/models.py
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 5
+
+
+def upgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_score', sa.Float(), nullable=False, server_default=str(PRIOR_MEAN)))
+        batch_op.drop_index('ix_service_category_ratings')
+        batch_op.drop_index('ix_service_price_ratings')
+        batch_op.create_index('ix_service_category_score', ['category_id', 'rating_score'], unique=False)
+        batch_op.create_index('ix_service_price_score', ['ser_price', 'rating_score'], unique=False)
+
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_score', sa.Float(), nullable=False, server_default=str(PRIOR_MEAN)))
+        batch_op.create_index(batch_op.f('ix_service_provider_rating_score'), ['rating_score'], unique=False)
+
+    # backfill from the reviews already stored on orders
+    for table, column in (('service', 'ser_id'), ('service_provider', 'service_provider_id')):
+        op.execute(
+            f'UPDATE {table} SET '
+            f'rating_count = (SELECT COUNT(rate) FROM "order" WHERE "order".{column} = {table}.id), '
+            f'rating_sum = (SELECT COALESCE(SUM(rate), 0) FROM "order" WHERE "order".{column} = {table}.id)'
+        )
+        op.execute(
+            f'UPDATE {table} SET rating_score = '
+            f'({PRIOR_WEIGHT} * {PRIOR_MEAN} + rating_sum) / ({PRIOR_WEIGHT} + rating_count)'
+        )
+    op.execute(
+        'UPDATE service SET ratings = CAST(ROUND(rating_sum / rating_count) AS INTEGER) '
+        'WHERE rating_count > 0'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_service_provider_rating_score'))
+        batch_op.drop_column('rating_score')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_index('ix_service_price_score')
+        batch_op.drop_index('ix_service_category_score')
+        batch_op.create_index('ix_service_price_ratings', ['ser_price', 'ratings'], unique=False)
+        batch_op.create_index('ix_service_category_ratings', ['category_id', 'ratings'], unique=False)
+        batch_op.drop_column('rating_score')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
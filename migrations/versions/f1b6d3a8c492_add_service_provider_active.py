@@ -0,0 +1,26 @@
+"""Add service provider active flag
+
+Revision ID: f1b6d3a8c492
+Revises: e4c7a9d2b518
+Create Date: 2026-10-19 16:23:40.915237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6d3a8c492'
+down_revision = 'e4c7a9d2b518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade():
+    with op.batch_alter_table('service_provider', schema=None) as batch_op:
+        batch_op.drop_column('active')
@@ -0,0 +1,33 @@
+"""Add version stamp to service
+
+Revision ID: f2a8c4e1b937
+Revises: e9b3c1d7a24f
+Create Date: 2026-10-18 15:04:27.318560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4e1b937'
+down_revision = 'e9b3c1d7a24f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('date_modified', sa.DateTime(), nullable=True))
+
+    op.execute('UPDATE service SET date_modified = date_posted')
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.alter_column('date_modified', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_column('date_modified')
+        batch_op.drop_column('version')
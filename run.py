@@ -1,8 +1,11 @@
-from flaskapp import app, db, socketio
+from flaskapp import create_app, db, jobs, socketio
+
+app = create_app()
 
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    
+    # this process serves the app, so it also runs the background jobs
+    jobs.start(app)
     socketio.run(app, debug=True)
\ No newline at end of file
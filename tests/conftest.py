@@ -0,0 +1,64 @@
+import pytest
+from flaskapp import cache, create_app, db, fragments, scheduling
+from flaskapp.config import Config
+from flaskapp.models import Category, Service, ServiceProvider, User
+from tests.utils import add_orders
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    # jobs stay queued; nothing runs in the background during a test
+    JOB_WORKERS = 0
+    USER_CACHE_TTL = 0
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app(TestConfig)
+
+
+@pytest.fixture
+def database(app):
+    # no app context is held open: requests made by the test client must get
+    # their own, as they would in production (flask.g, the session)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    # process-wide caches outlive the tables they were filled from
+    cache._top_services = None
+    cache._category_tree = None
+    fragments.fragment_cache.clear()
+    with scheduling._lock:
+        scheduling._calendars.clear()
+        scheduling._last_booking_seq = None
+    return db
+
+
+@pytest.fixture
+def marketplace(app, database):
+    """A provider (user 1), a customer (user 2), two categories with three
+    services each and ten orders of the customer with the provider."""
+    with app.app_context():
+        provider = User(username='provider', email='provider@example.com', password='x')
+        customer = User(username='customer', email='customer@example.com', password='x')
+        database.session.add_all([provider, customer])
+        database.session.flush()
+        database.session.add(ServiceProvider(id=provider.id, nid='P1', latitude=23.8, longitude=90.4, verified=True))
+        for n in range(2):
+            category = Category(name=f'Category {n}')
+            database.session.add(category)
+            database.session.flush()
+            for k in range(3):
+                database.session.add(Service(
+                    title=f'Service {n}.{k}', description='Fixes things', user_id=provider.id,
+                    provider_id=provider.id, ratings=k, category_id=category.id, duration=60, ser_price=10.0 + k,
+                ))
+        database.session.flush()
+        add_orders(database.session, provider.id, customer.id, 10)
+        database.session.commit()
+        ids = {'provider_id': provider.id, 'customer_id': customer.id}
+    return ids
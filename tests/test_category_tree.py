@@ -0,0 +1,78 @@
+from flaskapp import cache, db
+from flaskapp.cache import category_tree
+from flaskapp.models import Category, Subcategory, User
+from tests.utils import login
+
+
+# The category tree is cached per process and rebuilt once the shared
+# 'category_tree' counter moves, which every committed taxonomy change does.
+
+
+def tree(app):
+    with app.app_context():
+        return category_tree()
+
+
+def test_tree_is_reused_while_unchanged(app, marketplace):
+    first = tree(app)
+    assert sorted(first.categories.values()) == ['Category 0', 'Category 1']
+    assert tree(app) is first
+
+
+def test_category_edits_rebuild_tree(app, marketplace):
+    first = tree(app)
+    with app.app_context():
+        db.session.get(Category, 1).name = 'Plumbing'
+        db.session.add(Category(name='Cleaning'))
+        db.session.commit()
+
+    second = tree(app)
+    assert second is not first
+    assert sorted(second.categories.values()) == ['Category 1', 'Cleaning', 'Plumbing']
+
+
+def test_subcategory_edits_rebuild_tree(app, marketplace):
+    with app.app_context():
+        db.session.add(Subcategory(name='Pipes', category_id=1))
+        db.session.commit()
+    assert tree(app).subcategory_choices(1) == [(1, 'Pipes')]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Subcategory, 1))
+        db.session.commit()
+    assert tree(app).subcategory_choices(1) == []
+
+
+def test_rolled_back_edit_keeps_tree(app, marketplace):
+    first = tree(app)
+    with app.app_context():
+        db.session.add(Category(name='Cleaning'))
+        db.session.flush()
+        db.session.rollback()
+    assert tree(app) is first
+
+
+def test_stale_process_tree_is_replaced(app, marketplace):
+    # another worker committed a change after this one built its tree
+    stale = tree(app)
+    with app.app_context():
+        db.session.add(Category(name='Cleaning'))
+        db.session.commit()
+    cache._category_tree = stale
+    assert 'Cleaning' in tree(app).categories.values()
+
+
+def test_admin_sees_new_category_in_forms(app, marketplace):
+    with app.app_context():
+        db.session.get(User, marketplace['customer_id']).is_admin = True
+        db.session.commit()
+    tree(app)
+    client = app.test_client()
+    login(client, marketplace['customer_id'])
+
+    assert client.post('/add_category', data={'name': 'Cleaning'}).status_code == 302
+    category_id = next(key for key, name in tree(app).categories.items() if name == 'Cleaning')
+    # the subcategory form only accepts categories in the tree
+    assert client.post('/add_subcategory', data={'name': 'Windows', 'category': category_id}).status_code == 302
+    assert tree(app).subcategory_choices(category_id) == [(1, 'Windows')]
+    assert b'Cleaning' in client.get('/admin').data
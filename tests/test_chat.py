@@ -0,0 +1,62 @@
+from flaskapp import db, socketio
+from flaskapp.chat import message_buffer, order_room
+from flaskapp.models import User
+from tests.utils import login
+
+
+# The global room is open to every signed-in user; an order's room only to its
+# customer and provider. Sockets read and post only in rooms they joined.
+
+
+def stranger(app):
+    with app.app_context():
+        user = User(username='stranger', email='stranger@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def chat_client(app, user_id):
+    client = app.test_client()
+    login(client, user_id)
+    return socketio.test_client(app, flask_test_client=client)
+
+
+def history(socket):
+    return [event['args'][0] for event in socket.get_received() if event['name'] == 'history']
+
+
+def test_order_chat_page_is_for_customer_and_provider(app, marketplace):
+    for user in ('customer_id', 'provider_id'):
+        client = app.test_client()
+        login(client, marketplace[user])
+        assert client.get('/chat?order=1').status_code == 200
+    client = app.test_client()
+    login(client, stranger(app))
+    assert client.get('/chat?order=1').status_code == 403
+    assert client.get('/chat').status_code == 200
+
+
+def test_stranger_cannot_read_order_room(app, marketplace):
+    room = order_room(1)
+    customer = chat_client(app, marketplace['customer_id'])
+    customer.emit('join', {'room': room})
+    customer.emit('send_message', {'room': room, 'msg': 'gate code 1234'})
+    message_buffer.flush()
+    assert history(customer)[0]['room'] == room
+
+    other = chat_client(app, stranger(app))
+    other.emit('join', {'room': room})
+    other.emit('load_history', {'room': room})
+    other.emit('send_message', {'room': room, 'msg': 'hello'})
+    assert history(other) == []
+    assert [event['args'][0]['msg'] for event in customer.get_received() if event['name'] == 'message'] == []
+
+
+def test_history_needs_a_joined_room(app, marketplace):
+    socket = chat_client(app, marketplace['customer_id'])
+    socket.emit('load_history', {'room': 'global'})
+    assert history(socket) == []
+    socket.emit('join', {'room': 'global'})
+    socket.emit('load_history', {'room': 'global'})
+    assert [page['room'] for page in history(socket)] == ['global', 'global']
@@ -0,0 +1,55 @@
+from flaskapp import db
+from flaskapp.complaints import remove_provider
+from flaskapp.models import Order, OrderStatus, Service, ServiceProvider
+from tests.utils import login
+
+
+# Removing a provider after an upheld complaint keeps their row, so the
+# orders and services that point at it stay readable.
+
+
+def remove(app, provider_id):
+    with app.app_context():
+        remove_provider(provider_id)
+
+
+def test_removed_provider_is_kept_inactive(app, marketplace):
+    provider_id = marketplace['provider_id']
+    remove(app, provider_id)
+    with app.app_context():
+        provider = db.session.get(ServiceProvider, provider_id)
+        assert provider is not None
+        assert not provider.active and not provider.verified
+        statuses = {status for (status,) in db.session.query(Order.status)}
+        assert statuses <= {OrderStatus.completed, OrderStatus.rejected}
+        # services with orders stay for the history, unlisted; the rest go
+        services = db.session.query(Service.id, Service.active).all()
+        ordered = {ser_id for (ser_id,) in db.session.query(Order.ser_id)}
+        assert {service_id for service_id, _ in services} == ordered
+        assert not any(active for _, active in services)
+
+
+def test_orders_of_removed_provider_still_render(app, marketplace):
+    remove(app, marketplace['provider_id'])
+    client = app.test_client()
+    login(client, marketplace['customer_id'])
+    assert client.get('/order/1').status_code == 200
+    assert client.get('/alluserorders').status_code == 200
+
+
+def test_removed_provider_loses_provider_pages(app, marketplace):
+    remove(app, marketplace['provider_id'])
+    client = app.test_client()
+    login(client, marketplace['provider_id'])
+    assert client.get('/accepted_orders').status_code == 403
+    assert client.get('/api/earnings').status_code == 403
+
+
+def test_order_of_deleted_provider_renders(app, marketplace):
+    # removed by an older release (SQLite does not enforce the foreign key)
+    with app.app_context():
+        db.session.query(ServiceProvider).delete()
+        db.session.commit()
+    client = app.test_client()
+    login(client, marketplace['customer_id'])
+    assert client.get('/order/1').status_code == 200
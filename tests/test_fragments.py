@@ -0,0 +1,75 @@
+from flaskapp import db
+from flaskapp.fragments import fragment_cache
+from flaskapp.models import Service
+from tests.utils import login
+
+
+# Service pages answer conditional GETs from the version stamp alone and
+# re-render once the service is edited.
+PATH = '/servicedetails/1'
+
+
+def test_service_page_sends_validators(app, marketplace):
+    response = app.test_client().get(PATH)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.last_modified is not None
+    assert response.cache_control.no_cache
+    assert 'Cookie' in response.vary
+
+
+def test_matching_etag_gets_304(app, marketplace):
+    client = app.test_client()
+    etag = client.get(PATH).headers['ETag']
+    response = client.get(PATH, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert not response.data
+
+
+def test_unchanged_since_gets_304(app, marketplace):
+    client = app.test_client()
+    last_modified = client.get(PATH).headers['Last-Modified']
+    assert client.get(PATH, headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_edit_changes_etag(app, marketplace):
+    client = app.test_client()
+    etag = client.get(PATH).headers['ETag']
+    with app.app_context():
+        db.session.get(Service, 1).title = 'Renamed service'
+        db.session.commit()
+
+    response = client.get(PATH, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b'Renamed service' in response.data
+
+
+def test_etag_depends_on_user(app, marketplace):
+    client = app.test_client()
+    anonymous = client.get(PATH).headers['ETag']
+    login(client, marketplace['customer_id'])
+    response = client.get(PATH, headers={'If-None-Match': anonymous})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous
+
+
+def test_pending_flash_is_not_cached(app, marketplace):
+    client = app.test_client()
+    etag = client.get(PATH).headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('info', 'Saved')]
+    response = client.get(PATH, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_summary_rendered_once_per_version(app, marketplace):
+    client = app.test_client()
+    before = fragment_cache.stats()
+    client.get(PATH)
+    client.get(PATH)
+    after = fragment_cache.stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
@@ -0,0 +1,34 @@
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+from flaskapp import db, images
+from flaskapp.models import User
+
+
+@pytest.fixture
+def picture_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'PICTURE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def upload(app, filename, data=b'picture bytes'):
+    with app.app_context():
+        name = images.save_picture(FileStorage(io.BytesIO(data), filename=filename))
+        db.session.rollback()
+    return name
+
+
+@pytest.mark.parametrize('filename', ['me.jpg', 'me.JPEG', 'me.png'])
+def test_picture_name_fits_user_column(app, database, picture_dir, filename):
+    name = upload(app, filename)
+    assert len(name) <= User.image_file.type.length
+    assert (picture_dir / name).exists()
+
+
+def test_jpeg_is_stored_as_jpg(app, database, picture_dir):
+    assert upload(app, 'me.jpeg') == upload(app, 'me.jpg')
+    assert upload(app, 'me.jpeg').endswith('.jpg')
+
+
+def test_name_follows_content(app, database, picture_dir):
+    assert upload(app, 'a.png', b'one') != upload(app, 'a.png', b'two')
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+# Importing the package must stay cheap: no app, no views, no heavy
+# dependencies until create_app() runs. Measured in a fresh interpreter so
+# modules imported by other tests don't hide a regression.
+IMPORT_BUDGET_SECONDS = 3.0
+ROOT = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ('flaskapp.blueprints', 'flaskapp.models', 'flaskapp.search', 'numpy', 'PIL')
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import flaskapp
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+'''
+
+
+def import_flaskapp():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % (LAZY_MODULES,)], check=True, capture_output=True, text=True, cwd=ROOT,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_views_or_heavy_modules():
+    assert import_flaskapp()['loaded'] == []
+
+
+def test_import_time_within_budget():
+    # best of three, to keep a busy machine from failing the build
+    seconds = min(import_flaskapp()['seconds'] for _ in range(3))
+    assert seconds < IMPORT_BUDGET_SECONDS, f'import flaskapp took {seconds:.2f}s'
@@ -0,0 +1,42 @@
+import pytest
+from flaskapp import db
+from flaskapp.models import User
+from tests.utils import capture_sql, login, query_plans
+
+
+# Each hot listing must be answered through its composite index; a plan that
+# falls back to scanning the table fails here first.
+ROUTES = [
+    ('customer_id', '/alluserorders', 'ix_order_customer_datetime'),
+    ('provider_id', '/notification', 'ix_order_provider_notifications_datetime'),
+    ('provider_id', '/accepted_orders', 'ix_order_provider_status_datetime'),
+    ('customer_id', '/', 'ix_service_category_score'),
+    ('admin_id', '/admin', 'ix_complaint_resolved_date_posted'),
+]
+
+
+@pytest.mark.parametrize('user, path, index', ROUTES)
+def test_listing_uses_index(app, marketplace, user, path, index):
+    if user == 'admin_id':
+        with app.app_context():
+            db.session.get(User, marketplace['customer_id']).is_admin = True
+            db.session.commit()
+        user = 'customer_id'
+    client = app.test_client()
+    login(client, marketplace[user])
+
+    with capture_sql(app) as statements:
+        assert client.get(path).status_code == 200
+
+    plans = query_plans(app, statements)
+    assert any(index in ' '.join(plan) for _, plan in plans), plans
+
+
+def test_order_listings_do_not_scan_orders(app, marketplace):
+    client = app.test_client()
+    login(client, marketplace['provider_id'])
+    for path in ('/alluserorders', '/notification', '/accepted_orders'):
+        with capture_sql(app) as statements:
+            client.get(path)
+        for statement, plan in query_plans(app, statements):
+            assert not any(step.startswith('SCAN order') for step in plan), (path, statement, plan)
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+import pytest
+from flaskapp import db, jobs
+from flaskapp.jobs import DONE, FAILED, QUEUED, enqueue, run_job
+from flaskapp.models import Job
+
+
+# The job queue: jobs are handed to the workers only once the change that
+# queued them commits, and failures are retried with exponential backoff
+# until max_attempts.
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Handlers 'test_ok' and 'test_flaky' (fails while `failures` > 0); returns the calls made."""
+    made = {'ok': [], 'failures': 0}
+
+    def ok(**kwargs):
+        made['ok'].append(kwargs)
+
+    def flaky():
+        if made['failures']:
+            made['failures'] -= 1
+            raise RuntimeError('flaky')
+
+    monkeypatch.setitem(jobs.handlers, 'test_ok', ok)
+    monkeypatch.setitem(jobs.handlers, 'test_flaky', flaky)
+    return made
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    ids = []
+    monkeypatch.setattr(jobs.JobQueue, 'submit', lambda self, job_ids: ids.extend(job_ids))
+    return ids
+
+
+def queue(app, name, **kwargs):
+    with app.app_context():
+        entry = enqueue(name, **kwargs)
+        db.session.commit()
+        return entry.id
+
+
+def make_due(app, job_id):
+    with app.app_context():
+        db.session.get(Job, job_id).run_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+
+def test_enqueued_job_is_submitted_after_commit(app, database, calls, submitted):
+    with app.app_context():
+        entry = enqueue('test_ok', value=1)
+        db.session.flush()
+        assert submitted == []
+        db.session.commit()
+        assert submitted == [entry.id]
+
+
+def test_rolled_back_job_is_never_submitted(app, database, calls, submitted):
+    with app.app_context():
+        enqueue('test_ok', value=1)
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert submitted == []
+        assert db.session.query(Job).count() == 0
+
+
+def test_app_leaves_jobs_queued_until_started(app, database, calls):
+    # create_app() runs for CLI commands and migrations too; only the served
+    # process starts the workers
+    assert app.extensions['jobs'].executor is None
+    job_id = queue(app, 'test_ok', value=1)
+    with app.app_context():
+        assert db.session.get(Job, job_id).status == QUEUED
+    assert calls['ok'] == []
+
+
+def test_unknown_job_name_is_refused(app, database):
+    with app.app_context(), pytest.raises(KeyError):
+        enqueue('no_such_job')
+
+
+def test_job_runs_once_with_its_arguments(app, database, calls, submitted):
+    job_id = queue(app, 'test_ok', value=1)
+    with app.app_context():
+        assert run_job(job_id) == DONE
+        assert run_job(job_id) is None
+        entry = db.session.get(Job, job_id)
+        assert entry.attempts == 1 and entry.date_finished is not None
+    assert calls['ok'] == [{'value': 1}]
+
+
+def test_failed_job_is_retried_with_backoff(app, database, calls, submitted):
+    calls['failures'] = 2
+    job_id = queue(app, 'test_flaky')
+    with app.app_context():
+        started = datetime.utcnow()
+        assert run_job(job_id) == QUEUED
+        entry = db.session.get(Job, job_id)
+        assert entry.attempts == 1
+        assert 'RuntimeError' in entry.last_error
+        assert entry.run_at >= started + timedelta(seconds=2)
+        # not due yet
+        assert run_job(job_id) is None
+
+    make_due(app, job_id)
+    with app.app_context():
+        started = datetime.utcnow()
+        assert run_job(job_id) == QUEUED
+        assert db.session.get(Job, job_id).run_at >= started + timedelta(seconds=4)
+
+    make_due(app, job_id)
+    with app.app_context():
+        assert run_job(job_id) == DONE
+        assert db.session.get(Job, job_id).attempts == 3
+
+
+def test_job_fails_after_max_attempts(app, database, calls, submitted):
+    calls['failures'] = 10
+    job_id = queue(app, 'test_flaky', max_attempts=2)
+    with app.app_context():
+        assert run_job(job_id) == QUEUED
+    make_due(app, job_id)
+    with app.app_context():
+        assert run_job(job_id) == FAILED
+        entry = db.session.get(Job, job_id)
+        assert entry.attempts == 2 and entry.date_finished is not None
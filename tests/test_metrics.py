@@ -0,0 +1,32 @@
+from tests.utils import capture_sql, query_plans
+
+
+# /metrics is for this host's scraper, or one sending METRICS_TOKEN, and
+# reads counters rather than scanning tables.
+
+
+def test_metrics_from_loopback(app, database):
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert b'flaskapp_jobs{status="queued"} 0' in response.data
+
+
+def test_metrics_refused_from_elsewhere(app, database):
+    client = app.test_client()
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.7'}).status_code == 403
+
+
+def test_metrics_token(app, database, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    client = app.test_client()
+    remote = {'REMOTE_ADDR': '10.0.0.7'}
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer nope'}).status_code == 403
+    assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_metrics_do_not_scan_jobs(app, database):
+    with capture_sql(app) as statements:
+        assert app.test_client().get('/metrics').status_code == 200
+    for statement, plan in query_plans(app, statements):
+        assert not any(step.startswith('SCAN job') for step in plan), (statement, plan)
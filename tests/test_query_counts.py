@@ -0,0 +1,38 @@
+import pytest
+from flaskapp import db
+from tests.utils import add_orders, capture_sql, login
+
+
+# Statements per order view, the user load included. Each view fetches what it
+# renders in a fixed number of queries, however many orders there are.
+ROUTES = [
+    ('customer_id', '/alluserorders', 2),
+    ('customer_id', '/userorderdetails/1', 2),
+    ('customer_id', '/order/1', 2),
+    ('provider_id', '/notification', 5),
+    ('provider_id', '/accepted_orders', 4),
+]
+
+
+def count_statements(app, client, path):
+    with capture_sql(app) as statements:
+        assert client.get(path).status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('user, path, expected', ROUTES)
+def test_order_view_statement_count(app, marketplace, user, path, expected):
+    client = app.test_client()
+    login(client, marketplace[user])
+    assert count_statements(app, client, path) == expected
+
+
+@pytest.mark.parametrize('user, path, expected', ROUTES)
+def test_order_view_statement_count_does_not_grow(app, marketplace, user, path, expected):
+    client = app.test_client()
+    login(client, marketplace[user])
+    before = count_statements(app, client, path)
+    with app.app_context():
+        add_orders(db.session, marketplace['provider_id'], marketplace['customer_id'], 40)
+        db.session.commit()
+    assert count_statements(app, client, path) == before
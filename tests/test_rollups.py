@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import delete, select
+from flaskapp import db, rollups
+from flaskapp.models import Order, OrderRollup, OrderStatus
+
+
+# Rollups kept in step order by order must match a backfill from the orders.
+
+
+def snapshot():
+    table = OrderRollup.__table__
+    return sorted(
+        (row.day, row.provider_id, row.category_id, row.status.value, row.order_count,
+         round(row.price_sum, 6), row.rate_count, round(row.rate_sum, 6))
+        for row in db.session.execute(select(table)) if row.order_count
+    )
+
+
+@pytest.fixture(params=['upsert', 'update then insert'])
+def dialect_path(request, monkeypatch):
+    if request.param != 'upsert':
+        monkeypatch.setattr(rollups, 'upsert_insert', lambda dialect: None)
+    return request.param
+
+
+def test_incremental_rollups_match_backfill(app, marketplace, dialect_path):
+    with app.app_context():
+        db.session.execute(delete(OrderRollup))
+        order_ids = [order_id for (order_id,) in db.session.query(Order.id).order_by(Order.id)]
+        # one at a time, then the rest at once: new keys and existing keys
+        for order_id in order_ids[:3]:
+            rollups.record_orders([order_id])
+        rollups.record_orders(order_ids[3:])
+        old = dict(db.session.query(Order.id, Order.status).filter(Order.status != OrderStatus.completed))
+        db.session.query(Order).filter(Order.id.in_(old)).update({'status': OrderStatus.completed})
+        rollups.record_transition(old, OrderStatus.completed)
+        db.session.commit()
+        incremental = snapshot()
+
+        rollups.backfill()
+        assert incremental == snapshot()
@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from flaskapp import db
+from flaskapp.models import Complaint, NotificationStatus, Order, OrderStatus
+
+
+def add_orders(session, provider_id, customer_id, n, start=datetime(2026, 1, 1, 8)):
+    statuses = list(OrderStatus)
+    for i in range(n):
+        order = Order(
+            order_loc='12 Main St', order_datetime=start + timedelta(hours=2 * i), price=10.0 + i,
+            ser_id=1 + i % 6, customer_id=customer_id, service_provider_id=provider_id,
+            status=statuses[i % len(statuses)],
+            notifications=NotificationStatus.not_viewed if i % 2 else NotificationStatus.viewed,
+        )
+        session.add(order)
+        session.flush()
+        if i % 4 == 0:
+            session.add(Complaint(order_id=order.id, user_id=customer_id, message='Late'))
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+@contextmanager
+def capture_sql(app):
+    """Collect (statement, parameters) for everything `app` sends to the database."""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def query_plans(app, statements):
+    """EXPLAIN QUERY PLAN steps for each SELECT in `statements`, as (statement, [step])."""
+    plans = []
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith('SELECT'):
+                rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                plans.append((statement, [row[-1] for row in rows]))
+    return plans